@@ -1,3 +1,22 @@
-from .repository import MemoryRepository
+from .content import ContentWatcher, load_quiz_definition
+from .repository import (
+    BusyRetryPolicy,
+    CatalogSnapshot,
+    ColumnarExport,
+    ContentionMetrics,
+    MaintenanceScheduler,
+    MemoryRepository,
+)
+from .tracing import JsonLinesSink
 
-__all__ = ("MemoryRepository",)
+__all__ = (
+    "MemoryRepository",
+    "BusyRetryPolicy",
+    "ContentionMetrics",
+    "MaintenanceScheduler",
+    "CatalogSnapshot",
+    "ColumnarExport",
+    "JsonLinesSink",
+    "ContentWatcher",
+    "load_quiz_definition",
+)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from ..core import ContentSyncResult, QuizDefinition, QuizService, parse_quiz_definition
+from ..core.exceptions import QuizDefinitionError
+
+
+def load_quiz_definition(path: str) -> QuizDefinition:
+    """
+    Read quiz definition from JSON file, name of the file without extension
+    is the key of the quiz
+
+    :param path:
+    :return: quiz definition
+    :raises QuizDefinitionError: file can't be read or is invalid
+    """
+    key = os.path.splitext(os.path.basename(path))[0]
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError) as error:
+        raise QuizDefinitionError(key=key, reason=repr(error)) from error
+    return parse_quiz_definition(key, data)
+
+
+class ContentWatcher:
+    """
+    Polls directory of quiz definition files ( ``*.json`` ) and syncs changed
+    ones with :meth:`QuizService.sync_content`. Files are compared by
+    modification time and size, so unchanged files aren't even read, and
+    quizzes are compared by content hash, so touched files cost one lookup
+    """
+
+    service: QuizService
+    directory: str
+    poll_interval: float
+    # Paths of invalid files and why, they are retried once they change
+    errors: Dict[str, str]
+
+    def __init__(
+        self, service: QuizService, directory: str, poll_interval: float = 5
+    ) -> None:
+        """
+        :param service:
+        :param directory:
+        :param poll_interval: seconds between scans of directory
+        """
+        self.service = service
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.errors = {}
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _changed_files(self) -> Dict[str, Tuple[int, int]]:
+        changed = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if self._signatures.get(entry.path) != signature:
+                    changed[entry.path] = signature
+        return changed
+
+    def _load(self, paths: List[str]) -> Tuple[List[QuizDefinition], Dict[str, str]]:
+        definitions = []
+        errors = {}
+        for path in paths:
+            try:
+                definitions.append(load_quiz_definition(path))
+            except QuizDefinitionError as error:
+                errors[path] = str(error)
+        return definitions, errors
+
+    async def scan(self) -> Optional[ContentSyncResult]:
+        """
+        Sync files changed since last scan, all files on first scan
+
+        :return: result of sync or None if no file changed
+        """
+        loop = asyncio.get_running_loop()
+        changed = await loop.run_in_executor(None, self._changed_files)
+        if not changed:
+            return None
+
+        definitions, errors = await loop.run_in_executor(
+            None, self._load, sorted(changed)
+        )
+        result = await self.service.sync_content(definitions)
+
+        # Signatures are kept after successful sync only, so failed sync is
+        # retried on next scan
+        self._signatures.update(changed)
+        self.errors.pop(self.directory, None)
+        for path in changed:
+            self.errors.pop(path, None)
+        self.errors.update(errors)
+        return result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception as error:
+                self.errors[self.directory] = repr(error)
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start background task, first scan runs immediately
+
+        :return: the task
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """
+        Cancel background task and wait for it
+        """
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -1,3 +1,15 @@
+from .busy import BusyRetryPolicy, ContentionMetrics
+from .columnar import ColumnarExport
+from .maintenance import MaintenanceScheduler
 from .memory import MemoryRepository
+from .snapshot import CatalogSnapshot, write_catalog_snapshot
 
-__all__ = ("MemoryRepository",)
+__all__ = (
+    "MemoryRepository",
+    "BusyRetryPolicy",
+    "ContentionMetrics",
+    "MaintenanceScheduler",
+    "CatalogSnapshot",
+    "write_catalog_snapshot",
+    "ColumnarExport",
+)
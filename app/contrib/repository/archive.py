@@ -0,0 +1,76 @@
+import struct
+import zlib
+from typing import List, Sequence
+
+from ...core.repository import QuizSessionAnswerModel
+
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<BI")
+# id, answer id ( -1 if None ), right, question length, answer length
+_ANSWER = struct.Struct("<qqBII")
+
+
+def encode_session_answers(answers: Sequence[QuizSessionAnswerModel]) -> bytes:
+    """
+    Pack answers of quiz session into compressed blob
+
+    :param answers:
+    :return: blob
+    """
+    parts = [_HEADER.pack(FORMAT_VERSION, len(answers))]
+    for answer in answers:
+        question = answer.question.encode()
+        value = answer.answer.encode()
+        parts.append(
+            _ANSWER.pack(
+                answer.id,
+                -1 if answer.answer_id is None else answer.answer_id,
+                answer.right,
+                len(question),
+                len(value),
+            )
+        )
+        parts.append(question)
+        parts.append(value)
+    return zlib.compress(b"".join(parts), 9)
+
+
+def decode_session_answers(
+    session_id: int, blob: bytes
+) -> List[QuizSessionAnswerModel]:
+    """
+    Unpack answers of quiz session packed by :func:`encode_session_answers`
+
+    :param session_id:
+    :param blob:
+    :return: list of answers
+    """
+    data = memoryview(zlib.decompress(blob))
+    version, count = _HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported archive format version {version}")
+
+    offset = _HEADER.size
+    answers = []
+    for _ in range(count):
+        id, answer_id, right, question_length, answer_length = _ANSWER.unpack_from(
+            data, offset
+        )
+        offset += _ANSWER.size
+        question = str(data[offset : offset + question_length], "utf-8")
+        offset += question_length
+        answer = str(data[offset : offset + answer_length], "utf-8")
+        offset += answer_length
+
+        answers.append(
+            QuizSessionAnswerModel(
+                id=id,
+                answer_id=None if answer_id == -1 else answer_id,
+                session_id=session_id,
+                question=question,
+                answer=answer,
+                right=bool(right),
+            )
+        )
+    return answers
@@ -0,0 +1,66 @@
+import random
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+
+@dataclass(frozen=True)
+class BusyRetryPolicy:
+    """
+    How long and how often transaction retries to take write lock held by
+    other connection or process
+    """
+
+    # Seconds to wait for write lock in total, deadlines of the caller can
+    # only shorten it
+    max_wait: float = 60
+    initial_delay: float = 0.002
+    max_delay: float = 0.25
+    multiplier: float = 2.0
+    # Share of every delay that is randomized, so competing processes don't
+    # retry in lockstep
+    jitter: float = 0.5
+
+    def delays(self, random: Callable[[], float] = random.random) -> Iterator[float]:
+        """
+        :param random: source of uniform numbers in [0, 1)
+        :return: endless jittered exponential delays, seconds
+        """
+        delay = self.initial_delay
+        while True:
+            yield delay * (1 - self.jitter * random())
+            delay = min(delay * self.multiplier, self.max_delay)
+
+
+@dataclass
+class ContentionMetrics:
+    """
+    Write lock contention of repository connection since start or last reset
+    """
+
+    # Transactions begun and how many of them had to wait for write lock
+    transactions: int = 0
+    contended: int = 0
+    # Attempts to take the lock that found it busy
+    retries: int = 0
+    # Transactions that gave up waiting
+    failures: int = 0
+    # Seconds spent waiting, in total and longest single wait
+    wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    def record(self, retries: int, wait_time: float, failed: bool = False):
+        """
+        Record one attempt to begin transaction
+
+        :param retries: number of busy attempts
+        :param wait_time: seconds waited
+        :param failed: whether lock was not taken
+        """
+        self.transactions += 1
+        if retries:
+            self.contended += 1
+            self.retries += retries
+            self.wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+        if failed:
+            self.failures += 1
@@ -0,0 +1,256 @@
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FORMAT_VERSION = 1
+
+MANIFEST = "manifest.json"
+STRING_OFFSETS = "strings.offsets.npy"
+STRING_DATA = "strings.data.npy"
+
+# Header of every column file is padded to fixed size, so number of rows is
+# written in place once column is complete
+_HEADER_SIZE = 128
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError(
+            "Columnar export requires NumPy, install with stats extra"
+        ) from error
+    return numpy
+
+
+class _Column:
+    def __init__(self, path: str, dtype: str) -> None:
+        np = _numpy()
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        np = _numpy()
+        header = repr(
+            {
+                "descr": np.lib.format.dtype_to_descr(self.dtype),
+                "fortran_order": False,
+                "shape": (self.rows,),
+            }
+        ).encode("latin1")
+        prefix = np.lib.format.magic(1, 0)
+        padding = _HEADER_SIZE - len(prefix) - 2 - len(header) - 1
+        self._file.seek(0)
+        self._file.write(prefix)
+        self._file.write(len(header + b" " * padding + b"\n").to_bytes(2, "little"))
+        self._file.write(header + b" " * padding + b"\n")
+
+    def append(self, values: Sequence[Any]):
+        np = _numpy()
+        self._file.write(np.asarray(values, dtype=self.dtype).tobytes())
+        self.rows += len(values)
+
+    def close(self):
+        self._file.flush()
+        self._write_header()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+class ColumnarWriter:
+    """
+    Streams rows of tables into directory of NumPy ``.npy`` files, one per
+    column. Strings are dictionary encoded: columns hold int32 codes into
+    string table shared by all tables, so repeated texts are stored once.
+    Directory is written next to the target and moved in place on commit
+
+    Requires NumPy ( stats extra )
+    """
+
+    def __init__(self, directory: str, tables: Dict[str, Dict[str, str]]) -> None:
+        """
+        :param directory: target directory, replaced on commit
+        :param tables: columns of every table, name to dtype, "str" for
+            dictionary encoded strings
+        """
+        _numpy()
+        self.directory = directory
+        self.tables = tables
+        self._temp = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+        shutil.rmtree(self._temp, ignore_errors=True)
+        os.makedirs(self._temp)
+
+        self._columns: Dict[str, Dict[str, _Column]] = {
+            table: {
+                name: _Column(
+                    os.path.join(self._temp, f"{table}.{name}.npy"),
+                    "<i4" if dtype == "str" else dtype,
+                )
+                for name, dtype in columns.items()
+            }
+            for table, columns in tables.items()
+        }
+        self._codes: Dict[str, int] = {}
+        self._strings: List[bytes] = []
+
+    def _encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value.encode())
+        return code
+
+    def append(self, table: str, rows: Sequence[Tuple]):
+        """
+        Append chunk of rows to table
+
+        :param table:
+        :param rows: values in order of table columns
+        """
+        if not rows:
+            return
+        columns = self._columns[table]
+        for (name, column), values in zip(columns.items(), zip(*rows)):
+            if self.tables[table][name] == "str":
+                values = [self._encode(value) for value in values]
+            column.append(values)
+
+    def abort(self):
+        """
+        Discard written files
+        """
+        for columns in self._columns.values():
+            for column in columns.values():
+                column._file.close()
+        shutil.rmtree(self._temp, ignore_errors=True)
+
+    def commit(self) -> Dict[str, int]:
+        """
+        Finish column files, write string table and manifest, and move
+        directory in place
+
+        :return: number of rows of every table
+        """
+        np = _numpy()
+        for columns in self._columns.values():
+            for column in columns.values():
+                column.close()
+
+        sizes = np.fromiter(map(len, self._strings), np.int64, len(self._strings))
+        offsets = np.zeros(len(self._strings) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        np.save(os.path.join(self._temp, STRING_OFFSETS), offsets)
+        np.save(
+            os.path.join(self._temp, STRING_DATA),
+            np.frombuffer(b"".join(self._strings), dtype=np.uint8),
+        )
+
+        rows = {
+            table: next(iter(columns.values())).rows if columns else 0
+            for table, columns in self._columns.items()
+        }
+        with open(os.path.join(self._temp, MANIFEST), "w") as file:
+            json.dump(
+                {
+                    "version": FORMAT_VERSION,
+                    "tables": {
+                        table: {"rows": rows[table], "columns": columns}
+                        for table, columns in self.tables.items()
+                    },
+                },
+                file,
+                indent=2,
+            )
+
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.replace(self._temp, self.directory)
+        return rows
+
+
+class ColumnarExport:
+    """
+    Reads directory written by :class:`ColumnarWriter`, columns are memory
+    mapped, so only pages that are used are loaded. E.g. for pandas::
+
+        export = ColumnarExport(path)
+        frame = pandas.DataFrame(export.table("quiz_session"))
+        frame["language"] = export.decode(frame["language"])
+
+    Requires NumPy ( stats extra )
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory:
+        :raises ValueError: directory has unsupported format
+        """
+        np = _numpy()
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as file:
+            manifest = json.load(file)
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                f"unsupported columnar export version {manifest.get('version')}"
+            )
+
+        self.tables: Dict[str, Dict[str, Any]] = manifest["tables"]
+        self._offsets = np.load(os.path.join(directory, STRING_OFFSETS), mmap_mode="r")
+        self._data = np.load(
+            os.path.join(directory, STRING_DATA),
+            mmap_mode="r" if len(self._offsets) > 1 else None,
+        )
+
+    def rows(self, table: str) -> int:
+        """
+        :param table:
+        :return: number of rows of table
+        """
+        return self.tables[table]["rows"]
+
+    def column(self, table: str, name: str):
+        """
+        :param table:
+        :param name:
+        :return: read only memory mapped array, int32 codes for strings
+        """
+        np = _numpy()
+        if name not in self.tables[table]["columns"]:
+            raise KeyError(f"{table}.{name}")
+        # Empty arrays can't be mapped
+        mmap_mode = "r" if self.rows(table) else None
+        return np.load(
+            os.path.join(self.directory, f"{table}.{name}.npy"), mmap_mode=mmap_mode
+        )
+
+    def table(self, table: str) -> Dict[str, Any]:
+        """
+        :param table:
+        :return: arrays of all columns of table by name
+        """
+        return {
+            name: self.column(table, name) for name in self.tables[table]["columns"]
+        }
+
+    def string(self, code: int) -> Optional[str]:
+        """
+        :param code: code of dictionary encoded string
+        :return: the string, None for code -1
+        """
+        if code < 0:
+            return None
+        start, end = self._offsets[code], self._offsets[code + 1]
+        return bytes(self._data[start:end]).decode()
+
+    def decode(self, codes: Iterable[int]) -> List[Optional[str]]:
+        """
+        :param codes: codes of dictionary encoded strings
+        :return: the strings
+        """
+        return [self.string(int(code)) for code in codes]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from .memory import MemoryRepository
+
+
+@dataclass
+class _Job:
+    name: str
+    interval: float
+    run: Callable[[], Awaitable[Any]]
+    due: float
+
+
+class MaintenanceScheduler:
+    """
+    Runs periodic database maintenance of repository in background task:
+    query planner statistics ( PRAGMA optimize ), WAL checkpoints and
+    incremental vacuum. Jobs run when repository is idle, so they don't delay
+    updates, unless they were deferred for too long
+    """
+
+    repository: "MemoryRepository"
+    idle_time: float
+    max_defer: float
+    poll_interval: float
+    runs: Counter
+    errors: Counter
+
+    def __init__(
+        self,
+        repository: "MemoryRepository",
+        optimize_interval: Optional[float] = 3600,
+        checkpoint_interval: Optional[float] = 300,
+        vacuum_interval: Optional[float] = 3600,
+        vacuum_pages: int = 1000,
+        idle_time: float = 1,
+        max_defer: float = 600,
+        poll_interval: float = 1,
+        warm_up: Optional[Callable[[], Awaitable[Any]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param repository:
+        :param optimize_interval: seconds between PRAGMA optimize runs ( None to disable )
+        :param checkpoint_interval: seconds between WAL checkpoints ( None to disable )
+        :param vacuum_interval: seconds between incremental vacuums ( None to disable )
+        :param vacuum_pages: free pages released by one incremental vacuum
+        :param idle_time: seconds without repository calls after which
+            repository is considered idle
+        :param max_defer: seconds after which overdue job runs even if
+            repository is busy
+        :param poll_interval: seconds between checks of due jobs
+        :param warm_up: coroutine function called once on start, e.g.
+            :meth:`QuizService.warm_up`
+        :param clock: monotonic time source
+        """
+        self.repository = repository
+        self.idle_time = idle_time
+        self.max_defer = max_defer
+        self.poll_interval = poll_interval
+        self.runs = Counter()
+        self.errors = Counter()
+        self._warm_up = warm_up
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+
+        now = clock()
+        self._jobs: List[_Job] = [
+            _Job(name, interval, run, now + interval)
+            for name, interval, run in (
+                ("optimize", optimize_interval, repository.optimize),
+                ("checkpoint", checkpoint_interval, repository.checkpoint_wal),
+                (
+                    "vacuum",
+                    vacuum_interval,
+                    lambda: repository.incremental_vacuum(vacuum_pages),
+                ),
+            )
+            if interval is not None
+        ]
+
+    async def run_pending(self) -> List[str]:
+        """
+        Run jobs that are due
+
+        :return: names of jobs that were run
+        """
+        done = []
+        for job in self._jobs:
+            now = self._clock()
+            if now < job.due:
+                continue
+            if (
+                self.repository.idle_time() < self.idle_time
+                and now < job.due + self.max_defer
+            ):
+                continue
+
+            try:
+                await job.run()
+            except Exception as error:
+                # Next run may succeed, e.g. if checkpoint was blocked by reader
+                self.errors[f"{job.name}: {type(error).__name__}"] += 1
+            else:
+                self.runs[job.name] += 1
+                done.append(job.name)
+            job.due = self._clock() + job.interval
+        return done
+
+    async def _run(self):
+        if self._warm_up is not None:
+            try:
+                await self._warm_up()
+            except Exception as error:
+                self.errors[f"warm_up: {type(error).__name__}"] += 1
+            else:
+                self.runs["warm_up"] += 1
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.run_pending()
+
+    def start(self) -> asyncio.Task:
+        """
+        Start background task, warm up runs first
+
+        :return: the task
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """
+        Cancel background task and wait for it
+        """
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -1,124 +1,680 @@
-from typing import Iterable, List, Optional, Tuple, TypeVar, Union
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import aiosqlite
-from babel import Locale
 
+from ...core import tracing
+from ...core.cache import LRUCache
+from ...core.exceptions import QueryTimeoutError, QuizSessionExistsError
+from ...core.locale import LazyLocale
 from ...core.repository import (
     QuizAnswerModel,
+    QuizAnswerStatsModel,
+    QuizContentModel,
     QuizModel,
     QuizQuestionModel,
+    QuizQuestionStatsModel,
     QuizSessionAnswerModel,
+    QuizSessionCheckpointModel,
     QuizSessionModel,
     Repository,
+    UserDeletionModel,
     UserModel,
 )
+from ...core.text import normalize_answer
+from ...core.tracing import traced
+from .archive import decode_session_answers, encode_session_answers
+from .busy import BusyRetryPolicy, ContentionMetrics
+from .columnar import ColumnarWriter
+from .maintenance import MaintenanceScheduler
+from .migrations import MIGRATIONS, Migration
+from .snapshot import write_catalog_snapshot
 
-SCHEMA = """
-CREATE TABLE IF NOT EXISTS "quiz" (
-	"id"	INTEGER,
-	"description"	TEXT NOT NULL,
-	"language"	TEXT NOT NULL,
-	PRIMARY KEY("id" AUTOINCREMENT)
-);
-CREATE TABLE IF NOT EXISTS "quiz_answer" (
-	"id"	INTEGER,
-	"question_id"	INTEGER NOT NULL,
-	"right"	INTEGER NOT NULL,
-	"value"	TEXT NOT NULL,
-	PRIMARY KEY("id" AUTOINCREMENT),
-	FOREIGN KEY("question_id") REFERENCES "quiz_question"("id") ON DELETE CASCADE,
-	UNIQUE("question_id","value")
-);
-CREATE TABLE IF NOT EXISTS "quiz_question" (
-	"id"	INTEGER,
-	"quiz_id"	INTEGER NOT NULL,
-	"question"	TEXT NOT NULL,
-	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE CASCADE,
-	PRIMARY KEY("id" AUTOINCREMENT)
-);
-CREATE TABLE IF NOT EXISTS "quiz_session" (
-	"id"	INTEGER,
-	"quiz_id"	INTEGER NOT NULL,
-	"user_id"	INTEGER NOT NULL,
-	"description"	TEXT NOT NULL,
-	"language"	TEXT NOT NULL,
-	PRIMARY KEY("id" AUTOINCREMENT),
-	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE SET NULL,
-	FOREIGN KEY("user_id") REFERENCES "user"("id") ON DELETE CASCADE,
-	UNIQUE("quiz_id","user_id")
-);
-CREATE TABLE IF NOT EXISTS "quiz_session_answer" (
-	"id"	INTEGER,
-	"answer_id"	INTEGER,
-	"session_id"	INTEGER NOT NULL,
-	"question"	TEXT NOT NULL,
-	"answer"	TEXT NOT NULL,
-	"right"	INTEGER NOT NULL,
-	PRIMARY KEY("id" AUTOINCREMENT),
-	FOREIGN KEY("answer_id") REFERENCES "quiz_answer"("id") ON DELETE SET NULL,
-	FOREIGN KEY("session_id") REFERENCES "quiz_session"("id") ON DELETE CASCADE
-);
-CREATE TABLE IF NOT EXISTS "user" (
-	"id"	INTEGER,
-	"telegram_id"	INTEGER NOT NULL UNIQUE,
-	"first_name"	TEXT NOT NULL,
-	"last_name"	TEXT,
-	"username"	TEXT,
-	"language"	TEXT NOT NULL,
-	PRIMARY KEY("id" AUTOINCREMENT),
-	UNIQUE("telegram_id")
-);
-CREATE INDEX IF NOT EXISTS "quiz_answer_question_id_idx" ON "quiz_answer" (
-	"question_id"	ASC
-);
-CREATE INDEX IF NOT EXISTS "quiz_language_idx" ON "quiz" (
-	LOWER("language")
-);
-CREATE INDEX IF NOT EXISTS "quiz_question_quiz_id_idx" ON "quiz_question" (
-	"quiz_id"	ASC
-);
-CREATE INDEX IF NOT EXISTS "quiz_session_answer_session_id_idx" ON "quiz_session_answer" (
-	"session_id"	ASC
-);
-CREATE INDEX IF NOT EXISTS "quiz_session_user_id_idx" ON "quiz_session" (
-	"user_id"	ASC
-);
-CREATE UNIQUE INDEX IF NOT EXISTS "user_telegram_id_idx" ON "user" (
-	"telegram_id"	ASC
-);
-"""
-
+if TYPE_CHECKING:
+    from babel import Locale
 
 T = TypeVar("T")
 
+# Matches of quiz description outweigh matches of its questions
+SEARCH_QUESTION_WEIGHT = 0.5
+
+# Answers matched by text per statement, 3 parameters each
+MATCH_CHUNK_SIZE = 300
+
+# Users read back by telegram id per statement
+USER_CHUNK_SIZE = 500
+
+USER_UPSERT_QUERY = (
+    "INSERT INTO user(telegram_id, language, first_name, last_name, username) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(telegram_id) DO UPDATE SET language=excluded.language, first_name=excluded.first_name, "
+    "last_name=excluded.last_name, username=excluded.username"
+)
+
+# Columns of tables in columnar export of session results
+RESULT_TABLES = {
+    "quiz_session": {
+        "id": "<i8",
+        # -1 if quiz was deleted
+        "quiz_id": "<i8",
+        "user_id": "<i8",
+        "description": "str",
+        "language": "str",
+        "created_at": "<f8",
+        "correct": "<i4",
+        "total": "<i4",
+        "archived": "|b1",
+    },
+    "quiz_session_answer": {
+        "id": "<i8",
+        "session_id": "<i8",
+        # -1 if answer was deleted
+        "answer_id": "<i8",
+        "question": "str",
+        "answer": "str",
+        "right": "|b1",
+    },
+}
+
+SESSION_ANSWER_QUERY = (
+    "SELECT quiz_session_answer.id, quiz_session_answer.answer_id, quiz_session_answer.session_id, "
+    'question_text.value AS question, answer_text.value AS answer, quiz_session_answer."right" '
+    "FROM quiz_session_answer "
+    "JOIN quiz_session_text AS question_text ON question_text.id = quiz_session_answer.question_text_id "
+    "JOIN quiz_session_text AS answer_text ON answer_text.id = quiz_session_answer.answer_text_id"
+)
+
+
+def archived_correct(blob: bytes) -> int:
+    """
+    Number of right answers in archived session, registered as SQL function
+
+    :param blob: archived answers
+    :return:
+    """
+    return sum(answer.right for answer in decode_session_answers(0, blob))
+
+
+def archived_total(blob: bytes) -> int:
+    """
+    Number of answers in archived session, registered as SQL function
+
+    :param blob: archived answers
+    :return:
+    """
+    return len(decode_session_answers(0, blob))
+
+
+def text_hash(value: str) -> bytes:
+    """
+    Content hash of interned text, also registered as SQL function
+
+    :param value:
+    :return: 16 bytes digest
+    """
+    return hashlib.blake2b(value.encode(), digest_size=16).digest()
+
+
+class _RawConnection:
+    """
+    Access to sqlite3 connection wrapped by aiosqlite for what aiosqlite has
+    no public API for: interrupting running statement and running several
+    calls on connection thread at once. Relies on private members of aiosqlite
+    0.17 ( ``Connection._conn`` and ``Connection._execute`` ), so its version
+    is pinned and has to be checked here on upgrade
+    """
+
+    @staticmethod
+    def interrupt(connection: aiosqlite.Connection):
+        """
+        Interrupt running statement, safe to call from any thread
+
+        :param connection:
+        """
+        connection._conn.interrupt()
+
+    @staticmethod
+    async def run(
+        connection: aiosqlite.Connection, function: Callable[[sqlite3.Connection], T]
+    ) -> T:
+        """
+        Call function with sqlite3 connection on connection thread
+
+        :param connection:
+        :param function:
+        :return: result of function
+        """
+        return await connection._execute(function, connection._conn)
+
+
+class TracedCursor:
+    """
+    Cursor tracing every statement as span with its SQL, number of rows and
+    time the statement waited for connection thread
+    """
+
+    def __init__(self, cursor: aiosqlite.Cursor, repository: "MemoryRepository"):
+        self._cursor = cursor
+        self._repository = repository
+        self._span: Optional[tracing.Span] = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    async def _traced(self, sql: str, method, *args):
+        await self._repository._trace_statements()
+        with tracing.span("sqlite", sql=sql) as span:
+            self._span = span
+            self._repository._statement_started = None
+            submitted = time.perf_counter()
+            await method(sql, *args)
+
+            started = self._repository._statement_started
+            if span is not None:
+                span.set(
+                    rows=max(self._cursor.rowcount, 0),
+                    thread_wait=None if started is None else started - submitted,
+                )
+        return self
+
+    def _count(self, rows: int):
+        if self._span is not None:
+            self._span.attributes["rows"] += rows
+
+    async def execute(self, sql: str, parameters: Iterable = ()) -> "TracedCursor":
+        return await self._traced(sql, self._cursor.execute, parameters)
+
+    async def executemany(
+        self, sql: str, parameters: Iterable[Iterable]
+    ) -> "TracedCursor":
+        return await self._traced(sql, self._cursor.executemany, parameters)
+
+    async def fetchone(self) -> Optional[aiosqlite.Row]:
+        row = await self._cursor.fetchone()
+        self._count(row is not None)
+        return row
+
+    async def fetchmany(self, size: Optional[int] = None) -> Iterable[aiosqlite.Row]:
+        rows = await (
+            self._cursor.fetchmany() if size is None else self._cursor.fetchmany(size)
+        )
+        self._count(len(rows))
+        return rows
+
+    async def fetchall(self) -> Iterable[aiosqlite.Row]:
+        rows = await self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    async def __aiter__(self) -> AsyncIterator[aiosqlite.Row]:
+        while True:
+            rows = await self.fetchmany(self._cursor.iter_chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
 
 class MemoryRepository(Repository):
     path: str
     connection: Optional[aiosqlite.Connection] = None
+    migrations: Sequence[Migration] = MIGRATIONS
+    statement_timeout: Optional[float]
+    busy_timeout: float
+    busy_retry: BusyRetryPolicy
+    contention: ContentionMetrics
 
-    def __init__(self, path: str) -> None:
+    def __init__(
+        self,
+        path: str,
+        statement_timeout: Optional[float] = None,
+        busy_timeout: float = 60,
+        busy_retry: Optional[BusyRetryPolicy] = None,
+    ) -> None:
+        """
+        :param path: database path
+        :param statement_timeout: seconds every repository call may take
+            ( None for no limit ), deadlines of the caller can only shorten it
+        :param busy_timeout: seconds statements outside of transactions wait for
+            write lock held by other connection, e.g. by background index build
+        :param busy_retry: how transactions retry to take write lock held by
+            other connection or process ( waits up to busy timeout by default )
+        """
+        super().__init__()
         self.path = path
+        self.statement_timeout = statement_timeout
+        self.busy_timeout = busy_timeout
+        self.busy_retry = (
+            BusyRetryPolicy(max_wait=busy_timeout) if busy_retry is None else busy_retry
+        )
+        self.contention = ContentionMetrics()
+        self._random = random.Random()
+        self.maintenance: Optional[MaintenanceScheduler] = None
+
+        # Connection is used by one task at a time, so statement running on
+        # aiosqlite thread always belongs to the lock owner
+        self._lock: Optional[asyncio.Lock] = None
+        self._owner: Optional[asyncio.Task] = None
+        self._depth = 0
+        # Savepoint of every open transaction with interned texts pending at
+        # its start, None for outermost one
+        self._savepoints: List[Optional[Tuple[str, Dict[bytes, int]]]] = []
+        # Whether outermost transaction takes write lock
+        self._write = True
+        # Monotonic time connection was released last
+        self._last_used = time.monotonic()
+
+        # perf_counter of the time connection thread started last statement,
+        # set by trace callback while tracing is enabled
+        self._statement_started: Optional[float] = None
+        self._statement_trace = False
+
+        # Text hash to id of interned text, ids inserted by current transaction
+        # are cached only after commit
+        self._text_ids: LRUCache[bytes, int] = LRUCache(maxsize=65536)
+        self._new_text_ids: Dict[bytes, int] = {}
 
     async def generate_schema(self):
-        async with self.transaction():
-            await self.connection.executescript(SCHEMA)
+        await self.migrate()
+
+    async def get_schema_version(self) -> int:
+        async with self._cursor() as cur:
+            await cur.execute("PRAGMA user_version")
+            return (await cur.fetchone())[0]
+
+    async def migrate(self, background: bool = False) -> Optional[asyncio.Task]:
+        """
+        Apply pending schema migrations, costs one pragma read if schema is up to date
+
+        :param background: apply trailing online migrations ( index builds ) in
+            background task over separate connection instead of waiting for them.
+            File databases use WAL journal, so reads go on during the build while
+            writes wait for it up to busy timeout
+        :return: background task or None if everything is applied
+        """
+        version = await self.get_schema_version()
+        pending = [
+            migration for migration in self.migrations if migration.version > version
+        ]
+
+        # Only trailing online migrations can be deferred, any later migration
+        # may depend on them
+        deferred = []
+        if background:
+            while pending and pending[-1].online:
+                deferred.insert(0, pending.pop())
+
+        async with self._migration_lock():
+            for migration in pending:
+                await self._apply_migration(self.connection, migration)
+
+        if deferred:
+            return asyncio.create_task(self._apply_online_migrations(deferred))
+        return None
+
+    async def _apply_online_migrations(self, migrations: Sequence[Migration]):
+        if self.path == ":memory:":
+            # Other connection would open different database
+            async with self._migration_lock():
+                for migration in migrations:
+                    await self._apply_migration(self.connection, migration)
+            return
+
+        connection = await self._open_connection()
+        try:
+            for migration in migrations:
+                await self._apply_migration(connection, migration)
+        finally:
+            await connection.close()
+
+    @staticmethod
+    async def _apply_migration(connection: aiosqlite.Connection, migration: Migration):
+        # executescript commits pending transaction by itself, so the script
+        # manages the transaction explicitly
+        await connection.commit()
+        try:
+            await connection.executescript(
+                f"BEGIN;\n{migration.script}\nPRAGMA user_version = {migration.version};\nCOMMIT;"
+            )
+        except BaseException:
+            await connection.rollback()
+            raise
+
+    @asynccontextmanager
+    async def _migration_lock(self):
+        # Migration commits pending transaction of the connection, lock makes
+        # other tasks wait for it but transaction of caller itself can't
+        async with self._locked():
+            if self._depth > 1:
+                raise RuntimeError("Migrations can't be applied inside of transaction")
+            yield
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(self.path, timeout=self.busy_timeout)
+        connection.row_factory = aiosqlite.Row
+        # Takes effect for new database only, lets maintenance give free
+        # pages back to file system
+        await connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if self.path != ":memory:":
+            # Readers don't block on writer, e.g. on background index build
+            await connection.execute("PRAGMA journal_mode=WAL")
+        await connection.create_function("text_hash", 1, text_hash, deterministic=True)
+        await connection.create_function(
+            "normalize_answer", 1, normalize_answer, deterministic=True
+        )
+        for function in (archived_correct, archived_total):
+            await connection.create_function(
+                function.__name__, 1, function, deterministic=True
+            )
+        return connection
 
     async def connect(self):
-        self.connection = await aiosqlite.connect(self.path)
-        self.connection.row_factory = aiosqlite.Row
+        self.connection = await self._open_connection()
+        self._lock = asyncio.Lock()
 
     async def close(self):
+        if self.maintenance is not None:
+            await self.maintenance.stop()
         await self.connection.close()
 
-    async def begin_transaction(self):
-        # Clean journal
+    async def _acquire(self):
+        task = asyncio.current_task()
+        if self._owner is task:
+            self._depth += 1
+            return
+
+        try:
+            await asyncio.wait_for(self._lock.acquire(), self._get_timeout())
+        except asyncio.TimeoutError:
+            raise QueryTimeoutError() from None
+
+        self._owner = task
+        self._depth = 1
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._last_used = time.monotonic()
+            self._lock.release()
+
+    @asynccontextmanager
+    async def _locked(self):
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _get_timeout(self) -> Optional[float]:
+        timeout = self.remaining_time()
+        if self.statement_timeout is not None:
+            timeout = (
+                self.statement_timeout
+                if timeout is None
+                else min(timeout, self.statement_timeout)
+            )
+        if timeout is not None and timeout <= 0:
+            raise QueryTimeoutError()
+        return timeout
+
+    def _interrupt(self):
+        # Interrupt synchronously, scheduled call could outlive the timer and
+        # hit the next statement of the lock owner. sqlite3 interrupt is thread
+        # safe and the running statement belongs to the late call, as timer is
+        # cancelled before the lock is released
+        _RawConnection.interrupt(self.connection)
+
+    def _on_statement(self, sql: str):
+        # Called on connection thread for every statement, triggers included
+        if self._statement_started is None:
+            self._statement_started = time.perf_counter()
+
+    async def _trace_statements(self):
+        if not self._statement_trace:
+            self._statement_trace = True
+            await self.connection.set_trace_callback(self._on_statement)
+
+    @asynccontextmanager
+    async def _cursor(self):
+        async with self._locked():
+            timeout = self._get_timeout()
+            timer = None
+            if timeout is not None:
+                timer = asyncio.get_running_loop().call_later(timeout, self._interrupt)
+
+            try:
+                async with self.connection.cursor() as cur:
+                    if tracing.current_span() is not None:
+                        yield TracedCursor(cur, self)
+                    else:
+                        yield cur
+            except sqlite3.OperationalError as error:
+                if str(error) == "interrupted":
+                    raise QueryTimeoutError() from error
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    async def _commit(self):
         await self.connection.commit()
+        for digest, id in self._new_text_ids.items():
+            self._text_ids.set(digest, id)
+        self._new_text_ids.clear()
+
+    def _try_begin(self, connection: sqlite3.Connection) -> bool:
+        # Runs on connection thread. SQLite busy handler would block the thread
+        # for whole busy timeout, so the attempt doesn't wait and the backoff
+        # is done on event loop
+        connection.execute("PRAGMA busy_timeout = 0")
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as error:
+            if str(error) != "database is locked":
+                raise
+            return False
+        finally:
+            connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        return True
+
+    async def _begin_immediate(self):
+        if self.connection.in_transaction:
+            # Clean journal
+            await self._commit()
+
+        # Write lock is taken upfront, so transaction never fails with busy
+        # error halfway, after its reads
+        timeout = self._get_timeout()
+        started = time.perf_counter()
+        retries = 0
+        for delay in self.busy_retry.delays(self._random.random):
+            if await _RawConnection.run(self.connection, self._try_begin):
+                break
+
+            retries += 1
+            waited = time.perf_counter() - started
+            if timeout is not None and waited + delay >= timeout:
+                self.contention.record(retries, waited, failed=True)
+                raise QueryTimeoutError()
+            if waited >= self.busy_retry.max_wait:
+                self.contention.record(retries, waited, failed=True)
+                raise sqlite3.OperationalError("database is locked")
+            await asyncio.sleep(min(delay, self.busy_retry.max_wait - waited))
+
+        waited = time.perf_counter() - started
+        self.contention.record(retries, waited)
+        span = tracing.current_span()
+        if span is not None and retries:
+            span.set(busy_retries=retries, busy_wait=waited)
 
+    async def _begin_deferred(self):
+        if self.connection.in_transaction:
+            # Clean journal
+            await self._commit()
+
+        # Read lock is taken by first statement and never waits for writer,
+        # readers see snapshot of database as of that statement
+        await self.connection.execute("BEGIN")
+
+    def idle_time(self) -> float:
+        """
+        :return: seconds since repository was used last, 0 if it's in use
+        """
+        if self._lock is not None and self._lock.locked():
+            return 0.0
+        return time.monotonic() - self._last_used
+
+    def start_maintenance(self, **options) -> MaintenanceScheduler:
+        """
+        Start background maintenance, stopped on close
+
+        :param options: options of :class:`MaintenanceScheduler`
+        :return: scheduler
+        """
+        if self.maintenance is None:
+            self.maintenance = MaintenanceScheduler(self, **options)
+            self.maintenance.start()
+        return self.maintenance
+
+    async def _maintain(self, sql: str, script: bool = False) -> List[aiosqlite.Row]:
+        async with self._locked():
+            if self._depth > 1:
+                raise RuntimeError("Maintenance can't run inside of transaction")
+            if self.connection.in_transaction:
+                # Clean journal
+                await self._commit()
+
+            async with self._cursor() as cur:
+                if script:
+                    # Stepped to completion, e.g. incremental vacuum frees one
+                    # page per step while returning no rows
+                    await cur.executescript(sql)
+                    return []
+                await cur.execute(sql)
+                return await cur.fetchall()
+
+    @traced
+    async def optimize(self):
+        """
+        Refresh query planner statistics of tables that need it ( ANALYZE )
+        """
+        await self._maintain("PRAGMA optimize")
+
+    @traced
+    async def checkpoint_wal(self) -> Tuple[int, int]:
+        """
+        Copy WAL into database file without waiting for readers or writers
+
+        :return: number of pages in WAL and of pages copied
+        """
+        _, pages, copied = (await self._maintain("PRAGMA wal_checkpoint(PASSIVE)"))[0]
+        return max(pages, 0), max(copied, 0)
+
+    @traced
+    async def incremental_vacuum(self, pages: int) -> int:
+        """
+        Give free pages back to file system ( databases created with
+        incremental auto vacuum only )
+
+        :param pages: maximal number of pages to release
+        :return: number of released pages
+        """
+        before = (await self._maintain("PRAGMA freelist_count"))[0][0]
+        await self._maintain(f"PRAGMA incremental_vacuum({int(pages)})", script=True)
+        return before - (await self._maintain("PRAGMA freelist_count"))[0][0]
+
+    @traced
+    async def begin_transaction(self, write: bool = True):
+        await self._acquire()
+        try:
+            if self._depth == 1 or not self.connection.in_transaction:
+                if write:
+                    await self._begin_immediate()
+                else:
+                    await self._begin_deferred()
+                self._savepoints.append(None)
+                self._write = write
+            elif write and not self._write:
+                # Taking write lock halfway fails if snapshot is outdated
+                raise RuntimeError("Write transaction can't be nested in read one")
+            else:
+                # Nested transaction is part of the outer one, its changes
+                # are undone alone on cancel and committed with the outer one
+                savepoint = f"nested_{len(self._savepoints)}"
+                await self.connection.execute(f"SAVEPOINT {savepoint}")
+                self._savepoints.append((savepoint, dict(self._new_text_ids)))
+        except BaseException:
+            self._release()
+            raise
+
+    @traced
     async def cancel_transaction(self):
-        await self.connection.rollback()
+        try:
+            savepoint = self._savepoints.pop()
+            if savepoint is None:
+                await self.connection.rollback()
+                self._new_text_ids.clear()
+            else:
+                name, self._new_text_ids = savepoint
+                await self.connection.execute(f"ROLLBACK TO {name}")
+                await self.connection.execute(f"RELEASE {name}")
+        finally:
+            self._release()
 
+    @traced
     async def commit_transaction(self):
-        await self.connection.commit()
+        try:
+            savepoint = self._savepoints.pop()
+            if savepoint is None:
+                await self._commit()
+            else:
+                await self.connection.execute(f"RELEASE {savepoint[0]}")
+        except BaseException:
+            await self.connection.rollback()
+            self._new_text_ids.clear()
+            raise
+        finally:
+            self._release()
+
+    async def _intern_text(self, cur: aiosqlite.Cursor, value: str) -> int:
+        digest = text_hash(value)
+        id = self._text_ids.get(digest) or self._new_text_ids.get(digest)
+        if id is not None:
+            return id
+
+        await cur.execute(
+            "INSERT OR IGNORE INTO quiz_session_text(hash, value) VALUES (?, ?)",
+            (digest, value),
+        )
+        if cur.rowcount:
+            self._new_text_ids[digest] = cur.lastrowid
+            return cur.lastrowid
+
+        await cur.execute("SELECT id FROM quiz_session_text WHERE hash=?", (digest,))
+        id = (await cur.fetchone())["id"]
+        self._text_ids.set(digest, id)
+        return id
 
     @staticmethod
     def _generate_constraints(**kwargs: T) -> Tuple[List[str], List[T]]:
@@ -135,11 +691,20 @@ class MemoryRepository(Repository):
 
         return constraints, values
 
+    @staticmethod
+    def _build_match_query(text: str) -> Optional[str]:
+        # Quote every word, so user input can't use FTS5 query syntax, and
+        # match last word by prefix to support search as you type
+        words = re.findall(r"\w+", text)
+        if not words:
+            return None
+        return " ".join('"{}"'.format(word) for word in words) + "*"
+
     def _build_user(self, row: Union[aiosqlite.Row, None]) -> Optional[UserModel]:
         return row and UserModel(
             id=row["id"],
             telegram_id=row["telegram_id"],
-            language=Locale.parse(row["language"]),
+            language=LazyLocale.parse(row["language"]),
             first_name=row["first_name"],
             last_name=row["last_name"],
             username=row["username"],
@@ -149,7 +714,8 @@ class MemoryRepository(Repository):
         return row and QuizModel(
             id=row["id"],
             description=row["description"],
-            language=Locale.parse(row["language"]),
+            language=LazyLocale.parse(row["language"]),
+            plays=row["plays"],
         )
 
     def _build_quiz_answer(
@@ -167,7 +733,6 @@ class MemoryRepository(Repository):
     ) -> Optional[QuizQuestionModel]:
         return row and QuizQuestionModel(
             id=row["id"],
-            quiz_id=row["quiz_id"],
             question=row["question"],
         )
 
@@ -179,7 +744,10 @@ class MemoryRepository(Repository):
             quiz_id=row["quiz_id"],
             user_id=row["user_id"],
             description=row["description"],
-            language=Locale.parse(row["language"]),
+            language=LazyLocale.parse(row["language"]),
+            created_at=row["created_at"],
+            correct=row["correct"],
+            total=row["total"],
         )
 
     def _build_quiz_session_answer(
@@ -194,46 +762,209 @@ class MemoryRepository(Repository):
             right=bool(row["right"]),
         )
 
+    def _build_quiz_session_checkpoint(
+        self, row: Union[aiosqlite.Row, None]
+    ) -> Optional[QuizSessionCheckpointModel]:
+        return row and QuizSessionCheckpointModel(
+            user_id=row["user_id"],
+            quiz_id=row["quiz_id"],
+            answers={
+                int(question_id): answer_id
+                for question_id, answer_id in json.loads(row["answers"]).items()
+            },
+            updated_at=row["updated_at"],
+        )
+
+    @traced
     async def get_user(self, user_id: int) -> Optional[UserModel]:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT * FROM user WHERE id=?",
                 (user_id,),
             )
             return self._build_user(await cur.fetchone())
 
+    @traced
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[UserModel]:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT * FROM user WHERE telegram_id=?",
                 (telegram_id,),
             )
             return self._build_user(await cur.fetchone())
 
+    @traced
     async def get_quiz(self, quiz_id: int) -> Optional[QuizModel]:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT * FROM quiz WHERE id=?",
                 (quiz_id,),
             )
             return self._build_quiz(await cur.fetchone())
 
+    @traced
+    async def match_quiz_answers(
+        self, answers: Sequence[Tuple[int, str]]
+    ) -> List[Tuple[Optional[QuizQuestionModel], Optional[QuizAnswerModel]]]:
+        result = [(None, None)] * len(answers)
+        async with self._cursor() as cur:
+            for offset in range(0, len(answers), MATCH_CHUNK_SIZE):
+                chunk = answers[offset : offset + MATCH_CHUNK_SIZE]
+                # Answers of every question are found through (question_id, value)
+                # index, only few of them have to be normalized
+                await cur.execute(
+                    "WITH submitted(position, question_id, value) AS (VALUES {}) "
+                    "SELECT submitted.position, quiz_question.id, quiz_question.question, "
+                    'quiz_answer.id AS answer_id, quiz_answer."right", quiz_answer.value '
+                    "FROM submitted "
+                    "LEFT JOIN quiz_question ON quiz_question.id = submitted.question_id "
+                    "LEFT JOIN quiz_answer ON quiz_answer.question_id = submitted.question_id "
+                    "AND normalize_answer(quiz_answer.value) = submitted.value "
+                    "ORDER BY submitted.position, quiz_answer.id DESC".format(
+                        ", ".join(["(?, ?, ?)"] * len(chunk))
+                    ),
+                    [
+                        parameter
+                        for position, (question_id, value) in enumerate(chunk, offset)
+                        for parameter in (position, question_id, value)
+                    ],
+                )
+                async for row in cur:
+                    # Earliest answer wins if several normalize to the same text
+                    question = (
+                        None if row["id"] is None else self._build_quiz_question(row)
+                    )
+                    answer = None
+                    if row["answer_id"] is not None:
+                        answer = QuizAnswerModel(
+                            id=row["answer_id"],
+                            question_id=row["id"],
+                            right=bool(row["right"]),
+                            value=row["value"],
+                        )
+                    result[row["position"]] = (question, answer)
+        return result
+
+    @traced
     async def get_quiz_answer(self, answer_id: int) -> Optional[QuizAnswerModel]:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT * FROM quiz_answer WHERE id=?",
                 (answer_id,),
             )
             return self._build_quiz_answer(await cur.fetchone())
 
+    @traced
     async def get_quiz_question(self, question_id: int) -> Optional[QuizQuestionModel]:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT * FROM quiz_question WHERE id=?",
                 (question_id,),
             )
             return self._build_quiz_question(await cur.fetchone())
 
+    @traced
+    async def list_quiz_question_ids(self, quiz_id: int) -> List[int]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT question_id FROM quiz_question_link WHERE quiz_id=? ORDER BY position",
+                (quiz_id,),
+            )
+            return [row["question_id"] for row in await cur.fetchall()]
+
+    @traced
+    async def list_quiz_questions_with_answers(
+        self, question_ids: Sequence[int]
+    ) -> Iterable[Tuple[QuizQuestionModel, List[QuizAnswerModel]]]:
+        if not question_ids:
+            return []
+
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT quiz_question.id, quiz_question.question, "
+                "quiz_answer.id AS answer_id, quiz_answer.right, quiz_answer.value "
+                "FROM quiz_question LEFT JOIN quiz_answer ON quiz_answer.question_id = quiz_question.id "
+                "WHERE quiz_question.id IN ({}) ORDER BY quiz_answer.id".format(
+                    ", ".join("?" * len(question_ids))
+                ),
+                tuple(question_ids),
+            )
+            return await self._build_questions_with_answers(cur)
+
+    async def _build_questions_with_answers(
+        self, cur: aiosqlite.Cursor
+    ) -> List[Tuple[QuizQuestionModel, List[QuizAnswerModel]]]:
+        # Rows of questions joined with their answers, ordered by answer id
+        result = {}
+        async for row in cur:
+            if row["id"] not in result:
+                result[row["id"]] = (self._build_quiz_question(row), [])
+            if row["answer_id"] is not None:
+                result[row["id"]][1].append(
+                    QuizAnswerModel(
+                        id=row["answer_id"],
+                        question_id=row["id"],
+                        right=bool(row["right"]),
+                        value=row["value"],
+                    )
+                )
+        return list(result.values())
+
+    @traced
+    async def get_quiz_session_by_user(
+        self, user_id: int, quiz_id: int
+    ) -> Optional[QuizSessionModel]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT * FROM quiz_session WHERE quiz_id=? AND user_id=?",
+                (quiz_id, user_id),
+            )
+            return self._build_quiz_session(await cur.fetchone())
+
+    @traced
+    async def list_quiz_sessions_by_user(
+        self, user_id: int, offset: int = 0, limit: int = 20
+    ) -> List[QuizSessionModel]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT * FROM quiz_session WHERE user_id=? ORDER BY created_at DESC, id DESC LIMIT ?, ?",
+                (user_id, offset, limit),
+            )
+            return [self._build_quiz_session(row) for row in await cur.fetchall()]
+
+    @traced
+    async def update_quiz_session_score(
+        self, session_id: int, correct: int, total: int
+    ):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "UPDATE quiz_session SET correct=?, total=? WHERE id=?",
+                (correct, total, session_id),
+            )
+
+    @traced
+    async def list_quiz_session_answers(
+        self, session_id: int
+    ) -> Iterable[QuizSessionAnswerModel]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                f"{SESSION_ANSWER_QUERY} WHERE quiz_session_answer.session_id=? ORDER BY quiz_session_answer.id",
+                (session_id,),
+            )
+            result = []
+            async for row in cur:
+                result.append(self._build_quiz_session_answer(row))
+            if result:
+                return result
+
+            await cur.execute(
+                "SELECT answers FROM quiz_session_archive WHERE session_id=?",
+                (session_id,),
+            )
+            row = await cur.fetchone()
+            return decode_session_answers(session_id, row["answers"]) if row else []
+
+    @traced
     async def create_user(
         self,
         telegram_id: int,
@@ -242,7 +973,7 @@ class MemoryRepository(Repository):
         last_name: Optional[str] = None,
         username: Optional[str] = None,
     ) -> UserModel:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "INSERT INTO user(telegram_id, language, first_name, last_name, username) VALUES (?, ?, ?, ?, ?)",
                 (telegram_id, str(language), first_name, last_name, username),
@@ -257,8 +988,155 @@ class MemoryRepository(Repository):
                 language=language,
             )
 
+    @traced
+    async def upsert_user(
+        self,
+        telegram_id: int,
+        language: Locale,
+        first_name: str,
+        last_name: Optional[str] = None,
+        username: Optional[str] = None,
+    ) -> UserModel:
+        async with self._cursor() as cur:
+            await cur.execute(
+                f"{USER_UPSERT_QUERY} RETURNING *",
+                (telegram_id, str(language), first_name, last_name, username),
+            )
+            return self._build_user(await cur.fetchone())
+
+    @traced
+    async def upsert_users(
+        self,
+        users: Sequence[Tuple[int, Locale, str, Optional[str], Optional[str]]],
+    ) -> List[UserModel]:
+        if not users:
+            return []
+
+        async with self._cursor() as cur:
+            # Rows returned by executemany are discarded, so read users back
+            await cur.executemany(
+                USER_UPSERT_QUERY,
+                [
+                    (telegram_id, str(language), first_name, last_name, username)
+                    for telegram_id, language, first_name, last_name, username in users
+                ],
+            )
+
+            telegram_ids = list(dict.fromkeys(user[0] for user in users))
+            stored = {}
+            for start in range(0, len(telegram_ids), USER_CHUNK_SIZE):
+                chunk = telegram_ids[start : start + USER_CHUNK_SIZE]
+                await cur.execute(
+                    "SELECT * FROM user WHERE telegram_id IN ({})".format(
+                        ", ".join("?" * len(chunk))
+                    ),
+                    chunk,
+                )
+                for row in await cur.fetchall():
+                    stored[row["telegram_id"]] = self._build_user(row)
+            return [stored[user[0]] for user in users]
+
+    async def iter_users_by_language(
+        self, language: Locale, after_id: int = 0, chunk_size: int = 1000
+    ) -> AsyncIterator[List[UserModel]]:
+        while True:
+            async with self._cursor() as cur:
+                await cur.execute(
+                    "SELECT * FROM user WHERE LOWER(language) = LOWER(?) AND id > ? ORDER BY id LIMIT ?",
+                    (str(language), after_id, chunk_size),
+                )
+                users = [self._build_user(row) for row in await cur.fetchall()]
+
+            if users:
+                yield users
+            if len(users) < chunk_size:
+                return
+            after_id = users[-1].id
+
+    async def _delete_user_chunk(
+        self, user_id: int, chunk_size: int
+    ) -> Tuple[int, int, int, bool]:
+        # Foreign keys aren't enforced, so history is deleted explicitly:
+        # answers first, then sessions, then the user
+        async with self.transaction():
+            async with self._cursor() as cur:
+                await cur.execute(
+                    "DELETE FROM quiz_session_answer WHERE id IN ("
+                    "SELECT quiz_session_answer.id FROM quiz_session "
+                    "JOIN quiz_session_answer ON quiz_session_answer.session_id = quiz_session.id "
+                    "WHERE quiz_session.user_id = ? LIMIT ?)",
+                    (user_id, chunk_size),
+                )
+                answers = cur.rowcount
+                if answers == chunk_size:
+                    return 0, 0, answers, False
+
+                limit = chunk_size - answers
+                await cur.execute(
+                    "SELECT id FROM quiz_session WHERE user_id = ? LIMIT ?",
+                    (user_id, limit),
+                )
+                session_ids = [row["id"] for row in await cur.fetchall()]
+                if session_ids:
+                    placeholders = ", ".join("?" * len(session_ids))
+                    await cur.execute(
+                        f"DELETE FROM quiz_session_archive WHERE session_id IN ({placeholders})",
+                        session_ids,
+                    )
+                    await cur.execute(
+                        f"DELETE FROM quiz_session WHERE id IN ({placeholders})",
+                        session_ids,
+                    )
+                if len(session_ids) == limit:
+                    return 0, len(session_ids), answers, False
+
+                await cur.execute(
+                    "DELETE FROM quiz_session_checkpoint WHERE user_id = ?", (user_id,)
+                )
+                await cur.execute("DELETE FROM user WHERE id = ?", (user_id,))
+                return cur.rowcount, len(session_ids), answers, True
+
+    @traced
+    async def delete_user(
+        self,
+        user_id: int,
+        chunk_size: int = 500,
+        progress: Optional[Callable[[UserDeletionModel], None]] = None,
+    ) -> UserDeletionModel:
+        return await self.purge_users([user_id], chunk_size, progress)
+
+    @traced
+    async def purge_users(
+        self,
+        user_ids: Iterable[int],
+        chunk_size: int = 500,
+        progress: Optional[Callable[[UserDeletionModel], None]] = None,
+    ) -> UserDeletionModel:
+        users = sessions = answers = 0
+        for user_id in user_ids:
+            done = False
+            while not done:
+                (
+                    deleted_users,
+                    deleted_sessions,
+                    deleted_answers,
+                    done,
+                ) = await self._delete_user_chunk(user_id, chunk_size)
+                users += deleted_users
+                sessions += deleted_sessions
+                answers += deleted_answers
+                if progress is not None:
+                    progress(
+                        UserDeletionModel(
+                            users=users, sessions=sessions, answers=answers
+                        )
+                    )
+
+        return UserDeletionModel(users=users, sessions=sessions, answers=answers)
+
+    @traced
     async def create_quiz(self, description: str, language: Locale) -> QuizModel:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "INSERT INTO quiz(description, language) VALUES (?, ?)",
                 (description, str(language)),
@@ -270,30 +1148,128 @@ class MemoryRepository(Repository):
                 language=language,
             )
 
+    @traced
     async def create_quiz_question(
         self, quiz_id: int, question: str
     ) -> QuizQuestionModel:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
-                "INSERT INTO quiz_question(quiz_id, question) VALUES (?, ?)",
-                (quiz_id, question),
+                "INSERT INTO quiz_question(question) VALUES (?)",
+                (question,),
             )
             id = cur.lastrowid
+            await self._link_quiz_questions(cur, quiz_id, [id])
+            self.notify_quiz_changed(quiz_id)
             return QuizQuestionModel(
                 id=id,
-                quiz_id=quiz_id,
                 question=question,
             )
 
+    @traced
+    async def create_bank_question(self, question: str) -> QuizQuestionModel:
+        async with self._cursor() as cur:
+            await cur.execute(
+                "INSERT INTO quiz_question(question) VALUES (?)",
+                (question,),
+            )
+            return QuizQuestionModel(
+                id=cur.lastrowid,
+                question=question,
+            )
+
+    @traced
+    async def find_bank_questions(
+        self, questions: Sequence[str]
+    ) -> Iterable[Tuple[QuizQuestionModel, List[QuizAnswerModel]]]:
+        if not questions:
+            return []
+
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT quiz_question.id, quiz_question.question, "
+                "quiz_answer.id AS answer_id, quiz_answer.right, quiz_answer.value "
+                "FROM quiz_question LEFT JOIN quiz_answer ON quiz_answer.question_id = quiz_question.id "
+                "WHERE quiz_question.question IN ({}) ORDER BY quiz_question.id, quiz_answer.id".format(
+                    ", ".join("?" * len(questions))
+                ),
+                tuple(questions),
+            )
+            return await self._build_questions_with_answers(cur)
+
+    @traced
+    async def list_question_quiz_ids(
+        self, question_ids: Sequence[int]
+    ) -> Dict[int, List[int]]:
+        if not question_ids:
+            return {}
+
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT question_id, quiz_id FROM quiz_question_link "
+                "WHERE question_id IN ({}) ORDER BY quiz_id".format(
+                    ", ".join("?" * len(question_ids))
+                ),
+                tuple(question_ids),
+            )
+            result: Dict[int, List[int]] = {}
+            for row in await cur.fetchall():
+                result.setdefault(row["question_id"], []).append(row["quiz_id"])
+            return result
+
+    async def _link_quiz_questions(
+        self, cur: aiosqlite.Cursor, quiz_id: int, question_ids: Sequence[int]
+    ):
+        await cur.execute(
+            "SELECT MAX(position) FROM quiz_question_link WHERE quiz_id=?", (quiz_id,)
+        )
+        last = (await cur.fetchone())[0] or 0
+        await cur.executemany(
+            "INSERT INTO quiz_question_link(quiz_id, position, question_id) VALUES (?, ?, ?)",
+            [
+                (quiz_id, position, question_id)
+                for position, question_id in enumerate(question_ids, last + 1)
+            ],
+        )
+
+    @traced
+    async def add_quiz_questions(self, quiz_id: int, question_ids: Sequence[int]):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT question_id FROM quiz_question_link WHERE quiz_id=?", (quiz_id,)
+            )
+            linked = {row["question_id"] for row in await cur.fetchall()}
+            question_ids = [
+                question_id
+                for question_id in dict.fromkeys(question_ids)
+                if question_id not in linked
+            ]
+            if not question_ids:
+                return
+            await self._link_quiz_questions(cur, quiz_id, question_ids)
+        self.notify_quiz_changed(quiz_id)
+
+    @traced
+    async def set_quiz_questions(self, quiz_id: int, question_ids: Sequence[int]):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "DELETE FROM quiz_question_link WHERE quiz_id=?", (quiz_id,)
+            )
+            await self._link_quiz_questions(
+                cur, quiz_id, list(dict.fromkeys(question_ids))
+            )
+        self.notify_quiz_changed(quiz_id)
+
+    @traced
     async def create_quiz_answer(
         self, question_id: int, value: str, right: bool
     ) -> QuizAnswerModel:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "INSERT INTO quiz_answer(question_id, value, right) VALUES (?, ?, ?)",
                 (question_id, value, right),
             )
             id = cur.lastrowid
+            self.notify_question_changed(question_id)
             return QuizAnswerModel(
                 id=id,
                 question_id=question_id,
@@ -301,30 +1277,151 @@ class MemoryRepository(Repository):
                 right=right,
             )
 
+    @traced
+    async def update_quiz(self, quiz_id: int, description: str, language: Locale):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "UPDATE quiz SET description=?, language=? WHERE id=?",
+                (description, str(language), quiz_id),
+            )
+        self.notify_quiz_changed(quiz_id)
+
+    @traced
+    async def update_quiz_answer(self, answer_id: int, right: bool):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT question_id FROM quiz_answer WHERE id=?", (answer_id,)
+            )
+            row = await cur.fetchone()
+            await cur.execute(
+                'UPDATE quiz_answer SET "right"=? WHERE id=?', (right, answer_id)
+            )
+        if row is not None:
+            self.notify_question_changed(row["question_id"])
+
+    @traced
+    async def delete_quiz_questions(self, question_ids: Sequence[int]):
+        if not question_ids:
+            return
+
+        placeholders = ", ".join("?" * len(question_ids))
+        async with self._cursor() as cur:
+            await cur.execute(
+                f"SELECT DISTINCT quiz_id FROM quiz_question_link WHERE question_id IN ({placeholders})",
+                tuple(question_ids),
+            )
+            quiz_ids = [row["quiz_id"] for row in await cur.fetchall()]
+            await cur.execute(
+                f"DELETE FROM quiz_question_link WHERE question_id IN ({placeholders})",
+                tuple(question_ids),
+            )
+            # Foreign keys aren't enforced, answers and stats go explicitly.
+            # Ids are never reused, so past sessions may keep deleted ones
+            await cur.execute(
+                f"DELETE FROM quiz_answer_stats WHERE answer_id IN ("
+                f"SELECT id FROM quiz_answer WHERE question_id IN ({placeholders}))",
+                tuple(question_ids),
+            )
+            await cur.execute(
+                f"DELETE FROM quiz_answer WHERE question_id IN ({placeholders})",
+                tuple(question_ids),
+            )
+            await cur.execute(
+                f"DELETE FROM quiz_question_stats WHERE question_id IN ({placeholders})",
+                tuple(question_ids),
+            )
+            await cur.execute(
+                f"DELETE FROM quiz_question WHERE id IN ({placeholders})",
+                tuple(question_ids),
+            )
+        for quiz_id in quiz_ids:
+            self.notify_quiz_changed(quiz_id)
+        for question_id in question_ids:
+            self.notify_question_changed(question_id)
+
+    @traced
+    async def delete_quiz_answers(self, answer_ids: Sequence[int]):
+        if not answer_ids:
+            return
+
+        placeholders = ", ".join("?" * len(answer_ids))
+        async with self._cursor() as cur:
+            await cur.execute(
+                f"SELECT DISTINCT question_id FROM quiz_answer WHERE id IN ({placeholders})",
+                tuple(answer_ids),
+            )
+            question_ids = [row["question_id"] for row in await cur.fetchall()]
+            await cur.execute(
+                f"DELETE FROM quiz_answer_stats WHERE answer_id IN ({placeholders})",
+                tuple(answer_ids),
+            )
+            await cur.execute(
+                f"DELETE FROM quiz_answer WHERE id IN ({placeholders})",
+                tuple(answer_ids),
+            )
+        for question_id in question_ids:
+            self.notify_question_changed(question_id)
+
+    @traced
+    async def list_quiz_contents(self) -> List[QuizContentModel]:
+        async with self._cursor() as cur:
+            await cur.execute("SELECT quiz_id, key, hash FROM quiz_content")
+            return [
+                QuizContentModel(
+                    quiz_id=row["quiz_id"], key=row["key"], hash=bytes(row["hash"])
+                )
+                for row in await cur.fetchall()
+            ]
+
+    @traced
+    async def save_quiz_content(self, quiz_id: int, key: str, hash: bytes):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "INSERT INTO quiz_content(quiz_id, key, hash) VALUES (?, ?, ?) "
+                "ON CONFLICT(quiz_id) DO UPDATE SET key=excluded.key, hash=excluded.hash",
+                (quiz_id, key, hash),
+            )
+
+    @traced
     async def create_quiz_session(
         self, user_id: int, quiz_id: int, description: str, language: Locale
     ) -> QuizSessionModel:
-        async with self.connection.cursor() as cur:
+        created_at = time.time()
+        async with self._cursor() as cur:
+            try:
+                await cur.execute(
+                    "INSERT INTO quiz_session(user_id, quiz_id, description, language, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, quiz_id, description, str(language), created_at),
+                )
+            except sqlite3.IntegrityError as error:
+                if "quiz_session.quiz_id, quiz_session.user_id" not in str(error):
+                    raise
+                raise QuizSessionExistsError(
+                    user_id=user_id, quiz_id=quiz_id
+                ) from error
+            id = cur.lastrowid
             await cur.execute(
-                "INSERT INTO quiz_session(user_id, quiz_id, description, language) VALUES (?, ?, ?, ?)",
-                (user_id, quiz_id, description, str(language)),
+                "UPDATE quiz SET plays = plays + 1 WHERE id=?", (quiz_id,)
             )
-            id = cur.lastrowid
             return QuizSessionModel(
                 id=id,
                 user_id=user_id,
                 quiz_id=quiz_id,
                 description=description,
                 language=language,
+                created_at=created_at,
             )
 
+    @traced
     async def create_quiz_session_answer(
         self, session_id: int, answer_id: int, question: str, answer: str, right: bool
     ) -> QuizSessionAnswerModel:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
+            question_text_id = await self._intern_text(cur, question)
+            answer_text_id = await self._intern_text(cur, answer)
             await cur.execute(
-                "INSERT INTO quiz_session_answer(session_id, answer_id, question, answer, right) VALUES (?, ?, ?, ?, ?)",
-                (session_id, answer_id, question, answer, right),
+                "INSERT INTO quiz_session_answer(session_id, answer_id, question_text_id, answer_text_id, right) VALUES (?, ?, ?, ?, ?)",
+                (session_id, answer_id, question_text_id, answer_text_id, right),
             )
             id = cur.lastrowid
             return QuizSessionAnswerModel(
@@ -336,6 +1433,7 @@ class MemoryRepository(Repository):
                 right=right,
             )
 
+    @traced
     async def update_user(
         self,
         user_id: int,
@@ -344,7 +1442,7 @@ class MemoryRepository(Repository):
         last_name: Union[str, None, object] = ...,
         username: Union[str, None, object] = ...,
     ):
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             constraints, values = self._generate_constraints(
                 language=str(language),
                 first_name=first_name,
@@ -358,10 +1456,11 @@ class MemoryRepository(Repository):
                 (*values, user_id),
             )
 
+    @traced
     async def list_quizzes_by_language(
         self, language: Locale, offset: Optional[int] = 0, limit: Optional[int] = 100
     ) -> Iterable[QuizModel]:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT * FROM quiz WHERE LOWER(language) = LOWER(?) LIMIT ?, ?",
                 (str(language), offset, limit),
@@ -371,10 +1470,478 @@ class MemoryRepository(Repository):
                 result.append(self._build_quiz(row))
             return result
 
+    @traced
+    async def list_quizzes_by_languages(
+        self,
+        languages: Sequence[Locale],
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+    ) -> Tuple[int, Iterable[QuizModel]]:
+        languages = [str(language) for language in languages]
+        if not languages:
+            return 0, []
+
+        placeholders = ", ".join(["LOWER(?)"] * len(languages))
+        priorities = " ".join(
+            f"WHEN LOWER(?) THEN {priority}" for priority in range(len(languages))
+        )
+        async with self._cursor() as cur:
+            # Window function counts matches in the same pass as listing
+            await cur.execute(
+                f"SELECT *, COUNT(*) OVER () AS `count` FROM quiz WHERE LOWER(language) IN ({placeholders}) "
+                f"ORDER BY CASE LOWER(language) {priorities} END, id LIMIT ?, ?",
+                (*languages, *languages, offset, limit),
+            )
+            count = None
+            result = []
+            async for row in cur:
+                count = row["count"]
+                result.append(self._build_quiz(row))
+
+        if count is None:
+            # Page is past the end, count has to be queried separately
+            async with self._cursor() as cur:
+                await cur.execute(
+                    f"SELECT COUNT(id) AS `count` FROM quiz WHERE LOWER(language) IN ({placeholders})",
+                    languages,
+                )
+                count = (await cur.fetchone())["count"]
+
+        return count, result
+
+    @traced
+    async def list_popular_quizzes(
+        self,
+        language: Locale,
+        after: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = 100,
+    ) -> List[QuizModel]:
+        if after is None:
+            constraint, values = "", ()
+        else:
+            constraint, values = "AND (plays, id) < (?, ?) ", after
+        async with self._cursor() as cur:
+            await cur.execute(
+                f"SELECT * FROM quiz WHERE LOWER(language) = LOWER(?) {constraint}"
+                "ORDER BY plays DESC, id DESC LIMIT ?",
+                (str(language), *values, -1 if limit is None else limit),
+            )
+            return [self._build_quiz(row) for row in await cur.fetchall()]
+
+    @traced
+    async def list_quiz_languages(self) -> List[Locale]:
+        async with self._cursor() as cur:
+            await cur.execute("SELECT DISTINCT language FROM quiz ORDER BY language")
+            return [LazyLocale.parse(row["language"]) for row in await cur.fetchall()]
+
+    @traced
     async def count_quizzes_by_language(self, language: Locale) -> int:
-        async with self.connection.cursor() as cur:
+        async with self._cursor() as cur:
             await cur.execute(
                 "SELECT COUNT(id) AS `count` FROM quiz WHERE LOWER(language) = LOWER(?)",
                 (str(language),),
             )
             return (await cur.fetchone())["count"]
+
+    @traced
+    async def save_quiz_session_checkpoint(
+        self, user_id: int, quiz_id: int, answers: Dict[int, int]
+    ):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "INSERT INTO quiz_session_checkpoint(user_id, quiz_id, answers, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, quiz_id) DO UPDATE SET answers=excluded.answers, updated_at=excluded.updated_at",
+                (user_id, quiz_id, json.dumps(answers), time.time()),
+            )
+
+    @traced
+    async def delete_quiz_session_checkpoint(self, user_id: int, quiz_id: int):
+        async with self._cursor() as cur:
+            await cur.execute(
+                "DELETE FROM quiz_session_checkpoint WHERE user_id=? AND quiz_id=?",
+                (user_id, quiz_id),
+            )
+
+    @traced
+    async def list_quiz_session_checkpoints(
+        self, updated_after: Optional[float] = None
+    ) -> Iterable[QuizSessionCheckpointModel]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT * FROM quiz_session_checkpoint WHERE updated_at >= ?",
+                (updated_after or 0,),
+            )
+            result = []
+            async for row in cur:
+                result.append(self._build_quiz_session_checkpoint(row))
+            return result
+
+    @traced
+    async def search_quizzes(
+        self,
+        text: str,
+        language: Optional[Locale] = None,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+    ) -> Iterable[QuizModel]:
+        query = self._build_match_query(text)
+        if query is None:
+            return []
+
+        async with self._cursor() as cur:
+            await cur.execute(
+                "SELECT quiz.*, MIN(matches.rank) AS rank FROM ("
+                "SELECT rowid AS quiz_id, bm25(quiz_fts) AS rank FROM quiz_fts WHERE quiz_fts MATCH :query "
+                "UNION ALL "
+                "SELECT quiz_question_link.quiz_id, bm25(quiz_question_fts) * :weight FROM quiz_question_fts "
+                "JOIN quiz_question_link ON quiz_question_link.question_id = quiz_question_fts.rowid "
+                "WHERE quiz_question_fts MATCH :query"
+                ") AS matches JOIN quiz ON quiz.id = matches.quiz_id "
+                "WHERE :language IS NULL OR LOWER(quiz.language) = LOWER(:language) "
+                "GROUP BY quiz.id ORDER BY rank, quiz.id LIMIT :offset, :limit",
+                {
+                    "query": query,
+                    "weight": SEARCH_QUESTION_WEIGHT,
+                    "language": None if language is None else str(language),
+                    "offset": offset,
+                    "limit": limit,
+                },
+            )
+            result = []
+            async for row in cur:
+                result.append(self._build_quiz(row))
+            return result
+
+    @traced
+    async def increment_quiz_answer_stats(
+        self, answers: Iterable[Tuple[int, int, bool]]
+    ):
+        answers = list(answers)
+        async with self._cursor() as cur:
+            await cur.executemany(
+                'INSERT INTO quiz_question_stats(question_id, answered, "right") VALUES (?, 1, ?) '
+                'ON CONFLICT(question_id) DO UPDATE SET answered=answered + 1, "right"="right" + excluded."right"',
+                [(question_id, right) for question_id, _, right in answers],
+            )
+            await cur.executemany(
+                "INSERT INTO quiz_answer_stats(answer_id, chosen) VALUES (?, 1) "
+                "ON CONFLICT(answer_id) DO UPDATE SET chosen=chosen + 1",
+                [(answer_id,) for _, answer_id, _ in answers],
+            )
+
+    @traced
+    async def get_last_session_answer_id(self) -> int:
+        async with self._cursor() as cur:
+            await cur.execute("SELECT IFNULL(MAX(id), 0) FROM quiz_session_answer")
+            return (await cur.fetchone())[0]
+
+    async def iter_answered_questions(
+        self, chunk_size: int = 10000, after_id: Optional[int] = None
+    ) -> AsyncIterator[List[Tuple[int, int, bool]]]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                'SELECT quiz_answer.question_id, quiz_session_answer.answer_id, quiz_session_answer."right" '
+                "FROM quiz_session_answer JOIN quiz_answer ON quiz_answer.id = quiz_session_answer.answer_id "
+                "WHERE quiz_session_answer.id > ?",
+                (after_id or 0,),
+            )
+            while True:
+                rows = await cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+            if after_id is not None:
+                return
+
+            # Archived sessions keep answer ids, question ids are looked up
+            await cur.execute("SELECT session_id, answers FROM quiz_session_archive")
+            while True:
+                rows = await cur.fetchmany(max(1, chunk_size // 10))
+                if not rows:
+                    break
+
+                answers = [
+                    answer
+                    for row in rows
+                    for answer in decode_session_answers(
+                        row["session_id"], row["answers"]
+                    )
+                    if answer.answer_id is not None
+                ]
+                question_ids = {}
+                async with self._cursor() as lookup:
+                    for offset in range(0, len(answers), chunk_size):
+                        answer_ids = {
+                            answer.answer_id
+                            for answer in answers[offset : offset + chunk_size]
+                        }
+                        await lookup.execute(
+                            "SELECT id, question_id FROM quiz_answer WHERE id IN ({})".format(
+                                ", ".join("?" * len(answer_ids))
+                            ),
+                            tuple(answer_ids),
+                        )
+                        for answer_row in await lookup.fetchall():
+                            question_ids[answer_row["id"]] = answer_row["question_id"]
+
+                answers = [
+                    (question_ids[answer.answer_id], answer.answer_id, answer.right)
+                    for answer in answers
+                    if answer.answer_id in question_ids
+                ]
+                for offset in range(0, len(answers), chunk_size):
+                    yield answers[offset : offset + chunk_size]
+
+    @traced
+    async def replace_quiz_answer_stats(
+        self,
+        questions: Iterable[Tuple[int, int, int]],
+        answers: Iterable[Tuple[int, int]],
+    ):
+        async with self._cursor() as cur:
+            await cur.execute("DELETE FROM quiz_question_stats")
+            await cur.execute("DELETE FROM quiz_answer_stats")
+            await cur.executemany(
+                'INSERT INTO quiz_question_stats(question_id, answered, "right") VALUES (?, ?, ?)',
+                questions,
+            )
+            await cur.executemany(
+                "INSERT INTO quiz_answer_stats(answer_id, chosen) VALUES (?, ?)",
+                answers,
+            )
+
+    @traced
+    async def list_quiz_question_stats(
+        self, quiz_id: int
+    ) -> Iterable[QuizQuestionStatsModel]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                'SELECT quiz_question.id, quiz_question.question, IFNULL(stats.answered, 0) AS answered, IFNULL(stats."right", 0) AS "right" '
+                "FROM quiz_question_link JOIN quiz_question ON quiz_question.id = quiz_question_link.question_id "
+                "LEFT JOIN quiz_question_stats AS stats ON stats.question_id = quiz_question.id "
+                "WHERE quiz_question_link.quiz_id=? ORDER BY quiz_question_link.position",
+                (quiz_id,),
+            )
+            result = []
+            async for row in cur:
+                result.append(
+                    QuizQuestionStatsModel(
+                        question_id=row["id"],
+                        question=row["question"],
+                        answered=row["answered"],
+                        right=row["right"],
+                    )
+                )
+            return result
+
+    @traced
+    async def list_quiz_answer_stats(
+        self, quiz_id: int
+    ) -> Iterable[QuizAnswerStatsModel]:
+        async with self._cursor() as cur:
+            await cur.execute(
+                'SELECT quiz_answer.id, quiz_answer.question_id, quiz_answer.value, quiz_answer."right", IFNULL(stats.chosen, 0) AS chosen '
+                "FROM quiz_question_link JOIN quiz_answer ON quiz_answer.question_id = quiz_question_link.question_id "
+                "LEFT JOIN quiz_answer_stats AS stats ON stats.answer_id = quiz_answer.id "
+                "WHERE quiz_question_link.quiz_id=? ORDER BY quiz_answer.id",
+                (quiz_id,),
+            )
+            result = []
+            async for row in cur:
+                result.append(
+                    QuizAnswerStatsModel(
+                        answer_id=row["id"],
+                        question_id=row["question_id"],
+                        value=row["value"],
+                        right=bool(row["right"]),
+                        chosen=row["chosen"],
+                    )
+                )
+            return result
+
+    @traced
+    async def archive_quiz_sessions(
+        self, created_before: float, chunk_size: int = 100
+    ) -> int:
+        archived = 0
+        while True:
+            async with self.transaction():
+                async with self._cursor() as cur:
+                    await cur.execute(
+                        "SELECT id FROM quiz_session WHERE archived = 0 AND created_at < ? ORDER BY created_at LIMIT ?",
+                        (created_before, chunk_size),
+                    )
+                    session_ids = [row["id"] for row in await cur.fetchall()]
+                    if not session_ids:
+                        return archived
+
+                    placeholders = ", ".join("?" * len(session_ids))
+                    await cur.execute(
+                        f"{SESSION_ANSWER_QUERY} WHERE quiz_session_answer.session_id IN ({placeholders}) "
+                        "ORDER BY quiz_session_answer.id",
+                        session_ids,
+                    )
+                    answers = {session_id: [] for session_id in session_ids}
+                    async for row in cur:
+                        answers[row["session_id"]].append(
+                            self._build_quiz_session_answer(row)
+                        )
+
+                    await cur.executemany(
+                        "INSERT INTO quiz_session_archive(session_id, answers) VALUES (?, ?)",
+                        [
+                            (session_id, encode_session_answers(session_answers))
+                            for session_id, session_answers in answers.items()
+                        ],
+                    )
+                    await cur.execute(
+                        f"DELETE FROM quiz_session_answer WHERE session_id IN ({placeholders})",
+                        session_ids,
+                    )
+                    await cur.execute(
+                        f"UPDATE quiz_session SET archived = 1 WHERE id IN ({placeholders})",
+                        session_ids,
+                    )
+                    archived += len(session_ids)
+
+    @traced
+    async def export_session_results(
+        self, directory: str, chunk_size: int = 10000
+    ) -> Dict[str, int]:
+        """
+        Export quiz sessions and their answers, archived ones included, into
+        columnar files read by :class:`ColumnarExport`. Rows are read in
+        chunks by short queries and written in executor, so neither memory
+        nor repository lock is held for whole export. Sessions created during
+        export are skipped, answers of sessions archived during export may be
+        missing
+
+        Requires NumPy ( stats extra )
+
+        :param directory: replaced when export is complete
+        :param chunk_size: rows read at once
+        :return: number of exported rows of every table
+        """
+        loop = asyncio.get_running_loop()
+        writer = await loop.run_in_executor(
+            None, ColumnarWriter, directory, RESULT_TABLES
+        )
+        try:
+            async with self._cursor() as cur:
+                await cur.execute("SELECT MAX(id) FROM quiz_session")
+                max_session_id = (await cur.fetchone())[0] or 0
+                await cur.execute("SELECT MAX(id) FROM quiz_session_answer")
+                max_answer_id = (await cur.fetchone())[0] or 0
+
+            after_id = 0
+            while True:
+                async with self._cursor() as cur:
+                    await cur.execute(
+                        "SELECT id, COALESCE(quiz_id, -1), user_id, description, language, "
+                        "created_at, correct, total, archived FROM quiz_session "
+                        "WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                        (after_id, max_session_id, chunk_size),
+                    )
+                    rows = [tuple(row) for row in await cur.fetchall()]
+                if not rows:
+                    break
+                await loop.run_in_executor(None, writer.append, "quiz_session", rows)
+                after_id = rows[-1][0]
+
+            # Archived answers first, archiving moves answers out of live rows,
+            # so no answer is exported twice
+            after_id = 0
+            while True:
+                async with self._cursor() as cur:
+                    await cur.execute(
+                        "SELECT session_id, answers FROM quiz_session_archive "
+                        "WHERE session_id > ? AND session_id <= ? ORDER BY session_id LIMIT ?",
+                        (after_id, max_session_id, max(1, chunk_size // 10)),
+                    )
+                    archives = await cur.fetchall()
+                if not archives:
+                    break
+                rows = [
+                    (
+                        answer.id,
+                        answer.session_id,
+                        -1 if answer.answer_id is None else answer.answer_id,
+                        answer.question,
+                        answer.answer,
+                        answer.right,
+                    )
+                    for archive in archives
+                    for answer in decode_session_answers(
+                        archive["session_id"], archive["answers"]
+                    )
+                ]
+                await loop.run_in_executor(
+                    None, writer.append, "quiz_session_answer", rows
+                )
+                after_id = archives[-1]["session_id"]
+
+            after_id = 0
+            while True:
+                async with self._cursor() as cur:
+                    await cur.execute(
+                        f"{SESSION_ANSWER_QUERY} WHERE quiz_session_answer.id > ? "
+                        "AND quiz_session_answer.id <= ? ORDER BY quiz_session_answer.id LIMIT ?",
+                        (after_id, max_answer_id, chunk_size),
+                    )
+                    rows = [
+                        (
+                            row["id"],
+                            row["session_id"],
+                            -1 if row["answer_id"] is None else row["answer_id"],
+                            row["question"],
+                            row["answer"],
+                            row["right"],
+                        )
+                        for row in await cur.fetchall()
+                    ]
+                if not rows:
+                    break
+                await loop.run_in_executor(
+                    None, writer.append, "quiz_session_answer", rows
+                )
+                after_id = rows[-1][0]
+        except BaseException:
+            await loop.run_in_executor(None, writer.abort)
+            raise
+
+        return await loop.run_in_executor(None, writer.commit)
+
+    @traced
+    async def export_catalog_snapshot(self, path: str) -> int:
+        """
+        Compile quizzes, questions and answers into snapshot file read by
+        :class:`CatalogSnapshot`
+
+        :param path:
+        :return: generation of snapshot
+        """
+        async with self.transaction(write=False):
+            async with self._cursor() as cur:
+                await cur.execute("SELECT id, description, language, plays FROM quiz")
+                quizzes = [self._build_quiz(row) for row in await cur.fetchall()]
+                await cur.execute(
+                    "SELECT quiz_question.id, quiz_question.question FROM quiz_question "
+                    "WHERE id IN (SELECT question_id FROM quiz_question_link)"
+                )
+                questions = [
+                    self._build_quiz_question(row) for row in await cur.fetchall()
+                ]
+                await cur.execute(
+                    "SELECT quiz_id, question_id FROM quiz_question_link ORDER BY quiz_id, position"
+                )
+                links = [tuple(row) for row in await cur.fetchall()]
+                await cur.execute(
+                    'SELECT id, question_id, "right", value FROM quiz_answer '
+                    "WHERE question_id IN (SELECT question_id FROM quiz_question_link)"
+                )
+                answers = [self._build_quiz_answer(row) for row in await cur.fetchall()]
+
+        # Writing is blocking, keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, write_catalog_snapshot, path, quizzes, questions, answers, links
+        )
@@ -0,0 +1,326 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Schema migration, applied in single transaction together with version bump
+    """
+
+    version: int
+    script: str
+
+    # Only builds indexes, so it may run in background while bot already works
+    online: bool = False
+
+
+INITIAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "quiz" (
+	"id"	INTEGER,
+	"description"	TEXT NOT NULL,
+	"language"	TEXT NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT)
+);
+CREATE TABLE IF NOT EXISTS "quiz_answer" (
+	"id"	INTEGER,
+	"question_id"	INTEGER NOT NULL,
+	"right"	INTEGER NOT NULL,
+	"value"	TEXT NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT),
+	FOREIGN KEY("question_id") REFERENCES "quiz_question"("id") ON DELETE CASCADE,
+	UNIQUE("question_id","value")
+);
+CREATE TABLE IF NOT EXISTS "quiz_question" (
+	"id"	INTEGER,
+	"quiz_id"	INTEGER NOT NULL,
+	"question"	TEXT NOT NULL,
+	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE CASCADE,
+	PRIMARY KEY("id" AUTOINCREMENT)
+);
+CREATE TABLE IF NOT EXISTS "quiz_session" (
+	"id"	INTEGER,
+	"quiz_id"	INTEGER NOT NULL,
+	"user_id"	INTEGER NOT NULL,
+	"description"	TEXT NOT NULL,
+	"language"	TEXT NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT),
+	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE SET NULL,
+	FOREIGN KEY("user_id") REFERENCES "user"("id") ON DELETE CASCADE,
+	UNIQUE("quiz_id","user_id")
+);
+CREATE TABLE IF NOT EXISTS "quiz_session_answer" (
+	"id"	INTEGER,
+	"answer_id"	INTEGER,
+	"session_id"	INTEGER NOT NULL,
+	"question"	TEXT NOT NULL,
+	"answer"	TEXT NOT NULL,
+	"right"	INTEGER NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT),
+	FOREIGN KEY("answer_id") REFERENCES "quiz_answer"("id") ON DELETE SET NULL,
+	FOREIGN KEY("session_id") REFERENCES "quiz_session"("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "quiz_session_checkpoint" (
+	"user_id"	INTEGER NOT NULL,
+	"quiz_id"	INTEGER NOT NULL,
+	"answers"	TEXT NOT NULL,
+	"updated_at"	REAL NOT NULL,
+	PRIMARY KEY("user_id","quiz_id"),
+	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE CASCADE,
+	FOREIGN KEY("user_id") REFERENCES "user"("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "user" (
+	"id"	INTEGER,
+	"telegram_id"	INTEGER NOT NULL UNIQUE,
+	"first_name"	TEXT NOT NULL,
+	"last_name"	TEXT,
+	"username"	TEXT,
+	"language"	TEXT NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT),
+	UNIQUE("telegram_id")
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS "quiz_fts" USING fts5(
+	"description",
+	content="quiz",
+	content_rowid="id",
+	tokenize="unicode61 remove_diacritics 2"
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS "quiz_question_fts" USING fts5(
+	"question",
+	content="quiz_question",
+	content_rowid="id",
+	tokenize="unicode61 remove_diacritics 2"
+);
+CREATE TRIGGER IF NOT EXISTS "quiz_fts_insert_trg" AFTER INSERT ON "quiz" BEGIN
+	INSERT INTO "quiz_fts"("rowid", "description") VALUES (new."id", new."description");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_fts_delete_trg" AFTER DELETE ON "quiz" BEGIN
+	INSERT INTO "quiz_fts"("quiz_fts", "rowid", "description") VALUES ('delete', old."id", old."description");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_fts_update_trg" AFTER UPDATE OF "description" ON "quiz" BEGIN
+	INSERT INTO "quiz_fts"("quiz_fts", "rowid", "description") VALUES ('delete', old."id", old."description");
+	INSERT INTO "quiz_fts"("rowid", "description") VALUES (new."id", new."description");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_question_fts_insert_trg" AFTER INSERT ON "quiz_question" BEGIN
+	INSERT INTO "quiz_question_fts"("rowid", "question") VALUES (new."id", new."question");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_question_fts_delete_trg" AFTER DELETE ON "quiz_question" BEGIN
+	INSERT INTO "quiz_question_fts"("quiz_question_fts", "rowid", "question") VALUES ('delete', old."id", old."question");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_question_fts_update_trg" AFTER UPDATE OF "question" ON "quiz_question" BEGIN
+	INSERT INTO "quiz_question_fts"("quiz_question_fts", "rowid", "question") VALUES ('delete', old."id", old."question");
+	INSERT INTO "quiz_question_fts"("rowid", "question") VALUES (new."id", new."question");
+END;
+CREATE INDEX IF NOT EXISTS "quiz_answer_question_id_idx" ON "quiz_answer" (
+	"question_id"	ASC
+);
+CREATE INDEX IF NOT EXISTS "quiz_language_idx" ON "quiz" (
+	LOWER("language")
+);
+CREATE INDEX IF NOT EXISTS "quiz_question_quiz_id_idx" ON "quiz_question" (
+	"quiz_id"	ASC
+);
+CREATE INDEX IF NOT EXISTS "quiz_session_answer_session_id_idx" ON "quiz_session_answer" (
+	"session_id"	ASC
+);
+CREATE INDEX IF NOT EXISTS "quiz_session_user_id_idx" ON "quiz_session" (
+	"user_id"	ASC
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "user_telegram_id_idx" ON "user" (
+	"telegram_id"	ASC
+);
+"""
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    # Databases created before versioning have user_version 0 and may lack
+    # some of the tables, every statement is idempotent for them
+    Migration(
+        version=1,
+        script=INITIAL_SCHEMA
+        + """
+INSERT INTO "quiz_fts"("quiz_fts") VALUES ('rebuild');
+INSERT INTO "quiz_question_fts"("quiz_question_fts") VALUES ('rebuild');
+""",
+    ),
+    Migration(
+        version=2,
+        script="""
+CREATE TABLE IF NOT EXISTS "quiz_answer_stats" (
+	"answer_id"	INTEGER,
+	"chosen"	INTEGER NOT NULL DEFAULT 0,
+	PRIMARY KEY("answer_id"),
+	FOREIGN KEY("answer_id") REFERENCES "quiz_answer"("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "quiz_question_stats" (
+	"question_id"	INTEGER,
+	"answered"	INTEGER NOT NULL DEFAULT 0,
+	"right"	INTEGER NOT NULL DEFAULT 0,
+	PRIMARY KEY("question_id"),
+	FOREIGN KEY("question_id") REFERENCES "quiz_question"("id") ON DELETE CASCADE
+);
+""",
+    ),
+    Migration(
+        version=3,
+        script="""
+ALTER TABLE "quiz_session" ADD COLUMN "created_at" REAL NOT NULL DEFAULT 0;
+ALTER TABLE "quiz_session" ADD COLUMN "archived" INTEGER NOT NULL DEFAULT 0;
+CREATE TABLE IF NOT EXISTS "quiz_session_archive" (
+	"session_id"	INTEGER,
+	"answers"	BLOB NOT NULL,
+	PRIMARY KEY("session_id"),
+	FOREIGN KEY("session_id") REFERENCES "quiz_session"("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "quiz_session_unarchived_created_at_idx" ON "quiz_session" (
+	"created_at"	ASC
+) WHERE "archived" = 0;
+""",
+    ),
+    # Texts of session answers are interned, text_hash is registered on connect
+    Migration(
+        version=4,
+        script="""
+CREATE TABLE IF NOT EXISTS "quiz_session_text" (
+	"id"	INTEGER,
+	"hash"	BLOB NOT NULL UNIQUE,
+	"value"	TEXT NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT)
+);
+INSERT OR IGNORE INTO "quiz_session_text"("hash", "value")
+	SELECT text_hash("question"), "question" FROM "quiz_session_answer";
+INSERT OR IGNORE INTO "quiz_session_text"("hash", "value")
+	SELECT text_hash("answer"), "answer" FROM "quiz_session_answer";
+CREATE TABLE "quiz_session_answer_new" (
+	"id"	INTEGER,
+	"answer_id"	INTEGER,
+	"session_id"	INTEGER NOT NULL,
+	"question_text_id"	INTEGER NOT NULL,
+	"answer_text_id"	INTEGER NOT NULL,
+	"right"	INTEGER NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT),
+	FOREIGN KEY("answer_id") REFERENCES "quiz_answer"("id") ON DELETE SET NULL,
+	FOREIGN KEY("session_id") REFERENCES "quiz_session"("id") ON DELETE CASCADE,
+	FOREIGN KEY("question_text_id") REFERENCES "quiz_session_text"("id"),
+	FOREIGN KEY("answer_text_id") REFERENCES "quiz_session_text"("id")
+);
+INSERT INTO "quiz_session_answer_new"("id", "answer_id", "session_id", "question_text_id", "answer_text_id", "right")
+	SELECT "answer"."id", "answer"."answer_id", "answer"."session_id", "question_text"."id", "answer_text"."id", "answer"."right"
+	FROM "quiz_session_answer" AS "answer"
+	JOIN "quiz_session_text" AS "question_text" ON "question_text"."hash" = text_hash("answer"."question")
+	JOIN "quiz_session_text" AS "answer_text" ON "answer_text"."hash" = text_hash("answer"."answer");
+DROP TABLE "quiz_session_answer";
+ALTER TABLE "quiz_session_answer_new" RENAME TO "quiz_session_answer";
+CREATE INDEX IF NOT EXISTS "quiz_session_answer_session_id_idx" ON "quiz_session_answer" (
+	"session_id"	ASC
+);
+""",
+    ),
+    # Scores of sessions, archived_* functions are registered on connect
+    Migration(
+        version=5,
+        script="""
+ALTER TABLE "quiz_session" ADD COLUMN "correct" INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE "quiz_session" ADD COLUMN "total" INTEGER NOT NULL DEFAULT 0;
+UPDATE "quiz_session" SET
+	"correct" = (SELECT COUNT(*) FROM "quiz_session_answer" WHERE "session_id" = "quiz_session"."id" AND "right"),
+	"total" = (SELECT COUNT(*) FROM "quiz_session_answer" WHERE "session_id" = "quiz_session"."id")
+	WHERE "archived" = 0;
+UPDATE "quiz_session" SET ("correct", "total") = (
+	SELECT archived_correct("answers"), archived_total("answers") FROM "quiz_session_archive" WHERE "session_id" = "quiz_session"."id"
+) WHERE "archived" = 1;
+CREATE INDEX IF NOT EXISTS "quiz_session_user_id_created_at_idx" ON "quiz_session" (
+	"user_id"	ASC,
+	"created_at"	ASC
+);
+""",
+    ),
+    # Play counter, maintained by create_quiz_session
+    Migration(
+        version=6,
+        script="""
+ALTER TABLE "quiz" ADD COLUMN "plays" INTEGER NOT NULL DEFAULT 0;
+UPDATE "quiz" SET "plays" = (SELECT COUNT(*) FROM "quiz_session" WHERE "quiz_id" = "quiz"."id");
+""",
+    ),
+    # Popular quizzes of language are listed by backward range scan
+    Migration(
+        version=7,
+        script="""
+CREATE INDEX IF NOT EXISTS "quiz_language_plays_idx" ON "quiz" (
+	LOWER("language"),
+	"plays"	ASC,
+	"id"	ASC
+);
+""",
+        online=True,
+    ),
+    # Users of language are streamed by keyset range scan
+    Migration(
+        version=8,
+        script="""
+CREATE INDEX IF NOT EXISTS "user_language_idx" ON "user" (
+	LOWER("language"),
+	"id"	ASC
+);
+""",
+        online=True,
+    ),
+    # Keys and content hashes of quizzes synced from definition files
+    Migration(
+        version=9,
+        script="""
+CREATE TABLE IF NOT EXISTS "quiz_content" (
+	"quiz_id"	INTEGER,
+	"key"	TEXT NOT NULL UNIQUE,
+	"hash"	BLOB NOT NULL,
+	PRIMARY KEY("quiz_id"),
+	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE CASCADE
+);
+""",
+    ),
+    # Questions form a bank shared by quizzes, quizzes link to them in order
+    Migration(
+        version=10,
+        script="""
+CREATE TABLE IF NOT EXISTS "quiz_question_link" (
+	"quiz_id"	INTEGER NOT NULL,
+	"position"	INTEGER NOT NULL,
+	"question_id"	INTEGER NOT NULL,
+	PRIMARY KEY("quiz_id","position"),
+	FOREIGN KEY("quiz_id") REFERENCES "quiz"("id") ON DELETE CASCADE,
+	FOREIGN KEY("question_id") REFERENCES "quiz_question"("id") ON DELETE CASCADE,
+	UNIQUE("quiz_id","question_id")
+) WITHOUT ROWID;
+INSERT INTO "quiz_question_link"("quiz_id", "position", "question_id")
+	SELECT "quiz_id", ROW_NUMBER() OVER (PARTITION BY "quiz_id" ORDER BY "id"), "id" FROM "quiz_question";
+CREATE INDEX IF NOT EXISTS "quiz_question_link_question_id_idx" ON "quiz_question_link" (
+	"question_id"	ASC
+);
+DROP TRIGGER IF EXISTS "quiz_question_fts_insert_trg";
+DROP TRIGGER IF EXISTS "quiz_question_fts_delete_trg";
+DROP TRIGGER IF EXISTS "quiz_question_fts_update_trg";
+CREATE TABLE "quiz_question_new" (
+	"id"	INTEGER,
+	"question"	TEXT NOT NULL,
+	PRIMARY KEY("id" AUTOINCREMENT)
+);
+INSERT INTO "quiz_question_new"("id", "question") SELECT "id", "question" FROM "quiz_question";
+DROP TABLE "quiz_question";
+ALTER TABLE "quiz_question_new" RENAME TO "quiz_question";
+CREATE INDEX IF NOT EXISTS "quiz_question_question_idx" ON "quiz_question" (
+	"question"	ASC
+);
+CREATE TRIGGER IF NOT EXISTS "quiz_question_fts_insert_trg" AFTER INSERT ON "quiz_question" BEGIN
+	INSERT INTO "quiz_question_fts"("rowid", "question") VALUES (new."id", new."question");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_question_fts_delete_trg" AFTER DELETE ON "quiz_question" BEGIN
+	INSERT INTO "quiz_question_fts"("quiz_question_fts", "rowid", "question") VALUES ('delete', old."id", old."question");
+END;
+CREATE TRIGGER IF NOT EXISTS "quiz_question_fts_update_trg" AFTER UPDATE OF "question" ON "quiz_question" BEGIN
+	INSERT INTO "quiz_question_fts"("quiz_question_fts", "rowid", "question") VALUES ('delete', old."id", old."question");
+	INSERT INTO "quiz_question_fts"("rowid", "question") VALUES (new."id", new."question");
+END;
+""",
+    ),
+)
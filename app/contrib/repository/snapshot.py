@@ -0,0 +1,449 @@
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ...core.locale import LazyLocale
+from ...core.repository import QuizAnswerModel, QuizModel, QuizQuestionModel
+
+MAGIC = b"QZCS"
+FORMAT_VERSION = 2
+
+# magic, format version, generation, number of quizzes, questions, answers and
+# languages, length of string table
+_HEADER = struct.Struct("<4sIqIIIII")
+# id, description, language ( offset and length in string table ), plays,
+# first question position and number of questions
+_QUIZ = struct.Struct("<qIIIIqII")
+# id, id of quiz using it, text, first answer position and number of answers
+_QUESTION = struct.Struct("<qqIIII")
+# id, question id, value, right
+_ANSWER = struct.Struct("<qqIIB")
+# lowercase language, first position in quizzes by language, number of quizzes
+_LANGUAGE = struct.Struct("<IIII")
+_POSITION = struct.Struct("<I")
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.parts: List[bytes] = []
+        self.size = 0
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+
+    def add(self, value: str) -> Tuple[int, int]:
+        location = self._offsets.get(value)
+        if location is None:
+            data = value.encode()
+            location = self._offsets[value] = (self.size, len(data))
+            self.parts.append(data)
+            self.size += len(data)
+        return location
+
+
+def write_catalog_snapshot(
+    path: str,
+    quizzes: Sequence[QuizModel],
+    questions: Sequence[QuizQuestionModel],
+    answers: Sequence[QuizAnswerModel],
+    links: Sequence[Tuple[int, int]],
+    generation: Optional[int] = None,
+) -> int:
+    """
+    Write catalog snapshot, file is replaced atomically so readers switch
+    between complete snapshots only
+
+    :param path:
+    :param quizzes:
+    :param questions: questions of the quizzes
+    :param answers: answers of the questions
+    :param links: list of (quiz id, question id) in order of quiz questions
+    :param generation: version of snapshot ( time in nanoseconds by default )
+    :return: generation
+    """
+    if generation is None:
+        generation = time.time_ns()
+
+    quizzes = sorted(quizzes, key=lambda quiz: quiz.id)
+    answers = sorted(answers, key=lambda answer: (answer.question_id, answer.id))
+    # Question shared by quizzes is stored once for every quiz using it, sort is
+    # stable and keeps order of questions in quiz
+    questions_by_id = {question.id: question for question in questions}
+    links = sorted(
+        (link for link in links if link[1] in questions_by_id), key=lambda link: link[0]
+    )
+    questions = [questions_by_id[question_id] for _, question_id in links]
+
+    # Questions of quiz and answers of question are stored contiguously
+    question_ranges: Dict[int, List[int]] = {}
+    for position, (quiz_id, _) in enumerate(links):
+        question_ranges.setdefault(quiz_id, [position, 0])[1] += 1
+    answer_ranges: Dict[int, List[int]] = {}
+    for position, answer in enumerate(answers):
+        answer_ranges.setdefault(answer.question_id, [position, 0])[1] += 1
+
+    strings = _StringTable()
+    parts = []
+    languages: Dict[str, List[int]] = {}
+    for position, quiz in enumerate(quizzes):
+        language = str(quiz.language)
+        languages.setdefault(language.lower(), []).append(position)
+        first, count = question_ranges.get(quiz.id, (0, 0))
+        parts.append(
+            _QUIZ.pack(
+                quiz.id,
+                *strings.add(quiz.description),
+                *strings.add(language),
+                quiz.plays,
+                first,
+                count,
+            )
+        )
+    for (quiz_id, _), question in zip(links, questions):
+        first, count = answer_ranges.get(question.id, (0, 0))
+        parts.append(
+            _QUESTION.pack(
+                question.id,
+                quiz_id,
+                *strings.add(question.question),
+                first,
+                count,
+            )
+        )
+    for answer in answers:
+        parts.append(
+            _ANSWER.pack(
+                answer.id, answer.question_id, *strings.add(answer.value), answer.right
+            )
+        )
+
+    # Positions sorted by id, records themselves are grouped by parent
+    for records in (questions, answers):
+        for position in sorted(range(len(records)), key=lambda i: records[i].id):
+            parts.append(_POSITION.pack(position))
+
+    quizzes_by_language = []
+    for language in sorted(languages):
+        parts.append(
+            _LANGUAGE.pack(
+                *strings.add(language),
+                len(quizzes_by_language),
+                len(languages[language]),
+            )
+        )
+        quizzes_by_language.extend(languages[language])
+    parts.extend(_POSITION.pack(position) for position in quizzes_by_language)
+
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        generation,
+        len(quizzes),
+        len(questions),
+        len(answers),
+        len(languages),
+        strings.size,
+    )
+
+    # Unique name, so concurrent exports to one path don't write same file
+    descriptor, temporary = tempfile.mkstemp(
+        prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path)
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(header)
+            file.writelines(parts)
+            file.writelines(strings.parts)
+            file.flush()
+            os.fsync(file.fileno())
+        # Readable by other processes as file created with open()
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return generation
+
+
+class _Keys(Sequence[int]):
+    # Lazy sorted view for bisect
+    def __init__(self, count: int, key: Callable[[int], int]) -> None:
+        self._count = count
+        self._key = key
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        return self._key(index)
+
+
+class _Mapping:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        (
+            magic,
+            version,
+            self.generation,
+            self.quizzes,
+            self.questions,
+            self.answers,
+            self.languages,
+            strings_size,
+        ) = _HEADER.unpack_from(self.view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(
+                f"{path} is not catalog snapshot of version {FORMAT_VERSION}"
+            )
+
+        self.quiz_offset = _HEADER.size
+        self.question_offset = self.quiz_offset + self.quizzes * _QUIZ.size
+        self.answer_offset = self.question_offset + self.questions * _QUESTION.size
+        self.question_ids_offset = self.answer_offset + self.answers * _ANSWER.size
+        self.answer_ids_offset = (
+            self.question_ids_offset + self.questions * _POSITION.size
+        )
+        self.language_offset = self.answer_ids_offset + self.answers * _POSITION.size
+        self.by_language_offset = self.language_offset + self.languages * _LANGUAGE.size
+        self.strings_offset = self.by_language_offset + self.quizzes * _POSITION.size
+        if self.strings_offset + strings_size != len(self.view):
+            self.close()
+            raise ValueError(f"{path} is truncated")
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+
+    def string(self, offset: int, length: int) -> str:
+        start = self.strings_offset + offset
+        return str(self.view[start : start + length], "utf-8")
+
+    def position(self, offset: int, index: int) -> int:
+        return _POSITION.unpack_from(self.view, offset + index * _POSITION.size)[0]
+
+
+class CatalogSnapshot:
+    """
+    Read only catalog of quizzes, questions and answers memory mapped from
+    snapshot file, so processes on one host share single page cached copy.
+    Records are decoded on access only
+    """
+
+    path: str
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: snapshot written by :func:`write_catalog_snapshot`
+        """
+        self.path = path
+        self._mapping = _Mapping(path)
+
+    @property
+    def generation(self) -> int:
+        """
+        Version of snapshot currently mapped
+        """
+        return self._mapping.generation
+
+    def refresh(self) -> bool:
+        """
+        Switch to newer snapshot if file was replaced
+
+        :return: whether snapshot was switched
+        """
+        stat = os.stat(self.path)
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._mapping.identity:
+            return False
+
+        mapping, self._mapping = self._mapping, _Mapping(self.path)
+        mapping.close()
+        return True
+
+    def close(self):
+        self._mapping.close()
+
+    def _quiz(self, position: int) -> Tuple[QuizModel, int, int]:
+        mapping = self._mapping
+        (
+            id,
+            description_offset,
+            description_length,
+            language_offset,
+            language_length,
+            plays,
+            first,
+            count,
+        ) = _QUIZ.unpack_from(mapping.view, mapping.quiz_offset + position * _QUIZ.size)
+        quiz = QuizModel(
+            id=id,
+            description=mapping.string(description_offset, description_length),
+            language=LazyLocale.parse(mapping.string(language_offset, language_length)),
+            plays=plays,
+        )
+        return quiz, first, count
+
+    def _question(self, position: int) -> Tuple[QuizQuestionModel, int, int]:
+        mapping = self._mapping
+        id, _, offset, length, first, count = _QUESTION.unpack_from(
+            mapping.view, mapping.question_offset + position * _QUESTION.size
+        )
+        question = QuizQuestionModel(id=id, question=mapping.string(offset, length))
+        return question, first, count
+
+    def _answer(self, position: int) -> QuizAnswerModel:
+        mapping = self._mapping
+        id, question_id, offset, length, right = _ANSWER.unpack_from(
+            mapping.view, mapping.answer_offset + position * _ANSWER.size
+        )
+        return QuizAnswerModel(
+            id=id,
+            question_id=question_id,
+            right=bool(right),
+            value=mapping.string(offset, length),
+        )
+
+    def _id(self, offset: int, size: int, position: int) -> int:
+        return struct.unpack_from("<q", self._mapping.view, offset + position * size)[0]
+
+    def _find_quiz(self, quiz_id: int) -> Optional[int]:
+        mapping = self._mapping
+        keys = _Keys(
+            mapping.quizzes,
+            lambda index: self._id(mapping.quiz_offset, _QUIZ.size, index),
+        )
+        position = bisect.bisect_left(keys, quiz_id)
+        if position < len(keys) and keys[position] == quiz_id:
+            return position
+        return None
+
+    def _find_by_id(
+        self, ids_offset: int, offset: int, size: int, count: int, id: int
+    ) -> Optional[int]:
+        mapping = self._mapping
+        keys = _Keys(
+            count,
+            lambda index: self._id(offset, size, mapping.position(ids_offset, index)),
+        )
+        index = bisect.bisect_left(keys, id)
+        if index < count and keys[index] == id:
+            return mapping.position(ids_offset, index)
+        return None
+
+    def get_quiz(self, quiz_id: int) -> Optional[QuizModel]:
+        """
+        :param quiz_id:
+        :return: quiz or None if not found
+        """
+        position = self._find_quiz(quiz_id)
+        return None if position is None else self._quiz(position)[0]
+
+    def get_quiz_question(self, question_id: int) -> Optional[QuizQuestionModel]:
+        """
+        :param question_id:
+        :return: question or None if not found
+        """
+        mapping = self._mapping
+        position = self._find_by_id(
+            mapping.question_ids_offset,
+            mapping.question_offset,
+            _QUESTION.size,
+            mapping.questions,
+            question_id,
+        )
+        return None if position is None else self._question(position)[0]
+
+    def get_quiz_answer(self, answer_id: int) -> Optional[QuizAnswerModel]:
+        """
+        :param answer_id:
+        :return: answer or None if not found
+        """
+        mapping = self._mapping
+        position = self._find_by_id(
+            mapping.answer_ids_offset,
+            mapping.answer_offset,
+            _ANSWER.size,
+            mapping.answers,
+            answer_id,
+        )
+        return None if position is None else self._answer(position)
+
+    def list_quiz_questions(self, quiz_id: int) -> List[QuizQuestionModel]:
+        """
+        :param quiz_id:
+        :return: questions of quiz in order of quiz
+        """
+        position = self._find_quiz(quiz_id)
+        if position is None:
+            return []
+        _, first, count = self._quiz(position)
+        return [self._question(index)[0] for index in range(first, first + count)]
+
+    def list_quiz_answers(self, question_id: int) -> List[QuizAnswerModel]:
+        """
+        :param question_id:
+        :return: answers of question ordered by id
+        """
+        mapping = self._mapping
+        position = self._find_by_id(
+            mapping.question_ids_offset,
+            mapping.question_offset,
+            _QUESTION.size,
+            mapping.questions,
+            question_id,
+        )
+        if position is None:
+            return []
+        _, first, count = self._question(position)
+        return [self._answer(index) for index in range(first, first + count)]
+
+    def _language_range(self, language: object) -> Tuple[int, int]:
+        mapping = self._mapping
+        key = str(language).lower()
+        keys = _Keys(
+            mapping.languages,
+            lambda index: mapping.string(
+                *_LANGUAGE.unpack_from(
+                    mapping.view, mapping.language_offset + index * _LANGUAGE.size
+                )[:2]
+            ),
+        )
+        index = bisect.bisect_left(keys, key)
+        if index == len(keys) or keys[index] != key:
+            return 0, 0
+        return _LANGUAGE.unpack_from(
+            mapping.view, mapping.language_offset + index * _LANGUAGE.size
+        )[2:]
+
+    def list_quizzes_by_language(
+        self, language: object, offset: int = 0, limit: Optional[int] = 100
+    ) -> List[QuizModel]:
+        """
+        :param language: locale, compared case insensitively
+        :param offset: number of quizzes to skip
+        :param limit:
+        :return: quizzes of language ordered by id
+        """
+        first, count = self._language_range(language)
+        start = first + min(offset, count)
+        stop = first + count if limit is None else min(first + count, start + limit)
+        return [
+            self._quiz(self._mapping.position(self._mapping.by_language_offset, index))[
+                0
+            ]
+            for index in range(start, stop)
+        ]
+
+    def count_quizzes_by_language(self, language: object) -> int:
+        """
+        :param language: locale, compared case insensitively
+        :return: number of quizzes of language
+        """
+        return self._language_range(language)[1]
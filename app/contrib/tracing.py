@@ -0,0 +1,61 @@
+import json
+import random
+from dataclasses import asdict
+from typing import Callable, List, Optional, TextIO
+
+from ..core.tracing import Span, TraceSink
+
+
+class JsonLinesSink(TraceSink):
+    """
+    Appends sampled traces to local file, one span per line
+    """
+
+    path: str
+    sample_rate: float
+    slow_threshold: Optional[float]
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 0.01,
+        slow_threshold: Optional[float] = None,
+        random: Callable[[], float] = random.random,
+    ) -> None:
+        """
+        :param path: file to append traces to
+        :param sample_rate: share of traces written
+        :param slow_threshold: seconds, traces that took longer are always written
+            ( None to sample them as any other )
+        :param random: source of uniform numbers in [0, 1)
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self._random = random
+        self._file: Optional[TextIO] = None
+
+    def _sampled(self, root: Span) -> bool:
+        if self.slow_threshold is not None and root.duration >= self.slow_threshold:
+            return True
+        return self._random() < self.sample_rate
+
+    def export(self, spans: List[Span]):
+        if not spans or not self._sampled(spans[0]):
+            return
+
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+        for span in spans:
+            self._file.write(json.dumps(asdict(span), default=str))
+            self._file.write("\n")
+        self._file.flush()
+
+    def close(self):
+        """
+        Close file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,37 +1,80 @@
+from .content import (
+    AnswerDefinition,
+    QuestionDefinition,
+    QuizDefinition,
+    parse_quiz_definition,
+)
 from .entities import (
+    BroadcastProgress,
+    ContentSyncResult,
+    PendingQuizSession,
     Quiz,
     QuizAnswer,
+    QuizAnswerStats,
     QuizQuestion,
+    QuizQuestionStats,
     QuizSession,
     QuizSessionAnswer,
+    QuizSessionScore,
     User,
 )
 from .exceptions import (
     CoreError,
+    QueryTimeoutError,
     QuizAnswerNotFoundError,
+    QuizDefinitionError,
     QuizNotFoundError,
+    QuizQuestionNotFoundError,
+    QuizSessionExistsError,
+    QuizSessionNotFoundError,
     ServiceError,
     UserNotFoundError,
 )
+from .locale import LazyLocale
+from .ratelimit import RateLimiter
 from .repository import Repository
-from .services import QuizService, UserService
+from .services import BroadcastService, MessageSender, QuizService, UserService
+from .sessions import SessionStore
+from .text import normalize_answer
 
 __all__ = (
     "Repository",
     # Services
     "QuizService",
     "UserService",
+    "BroadcastService",
+    "MessageSender",
+    "RateLimiter",
+    "SessionStore",
+    "LazyLocale",
+    "normalize_answer",
+    # Content
+    "QuizDefinition",
+    "QuestionDefinition",
+    "AnswerDefinition",
+    "parse_quiz_definition",
     # Entities
+    "BroadcastProgress",
+    "ContentSyncResult",
+    "PendingQuizSession",
     "Quiz",
     "QuizAnswer",
+    "QuizAnswerStats",
     "QuizQuestion",
+    "QuizQuestionStats",
     "QuizSession",
     "QuizSessionAnswer",
+    "QuizSessionScore",
     "User",
     # Exceptions
     "CoreError",
+    "QueryTimeoutError",
     "QuizNotFoundError",
     "QuizAnswerNotFoundError",
+    "QuizQuestionNotFoundError",
+    "QuizDefinitionError",
+    "QuizSessionExistsError",
+    "QuizSessionNotFoundError",
     "ServiceError",
     "UserNotFoundError",
 )
@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Bounded mapping with least recently used and time to live eviction
+    """
+
+    maxsize: int
+    ttl: Optional[float]
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Optional[Callable[[K, V], None]] = None,
+    ) -> None:
+        """
+        :param maxsize: maximal number of entries kept
+        :param ttl: seconds since last write after which entry expires ( None to disable )
+        :param clock: monotonic time source
+        :param on_evict: called with every entry evicted or expired, but not
+            with removed ones
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_evict = on_evict
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def _expired(self, written_at: float) -> bool:
+        return self.ttl is not None and self._clock() - written_at >= self.ttl
+
+    def _evicted(self, key: K, value: V):
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+    def peek(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        Get entry without marking it as recently used or removing it if expired
+
+        :param key:
+        :param default: value returned if entry is missing or expired
+        :return: cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry[0]):
+            return default
+        return entry[1]
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        Get entry and mark it as recently used
+
+        :param key:
+        :param default: value returned if entry is missing or expired
+        :return: cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        if self._expired(entry[0]):
+            del self._entries[key]
+            self._evicted(key, entry[1])
+            return default
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: K, value: V) -> List[Tuple[K, V]]:
+        """
+        Set entry, evicting least recently used ones if cache is full
+
+        :param key:
+        :param value:
+        :return: evicted entries
+        """
+        self._entries[key] = (self._clock(), value)
+        self._entries.move_to_end(key)
+
+        evicted = []
+        while len(self._entries) > self.maxsize:
+            evicted_key, (_, evicted_value) = self._entries.popitem(last=False)
+            evicted.append((evicted_key, evicted_value))
+            self._evicted(evicted_key, evicted_value)
+        return evicted
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        Remove entry
+
+        :param key:
+        :param default: value returned if entry is missing or expired
+        :return: removed value or default
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None or self._expired(entry[0]):
+            return default
+        return entry[1]
+
+    def expire(self) -> List[Tuple[K, V]]:
+        """
+        Remove all expired entries
+
+        :return: removed entries
+        """
+        expired = [
+            (key, value)
+            for key, (written_at, value) in self._entries.items()
+            if self._expired(written_at)
+        ]
+        for key, value in expired:
+            del self._entries[key]
+            self._evicted(key, value)
+        return expired
+
+    def clear(self):
+        """
+        Remove all entries
+        """
+        self._entries.clear()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Mapping, Tuple
+
+from .exceptions import QuizDefinitionError
+from .locale import LazyLocale
+
+if TYPE_CHECKING:
+    from babel import Locale
+
+
+@dataclass(frozen=True)
+class AnswerDefinition:
+    value: str
+    right: bool
+
+
+@dataclass(frozen=True)
+class QuestionDefinition:
+    question: str
+
+    answers: Tuple[AnswerDefinition, ...]
+
+
+@dataclass(frozen=True)
+class QuizDefinition:
+    """
+    Content of quiz kept outside of repository, e.g. in definition file
+    """
+
+    # Stable name of the quiz, e.g. name of definition file
+    key: str
+
+    description: str
+    language: Locale
+
+    questions: Tuple[QuestionDefinition, ...]
+
+    def content_hash(self) -> bytes:
+        """
+        Hash of quiz content, equal for equal definitions
+
+        :return: SHA-256 digest
+        """
+        content = [
+            self.description,
+            str(self.language),
+            [
+                [question.question, [[a.value, a.right] for a in question.answers]]
+                for question in self.questions
+            ],
+        ]
+        return hashlib.sha256(
+            json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        ).digest()
+
+
+def parse_quiz_definition(key: str, data: Mapping[str, Any]) -> QuizDefinition:
+    """
+    Build quiz definition from decoded JSON document::
+
+        {
+            "description": "Capitals quiz",
+            "language": "en_AU",
+            "questions": [
+                {
+                    "question": "Capital of Japan?",
+                    "answers": [
+                        {"value": "Tokyo", "right": true},
+                        {"value": "Kyoto", "right": false}
+                    ]
+                }
+            ]
+        }
+
+    :param key: stable name of the quiz
+    :param data:
+    :return: quiz definition
+    :raises QuizDefinitionError: document is invalid
+    """
+    try:
+        questions = []
+        for question in data["questions"]:
+            answers = tuple(
+                AnswerDefinition(
+                    value=str(answer["value"]), right=bool(answer["right"])
+                )
+                for answer in question["answers"]
+            )
+            if len({answer.value for answer in answers}) != len(answers):
+                raise QuizDefinitionError(
+                    key=key, reason=f"duplicate answer of {question['question']!r}"
+                )
+            questions.append(
+                QuestionDefinition(question=str(question["question"]), answers=answers)
+            )
+        if len({question.question for question in questions}) != len(questions):
+            raise QuizDefinitionError(key=key, reason="duplicate question")
+
+        return QuizDefinition(
+            key=key,
+            description=str(data["description"]),
+            language=LazyLocale.parse(str(data["language"])),
+            questions=tuple(questions),
+        )
+    except (KeyError, TypeError, ValueError) as error:
+        raise QuizDefinitionError(key=key, reason=repr(error)) from error
@@ -1,7 +1,10 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from babel import Locale
+if TYPE_CHECKING:
+    from babel import Locale
 
 
 @dataclass(frozen=True)
@@ -43,6 +46,9 @@ class Quiz:
 
     questions: Optional[List[QuizQuestion]]
 
+    # Number of sessions created for the quiz
+    plays: int = 0
+
 
 @dataclass(frozen=True)
 class QuizSessionAnswer:
@@ -63,3 +69,70 @@ class QuizSession:
     quiz: Optional[Quiz]
     answers: List[QuizSessionAnswer]
     user: User
+
+    # Number of right answers and of all answers
+    correct: int
+    total: int
+
+
+@dataclass(frozen=True)
+class QuizSessionScore:
+    id: int
+    quiz_id: Optional[int]
+
+    description: str
+    language: Locale
+
+    correct: int
+    total: int
+
+    # Unix time, 0 for sessions created before it was tracked
+    created_at: float
+
+
+@dataclass(frozen=True)
+class ContentSyncResult:
+    # Ids of quizzes created and changed by sync, the rest didn't change
+    created: List[int]
+    updated: List[int]
+    unchanged: int
+
+
+@dataclass(frozen=True)
+class BroadcastProgress:
+    language: Locale
+
+    # Users up to this id are done, broadcast resumes after it
+    after_id: int
+
+    sent: int
+    failed: int
+
+
+@dataclass(frozen=True)
+class PendingQuizSession:
+    user_id: int
+    quiz_id: int
+
+    # Question id to chosen answer id
+    answers: Dict[int, int]
+
+
+@dataclass(frozen=True)
+class QuizAnswerStats:
+    id: int
+
+    value: str
+    right: bool
+    chosen: int
+
+
+@dataclass(frozen=True)
+class QuizQuestionStats:
+    id: int
+
+    question: str
+    answered: int
+    right: int
+
+    answers: List[QuizAnswerStats]
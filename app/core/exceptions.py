@@ -7,7 +7,7 @@ class CoreError(Exception):
     text: str = "Unknown core error"
 
     def __init__(self, **kwargs: Any) -> None:
-        super().__init__(self.text.format(kwargs))
+        super().__init__(self.text.format(**kwargs))
 
 
 class ServiceError(CoreError):
@@ -22,5 +22,25 @@ class QuizAnswerNotFoundError(ServiceError):
     text = "Quiz answer with id {id} not found"
 
 
+class QuizQuestionNotFoundError(ServiceError):
+    text = "Quiz question with id {id} not found"
+
+
 class UserNotFoundError(ServiceError):
     text = "User with id {id} not found"
+
+
+class QuizSessionNotFoundError(ServiceError):
+    text = "Quiz session of user {user_id} for quiz {quiz_id} not found"
+
+
+class QuizSessionExistsError(ServiceError):
+    text = "Quiz session of user {user_id} for quiz {quiz_id} already exists"
+
+
+class QuizDefinitionError(CoreError):
+    text = "Invalid definition of quiz {key}: {reason}"
+
+
+class QueryTimeoutError(ServiceError):
+    text = "Repository call exceeded its deadline"
@@ -0,0 +1,153 @@
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+if TYPE_CHECKING:
+    from babel import Locale
+
+_SEPARATOR = re.compile(r"[_-]")
+
+
+@lru_cache(maxsize=None)
+def babel_supports_modifier() -> bool:
+    """
+    Check whether installed Babel keeps locale modifiers ( added in 2.13 ),
+    older versions drop them and leave them out of comparison and hash.
+    Reads package metadata only, Babel itself is not imported
+
+    :return:
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        major, minor = (int(part) for part in version("Babel").split(".")[:2])
+    except (PackageNotFoundError, ValueError):
+        return True
+    return (major, minor) >= (2, 13)
+
+
+class LazyLocale:
+    """
+    Locale known by its identifier only, Babel is imported and :class:`babel.Locale`
+    is built on first access to anything but identifier parts
+
+    Compares and hashes equal to :class:`babel.Locale` with the same identifier
+    """
+
+    __slots__ = ("language", "territory", "script", "variant", "modifier", "_locale")
+
+    language: str
+    territory: Optional[str]
+    script: Optional[str]
+    variant: Optional[str]
+    modifier: Optional[str]
+
+    def __init__(
+        self,
+        language: str,
+        territory: Optional[str] = None,
+        script: Optional[str] = None,
+        variant: Optional[str] = None,
+        modifier: Optional[str] = None,
+    ) -> None:
+        self.language = language
+        self.territory = territory
+        self.script = script
+        self.variant = variant
+        self.modifier = modifier
+        self._locale = None
+
+    @classmethod
+    def parse(cls, identifier: str) -> "LazyLocale":
+        """
+        Parse identifier the way :func:`babel.core.parse_locale` does, without
+        checking that locale data exists
+
+        :param identifier: e.g. en_AU, zh-Hant-TW or de_DE@euro
+        :return: lazy locale
+        """
+        identifier, _, modifier = identifier.partition("@")
+        parts = _SEPARATOR.split(identifier.partition(".")[0])
+
+        language = parts.pop(0).lower()
+        if not language.isalpha():
+            raise ValueError(f"expected only letters, got {language!r}")
+
+        script = territory = variant = None
+        if parts and len(parts[0]) == 4 and parts[0].isalpha():
+            script = parts.pop(0).title()
+        if parts:
+            if len(parts[0]) == 2 and parts[0].isalpha():
+                territory = parts.pop(0).upper()
+            elif len(parts[0]) == 3 and parts[0].isdigit():
+                territory = parts.pop(0)
+        if parts and (
+            len(parts[0]) == 4
+            and parts[0][0].isdigit()
+            or len(parts[0]) >= 5
+            and parts[0][0].isalpha()
+        ):
+            variant = parts.pop().upper()
+        if parts:
+            raise ValueError(f"{identifier!r} is not a valid locale identifier")
+
+        if not babel_supports_modifier():
+            modifier = None
+        return cls(language, territory, script, variant, modifier or None)
+
+    def materialize(self) -> "Locale":
+        """
+        Get Babel locale
+
+        :return: locale
+        """
+        if self._locale is None:
+            from babel import Locale
+
+            if babel_supports_modifier():
+                self._locale = Locale(
+                    self.language,
+                    self.territory,
+                    self.script,
+                    self.variant,
+                    self.modifier,
+                )
+            else:
+                self._locale = Locale(
+                    self.language, self.territory, self.script, self.variant
+                )
+        return self._locale
+
+    def __getattr__(self, name: str) -> Any:
+        # Called only for attributes missing on lazy locale itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __str__(self) -> str:
+        identifier = "_".join(
+            filter(None, (self.language, self.script, self.territory, self.variant))
+        )
+        return f"{identifier}@{self.modifier}" if self.modifier else identifier
+
+    def __repr__(self) -> str:
+        return f"LazyLocale.parse({str(self)!r})"
+
+    def _key(self) -> Tuple[Optional[str], ...]:
+        # Same parts babel.Locale compares and hashes
+        key = (self.language, self.territory, self.script, self.variant)
+        return key + (self.modifier,) if babel_supports_modifier() else key
+
+    def __eq__(self, other: object) -> bool:
+        key = self._key()
+        names = ("language", "territory", "script", "variant", "modifier")[: len(key)]
+        for name in names:
+            if not hasattr(other, name):
+                return False
+        return key == tuple(getattr(other, name) for name in names)
+
+    def __ne__(self, other: object) -> bool:
+        return not self.__eq__(other)
+
+    def __hash__(self) -> int:
+        return hash(self._key())
@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+class RateLimiter:
+    """
+    Spaces operations evenly at given rate, shared by all its callers
+    """
+
+    rate: float
+    burst: int
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        """
+        :param rate: operations per second
+        :param burst: operations allowed at once after idle time
+        :param clock: monotonic time source
+        :param sleep: coroutine function waiting given seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        # Theoretical time the next operation is allowed at
+        self._next = clock()
+
+    async def acquire(self):
+        """
+        Wait until next operation is allowed
+        """
+        interval = 1 / self.rate
+        now = self._clock()
+        allowed = max(self._next, now)
+        # Time is reserved before sleeping, so concurrent callers queue up
+        self._next = allowed + interval
+        delay = allowed - (self.burst - 1) * interval - now
+        if delay > 0:
+            await self._sleep(delay)
@@ -1,19 +1,30 @@
 from .models import (
     QuizAnswerModel,
+    QuizAnswerStatsModel,
+    QuizContentModel,
     QuizModel,
     QuizQuestionModel,
+    QuizQuestionStatsModel,
     QuizSessionAnswerModel,
+    QuizSessionCheckpointModel,
     QuizSessionModel,
+    UserDeletionModel,
     UserModel,
 )
-from .repository import Repository
+from .repository import Repository, Transaction
 
 __all__ = (
     "QuizAnswerModel",
+    "QuizAnswerStatsModel",
+    "QuizContentModel",
     "QuizModel",
     "QuizQuestionModel",
+    "QuizQuestionStatsModel",
     "QuizSessionAnswerModel",
+    "QuizSessionCheckpointModel",
     "QuizSessionModel",
+    "UserDeletionModel",
     "UserModel",
     "Repository",
+    "Transaction",
 )
@@ -1,7 +1,10 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
 
-from babel import Locale
+if TYPE_CHECKING:
+    from babel import Locale
 
 
 @dataclass(frozen=True)
@@ -16,11 +19,29 @@ class QuizAnswerModel:
 @dataclass(frozen=True)
 class QuizQuestionModel:
     id: int
-    quiz_id: int
 
     question: str
 
 
+@dataclass(frozen=True)
+class QuizAnswerStatsModel:
+    answer_id: int
+    question_id: int
+
+    value: str
+    right: bool
+    chosen: int
+
+
+@dataclass(frozen=True)
+class QuizQuestionStatsModel:
+    question_id: int
+
+    question: str
+    answered: int
+    right: int
+
+
 @dataclass(frozen=True)
 class QuizModel:
     id: int
@@ -28,6 +49,18 @@ class QuizModel:
     description: str
     language: Locale
 
+    # Number of sessions created for the quiz
+    plays: int = 0
+
+
+@dataclass(frozen=True)
+class QuizContentModel:
+    quiz_id: int
+
+    # Stable name of quiz definition and hash of its content last synced
+    key: str
+    hash: bytes
+
 
 @dataclass(frozen=True)
 class QuizSessionModel:
@@ -38,6 +71,13 @@ class QuizSessionModel:
     description: str
     language: Locale
 
+    # Unix time, 0 for sessions created before it was tracked
+    created_at: float
+
+    # Number of right answers and of all answers
+    correct: int = 0
+    total: int = 0
+
 
 @dataclass(frozen=True)
 class QuizSessionAnswerModel:
@@ -50,6 +90,23 @@ class QuizSessionAnswerModel:
     right: bool
 
 
+@dataclass(frozen=True)
+class QuizSessionCheckpointModel:
+    user_id: int
+    quiz_id: int
+
+    answers: Dict[int, int]
+    updated_at: float
+
+
+@dataclass(frozen=True)
+class UserDeletionModel:
+    # Deleted so far: users, their quiz sessions and answers of the sessions
+    users: int
+    sessions: int
+    answers: int
+
+
 @dataclass(frozen=True)
 class UserModel:
     id: int
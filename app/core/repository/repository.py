@@ -1,29 +1,188 @@
-from abc import ABC, abstractmethod
-from typing import Iterable, Optional, Union
+from __future__ import annotations
 
-from babel import Locale
+import time
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, contextmanager
+from contextvars import ContextVar, Token
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+from .. import tracing
 from .models import (
     QuizAnswerModel,
+    QuizAnswerStatsModel,
+    QuizContentModel,
     QuizModel,
     QuizQuestionModel,
+    QuizQuestionStatsModel,
     QuizSessionAnswerModel,
+    QuizSessionCheckpointModel,
     QuizSessionModel,
+    UserDeletionModel,
     UserModel,
 )
 
+if TYPE_CHECKING:
+    from babel import Locale
+
+# Monotonic time until which repository calls of current context must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("repository_deadline", default=None)
+
+
+def _push_deadline(timeout: float) -> Token:
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    return _deadline.set(deadline if current is None else min(current, deadline))
+
+
+class Transaction:
+    """
+    Transaction context, optionally limited in time, traced as single span
+    """
+
+    repository: "Repository"
+    timeout: Optional[float]
+    write: bool
+
+    def __init__(
+        self,
+        repository: "Repository",
+        timeout: Optional[float] = None,
+        write: bool = True,
+    ) -> None:
+        self.repository = repository
+        self.timeout = timeout
+        self.write = write
+        self._token: Optional[Token] = None
+        self._span: Optional[AbstractContextManager] = None
+
+    async def __aenter__(self) -> "Repository":
+        if self.timeout is not None:
+            self._token = _push_deadline(self.timeout)
+        self._span = tracing.span("transaction", timeout=self.timeout, write=self.write)
+        self._span.__enter__()
+
+        try:
+            await self.repository.begin_transaction(write=self.write)
+            return self.repository
+        except BaseException as error:
+            self._reset(type(error), error, error.__traceback__)
+            raise
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        try:
+            await self.repository.__aexit__(exception_type, exception_value, traceback)
+        except BaseException as error:
+            self._reset(type(error), error, error.__traceback__)
+            raise
+        else:
+            self._reset(exception_type, exception_value, traceback)
+
+    def _reset(self, exception_type, exception_value, traceback):
+        if self._span is not None:
+            self._span.__exit__(exception_type, exception_value, traceback)
+            self._span = None
+        if self._token is not None:
+            _deadline.reset(self._token)
+            self._token = None
+
 
 class Repository(ABC):
     """
     Generic repository class
     """
 
+    _quiz_listeners: List[Callable[[int], None]]
+    _question_listeners: List[Callable[[int], None]]
+
+    def __init__(self) -> None:
+        self._quiz_listeners = []
+        self._question_listeners = []
+
+    # Content change notifications
+    def add_quiz_listener(self, listener: Callable[[int], None]):
+        """
+        Subscribe to changes of quiz content ( e.g. to invalidate caches )
+
+        :param listener: called with id of changed quiz
+        """
+        self._quiz_listeners.append(listener)
+
+    def notify_quiz_changed(self, quiz_id: int):
+        """
+        Notify listeners that quiz content changed
+
+        :param quiz_id:
+        """
+        for listener in self._quiz_listeners:
+            listener(quiz_id)
+
+    def add_question_listener(self, listener: Callable[[int], None]):
+        """
+        Subscribe to changes of question answers, questions are shared by
+        quizzes, so it's called once for all of them
+
+        :param listener: called with id of changed question
+        """
+        self._question_listeners.append(listener)
+
+    def notify_question_changed(self, question_id: int):
+        """
+        Notify listeners that answers of question changed
+
+        :param question_id:
+        """
+        for listener in self._question_listeners:
+            listener(question_id)
+
+    # Deadlines
+    @contextmanager
+    def deadline(self, timeout: float) -> Iterator[None]:
+        """
+        Limit time of repository calls made inside of the block, nested
+        deadlines can only shorten it
+
+        :param timeout: seconds
+        """
+        token = _push_deadline(timeout)
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+    @staticmethod
+    def remaining_time() -> Optional[float]:
+        """
+        Get time left until deadline of current context
+
+        :return: seconds or None if there is no deadline
+        """
+        deadline = _deadline.get()
+        return None if deadline is None else deadline - time.monotonic()
+
     # Transaction sugar
-    def transaction(self) -> "Repository":
+    def transaction(
+        self, timeout: Optional[float] = None, write: bool = True
+    ) -> Transaction:
         """
         Get transaction context
+
+        :param timeout: seconds the whole transaction may take ( None for no limit )
+        :param write: False for read only transaction, it doesn't wait for
+            writers, but can't write or contain write transaction
         """
-        return self
+        return Transaction(self, timeout, write)
 
     async def __aenter__(self):
         await self.begin_transaction()
@@ -37,9 +196,11 @@ class Repository(ABC):
 
     # Methods without implementation
     @abstractmethod
-    async def begin_transaction(self):
+    async def begin_transaction(self, write: bool = True):
         """
         Begin transaction
+
+        :param write: False for read only transaction
         """
         pass
 
@@ -119,6 +280,91 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def upsert_user(
+        self,
+        telegram_id: int,
+        language: Locale,
+        first_name: str,
+        last_name: Optional[str] = None,
+        username: Optional[str] = None,
+    ) -> UserModel:
+        """
+        Create user or update user with the same telegram id in one statement
+
+        :param telegram_id:
+        :param language:
+        :param first_name:
+        :param last_name:
+        :param username:
+        :return: created or updated user
+        """
+        pass
+
+    @abstractmethod
+    async def upsert_users(
+        self,
+        users: Sequence[Tuple[int, Locale, str, Optional[str], Optional[str]]],
+    ) -> List[UserModel]:
+        """
+        Create or update many users at once, of entries with the same telegram
+        id the last one wins
+
+        :param users: telegram id, language, first name, last name and username
+        :return: stored user of every entry, in order of entries
+        """
+        pass
+
+    @abstractmethod
+    def iter_users_by_language(
+        self, language: Locale, after_id: int = 0, chunk_size: int = 1000
+    ) -> AsyncIterator[List[UserModel]]:
+        """
+        Stream users of language in order of id, every chunk is read by its
+        own short query, so writers aren't blocked between chunks
+
+        :param language: compared case insensitively
+        :param after_id: stream users with greater id only
+        :param chunk_size: number of users in chunk
+        :return: async iterator over chunks of users
+        """
+        pass
+
+    @abstractmethod
+    async def delete_user(
+        self,
+        user_id: int,
+        chunk_size: int = 500,
+        progress: Optional[Callable[[UserDeletionModel], None]] = None,
+    ) -> UserDeletionModel:
+        """
+        Delete user with quiz sessions and checkpoints, every chunk of history
+        is deleted in its own short transaction, so other writers aren't stalled
+
+        :param user_id:
+        :param chunk_size: number of answers or sessions deleted per transaction
+        :param progress: called with deleted counts after every chunk
+        :return: deleted counts ( no users if user doesn't exist )
+        """
+        pass
+
+    @abstractmethod
+    async def purge_users(
+        self,
+        user_ids: Iterable[int],
+        chunk_size: int = 500,
+        progress: Optional[Callable[[UserDeletionModel], None]] = None,
+    ) -> UserDeletionModel:
+        """
+        Delete many users as :meth:`delete_user` does
+
+        :param user_ids:
+        :param chunk_size: number of answers or sessions deleted per transaction
+        :param progress: called with deleted counts of all users after every chunk
+        :return: deleted counts
+        """
+        pass
+
     @abstractmethod
     async def get_quiz(self, quiz_id: int) -> Optional[QuizModel]:
         """
@@ -146,6 +392,49 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def list_quizzes_by_languages(
+        self,
+        languages: Sequence[Locale],
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+    ) -> Tuple[int, Iterable[QuizModel]]:
+        """
+        List quizzes of several languages, ordered by language preference
+
+        :param languages: languages, most preferred first
+        :param offset: number of quizzes to skip
+        :param limit:
+        :return: count of all matching quizzes and list of quizzes
+        """
+        pass
+
+    @abstractmethod
+    async def list_popular_quizzes(
+        self,
+        language: Locale,
+        after: Optional[Tuple[int, int]] = None,
+        limit: Optional[int] = 100,
+    ) -> List[QuizModel]:
+        """
+        List quizzes of language, most played first
+
+        :param language:
+        :param after: (plays, id) of the last quiz of previous page
+        :param limit:
+        :return: list of quizzes
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_languages(self) -> List[Locale]:
+        """
+        List languages quizzes are available in
+
+        :return: list of languages
+        """
+        pass
+
     @abstractmethod
     async def count_quizzes_by_language(self, language: Locale) -> int:
         """
@@ -156,6 +445,25 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def search_quizzes(
+        self,
+        text: str,
+        language: Optional[Locale] = None,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+    ) -> Iterable[QuizModel]:
+        """
+        Full text search of quizzes by description and questions
+
+        :param text: words to search for, last one is matched by prefix
+        :param language: language of quizzes ( None for any )
+        :param offset: number of quizzes to skip
+        :param limit:
+        :return: list of quizzes, best matches first
+        """
+        pass
+
     @abstractmethod
     async def get_quiz_question(self, question_id: int) -> Optional[QuizQuestionModel]:
         """
@@ -166,6 +474,42 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def list_quiz_question_ids(self, quiz_id: int) -> List[int]:
+        """
+        List ids of quiz questions
+
+        :param quiz_id:
+        :return: list of question ids in order of quiz
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_questions_with_answers(
+        self, question_ids: Sequence[int]
+    ) -> Iterable[Tuple[QuizQuestionModel, List[QuizAnswerModel]]]:
+        """
+        Get quiz questions together with their answers
+
+        :param question_ids:
+        :return: list of found questions and their answers, in no particular order
+        """
+        pass
+
+    @abstractmethod
+    async def match_quiz_answers(
+        self, answers: Sequence[Tuple[int, str]]
+    ) -> List[Tuple[Optional[QuizQuestionModel], Optional[QuizAnswerModel]]]:
+        """
+        Find answers by text in one lookup
+
+        :param answers: list of (question id, text normalized by
+            :func:`app.core.text.normalize_answer`)
+        :return: list of (question or None if not found, answer whose normalized
+            value equals the text or None), in order of answers
+        """
+        pass
+
     @abstractmethod
     async def get_quiz_answer(self, answer_id: int) -> Optional[QuizAnswerModel]:
         """
@@ -192,7 +536,7 @@ class Repository(ABC):
         self, quiz_id: int, question: str
     ) -> QuizQuestionModel:
         """
-        Create quiz question
+        Create question and add it to the end of quiz
 
         :param quiz_id:
         :param question:
@@ -200,6 +544,62 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def create_bank_question(self, question: str) -> QuizQuestionModel:
+        """
+        Create question in question bank, not used by any quiz yet
+
+        :param question:
+        :return: created quiz question
+        """
+        pass
+
+    @abstractmethod
+    async def find_bank_questions(
+        self, questions: Sequence[str]
+    ) -> Iterable[Tuple[QuizQuestionModel, List[QuizAnswerModel]]]:
+        """
+        Find questions of question bank by exact text
+
+        :param questions: texts of questions
+        :return: list of questions with any of the texts and their answers, in
+            order of question ids
+        """
+        pass
+
+    @abstractmethod
+    async def list_question_quiz_ids(
+        self, question_ids: Sequence[int]
+    ) -> Dict[int, List[int]]:
+        """
+        List quizzes using questions
+
+        :param question_ids:
+        :return: ids of quizzes by question id, questions used by no quiz are
+            left out
+        """
+        pass
+
+    @abstractmethod
+    async def add_quiz_questions(self, quiz_id: int, question_ids: Sequence[int]):
+        """
+        Add questions to the end of quiz, questions already in quiz are skipped
+
+        :param quiz_id:
+        :param question_ids:
+        """
+        pass
+
+    @abstractmethod
+    async def set_quiz_questions(self, quiz_id: int, question_ids: Sequence[int]):
+        """
+        Replace questions of quiz, questions left out stay in question bank
+
+        :param quiz_id:
+        :param question_ids: questions in order of quiz
+        """
+        pass
+
     @abstractmethod
     async def create_quiz_answer(
         self, question_id: int, value: str, right: bool
@@ -214,6 +614,68 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def update_quiz(self, quiz_id: int, description: str, language: Locale):
+        """
+        Update quiz
+
+        :param quiz_id:
+        :param description:
+        :param language:
+        """
+        pass
+
+    @abstractmethod
+    async def update_quiz_answer(self, answer_id: int, right: bool):
+        """
+        Update quiz answer
+
+        :param answer_id:
+        :param right:
+        """
+        pass
+
+    @abstractmethod
+    async def delete_quiz_questions(self, question_ids: Sequence[int]):
+        """
+        Delete questions together with their answers from question bank and
+        from every quiz using them. Answers of past sessions keep their texts
+        and ids of deleted answers
+
+        :param question_ids:
+        """
+        pass
+
+    @abstractmethod
+    async def delete_quiz_answers(self, answer_ids: Sequence[int]):
+        """
+        Delete quiz answers. Answers of past sessions keep their texts and ids
+        of deleted answers
+
+        :param answer_ids:
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_contents(self) -> List[QuizContentModel]:
+        """
+        List quizzes synced from definitions
+
+        :return: list of keys and content hashes of quizzes
+        """
+        pass
+
+    @abstractmethod
+    async def save_quiz_content(self, quiz_id: int, key: str, hash: bytes):
+        """
+        Create or update key and content hash of quiz synced from definition
+
+        :param quiz_id:
+        :param key:
+        :param hash:
+        """
+        pass
+
     @abstractmethod
     async def create_quiz_session(
         self, user_id: int, quiz_id: int, description: str, language: Locale
@@ -225,6 +687,7 @@ class Repository(ABC):
         :param quiz_id:
         :description:
         :language:
+        :raises QuizSessionExistsError: user already has session for the quiz
         :return: created quiz session
         """
         pass
@@ -244,3 +707,178 @@ class Repository(ABC):
         :return: created quiz session answer
         """
         pass
+
+    @abstractmethod
+    async def get_quiz_session_by_user(
+        self, user_id: int, quiz_id: int
+    ) -> Optional[QuizSessionModel]:
+        """
+        Get quiz session of user
+
+        :param user_id:
+        :param quiz_id:
+        :return: quiz session or None if not found
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_sessions_by_user(
+        self, user_id: int, offset: int = 0, limit: int = 20
+    ) -> List[QuizSessionModel]:
+        """
+        List quiz sessions of user, newest first
+
+        :param user_id:
+        :param offset:
+        :param limit:
+        :return: quiz sessions
+        """
+        pass
+
+    @abstractmethod
+    async def update_quiz_session_score(
+        self, session_id: int, correct: int, total: int
+    ):
+        """
+        Store score of quiz session
+
+        :param session_id:
+        :param correct: number of right answers
+        :param total: number of all answers
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_session_answers(
+        self, session_id: int
+    ) -> Iterable[QuizSessionAnswerModel]:
+        """
+        List answers of quiz session
+
+        :param session_id:
+        :return: list of quiz session answers
+        """
+        pass
+
+    @abstractmethod
+    async def save_quiz_session_checkpoint(
+        self, user_id: int, quiz_id: int, answers: Dict[int, int]
+    ):
+        """
+        Create or replace checkpoint of quiz session in progress
+
+        :param user_id:
+        :param quiz_id:
+        :param answers: question id to chosen answer id
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def delete_quiz_session_checkpoint(self, user_id: int, quiz_id: int):
+        """
+        Delete checkpoint of quiz session in progress
+
+        :param user_id:
+        :param quiz_id:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_session_checkpoints(
+        self, updated_after: Optional[float] = None
+    ) -> Iterable[QuizSessionCheckpointModel]:
+        """
+        List checkpoints of quiz sessions in progress
+
+        :param updated_after: unix time, skip older checkpoints
+        :return: list of checkpoints
+        """
+        pass
+
+    @abstractmethod
+    async def increment_quiz_answer_stats(
+        self, answers: Iterable[Tuple[int, int, bool]]
+    ):
+        """
+        Count answers in question and answer statistics
+
+        :param answers: list of (question id, answer id, right)
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def get_last_session_answer_id(self) -> int:
+        """
+        :return: id of last answer of quiz sessions not archived, 0 if none
+        """
+        pass
+
+    @abstractmethod
+    def iter_answered_questions(
+        self, chunk_size: int = 10000, after_id: Optional[int] = None
+    ) -> AsyncIterator[List[Tuple[int, int, bool]]]:
+        """
+        Stream all answers of quiz sessions which still refer to quiz answers
+
+        :param chunk_size: number of answers in chunk
+        :param after_id: stream only answers of sessions not archived with
+            greater id, e.g. stored since :meth:`get_last_session_answer_id`
+        :return: async iterator over chunks of (question id, answer id, right)
+        """
+        pass
+
+    @abstractmethod
+    async def replace_quiz_answer_stats(
+        self,
+        questions: Iterable[Tuple[int, int, int]],
+        answers: Iterable[Tuple[int, int]],
+    ):
+        """
+        Replace all question and answer statistics
+
+        :param questions: list of (question id, answered, right)
+        :param answers: list of (answer id, chosen)
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_question_stats(
+        self, quiz_id: int
+    ) -> Iterable[QuizQuestionStatsModel]:
+        """
+        List statistics of quiz questions
+
+        :param quiz_id:
+        :return: list of statistics of every question of the quiz
+        """
+        pass
+
+    @abstractmethod
+    async def list_quiz_answer_stats(
+        self, quiz_id: int
+    ) -> Iterable[QuizAnswerStatsModel]:
+        """
+        List statistics of quiz answers
+
+        :param quiz_id:
+        :return: list of statistics of every answer of the quiz
+        """
+        pass
+
+    @abstractmethod
+    async def archive_quiz_sessions(
+        self, created_before: float, chunk_size: int = 100
+    ) -> int:
+        """
+        Pack answers of old quiz sessions into one compressed record per session,
+        every chunk of sessions is archived in its own transaction
+
+        :param created_before: unix time, archive sessions created before it
+        :param chunk_size: number of sessions archived per transaction
+        :return: number of archived sessions
+        """
+        pass
@@ -1,4 +1,5 @@
+from .broadcast import BroadcastService, MessageSender
 from .quiz import QuizService
 from .user import UserService
 
-__all__ = ("UserService", "QuizService")
+__all__ = ("UserService", "QuizService", "BroadcastService", "MessageSender")
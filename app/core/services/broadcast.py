@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import TYPE_CHECKING, Awaitable, Callable, Deque, Optional, Tuple
+
+from .. import BroadcastProgress, Repository, User
+from ..ratelimit import RateLimiter
+from ..tracing import traced
+from .builders import build_user
+
+if TYPE_CHECKING:
+    from babel import Locale
+
+
+class MessageSender(ABC):
+    """
+    Delivers broadcast messages, e.g. over Telegram Bot API
+    """
+
+    @abstractmethod
+    async def send(self, user: User, text: str):
+        """
+        Send message to user
+
+        :param user:
+        :param text:
+        :raises Exception: message was not delivered
+        """
+        pass
+
+
+class BroadcastService:
+    repo: Repository
+    sender: MessageSender
+    limiter: RateLimiter
+
+    concurrency: int
+    chunk_size: int
+
+    def __init__(
+        self,
+        repository: Repository,
+        sender: MessageSender,
+        rate: float = 25,
+        concurrency: int = 10,
+        chunk_size: int = 1000,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        """
+        :param repository:
+        :param sender:
+        :param rate: messages per second of all broadcasts together
+        :param concurrency: messages being sent at once by one broadcast
+        :param chunk_size: users read from repository at once
+        :param limiter: rate limiter shared with other senders ( overrides rate )
+        """
+        self.repo = repository
+        self.sender = sender
+        self.limiter = RateLimiter(rate) if limiter is None else limiter
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+
+    async def _send(self, user: User, text: str) -> bool:
+        try:
+            await self.sender.send(user, text)
+        except Exception:
+            # E.g. user blocked the bot, other users still get the message
+            return False
+        return True
+
+    @traced
+    async def broadcast(
+        self,
+        language: Locale,
+        text: str,
+        progress: Optional[BroadcastProgress] = None,
+        checkpoint: Optional[Callable[[BroadcastProgress], Awaitable[None]]] = None,
+        checkpoint_every: int = 100,
+    ) -> BroadcastProgress:
+        """
+        Send message to every user of language. Users are streamed in chunks
+        and messages are sent in bounded window in order of user ids, so
+        progress is a single id to resume after. Messages in flight when
+        broadcast is interrupted are sent again on resume
+
+        :param language:
+        :param text:
+        :param progress: progress of interrupted broadcast to resume
+        :param checkpoint: called with progress every ``checkpoint_every``
+            messages and on finish, e.g. to persist it
+        :param checkpoint_every:
+        :return: final progress
+        """
+        after_id = 0 if progress is None else progress.after_id
+        sent = 0 if progress is None else progress.sent
+        failed = 0 if progress is None else progress.failed
+        settled = 0
+
+        window: Deque[Tuple[int, asyncio.Task]] = deque()
+
+        async def settle():
+            # Oldest message first, so every user before after_id is done
+            nonlocal after_id, sent, failed, settled
+            user_id, task = window.popleft()
+            if await task:
+                sent += 1
+            else:
+                failed += 1
+            after_id = user_id
+            settled += 1
+            if checkpoint is not None and settled % checkpoint_every == 0:
+                await checkpoint(
+                    BroadcastProgress(language, after_id, sent=sent, failed=failed)
+                )
+
+        try:
+            async for users in self.repo.iter_users_by_language(
+                language=language, after_id=after_id, chunk_size=self.chunk_size
+            ):
+                for user in users:
+                    if len(window) >= self.concurrency:
+                        await settle()
+
+                    await self.limiter.acquire()
+                    user = build_user(user)
+                    window.append(
+                        (user.id, asyncio.create_task(self._send(user, text)))
+                    )
+
+            while window:
+                await settle()
+        finally:
+            for _, task in window:
+                task.cancel()
+
+        result = BroadcastProgress(language, after_id, sent=sent, failed=failed)
+        if checkpoint is not None:
+            await checkpoint(result)
+        return result
@@ -0,0 +1,19 @@
+from .. import User
+from ..repository import UserModel
+
+
+def build_user(user: UserModel) -> User:
+    """
+    Build user entity from repository model, shared by services
+
+    :param user:
+    :return: user
+    """
+    return User(
+        id=user.id,
+        telegram_id=user.telegram_id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        username=user.username,
+        language=user.language,
+    )
@@ -1,99 +1,556 @@
-from typing import List, Optional, Set, Tuple
+from __future__ import annotations
 
-from babel import Locale
+import random
+import time
+from dataclasses import replace
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
 from .. import (
+    ContentSyncResult,
+    PendingQuizSession,
     Quiz,
+    QuizAnswer,
     QuizAnswerNotFoundError,
+    QuizAnswerStats,
+    QuizDefinitionError,
     QuizNotFoundError,
+    QuizQuestion,
+    QuizQuestionNotFoundError,
+    QuizQuestionStats,
     QuizSession,
     QuizSessionAnswer,
+    QuizSessionExistsError,
+    QuizSessionNotFoundError,
+    QuizSessionScore,
     Repository,
     User,
     UserNotFoundError,
 )
+from ..cache import LRUCache
+from ..content import QuestionDefinition, QuizDefinition
+from ..locale import LazyLocale
+from ..repository import QuizAnswerModel, QuizSessionModel
+from ..sessions import SessionStore
+from ..stats import AnswerStatsAccumulator
+from ..text import normalize_answer
+from ..tracing import traced
+
+if TYPE_CHECKING:
+    from babel import Locale
 
 
 class QuizService:
+    # Orders of listed quizzes
+    SORT_ID = "id"
+    SORT_POPULAR = "popular"
+
     repo: Repository
+    sessions: SessionStore
 
-    def __init__(self, repository: Repository) -> None:
+    default_language: Optional[Locale]
+
+    def __init__(
+        self,
+        repository: Repository,
+        sessions: Optional[SessionStore] = None,
+        default_language: Optional[Locale] = None,
+    ) -> None:
         self.repo = repository
+        self.sessions = SessionStore() if sessions is None else sessions
+        self.default_language = default_language
+
+        # Requested language to languages to list quizzes of
+        self._language_chains: LRUCache[Locale, Tuple[Locale, ...]] = LRUCache(
+            maxsize=256
+        )
+
+        # Quiz id to ids of its questions
+        self._question_ids: LRUCache[int, List[int]] = LRUCache(maxsize=1024)
+        self.repo.add_quiz_listener(self._question_ids.pop)
+
+        # Question id to question with answers, questions are shared by
+        # quizzes, so are their entries
+        self._questions: LRUCache[int, QuizQuestion] = LRUCache(maxsize=4096)
+        self.repo.add_question_listener(self._questions.pop)
+
+    async def _get_question_ids(self, quiz_id: int) -> List[int]:
+        # Must be called inside of transaction
+        question_ids = self._question_ids.get(quiz_id)
+        if question_ids is None:
+            if await self.repo.get_quiz(quiz_id=quiz_id) is None:
+                raise QuizNotFoundError(id=quiz_id)
+
+            question_ids = list(await self.repo.list_quiz_question_ids(quiz_id=quiz_id))
+            self._question_ids.set(quiz_id, question_ids)
+        return question_ids
+
+    async def _get_questions(self, question_ids: Sequence[int]) -> List[QuizQuestion]:
+        # Must be called inside of transaction
+        questions = {}
+        missing = []
+        for question_id in question_ids:
+            question = self._questions.get(question_id)
+            if question is None:
+                missing.append(question_id)
+            else:
+                questions[question_id] = question
+
+        for question, answers in await self.repo.list_quiz_questions_with_answers(
+            question_ids=missing
+        ):
+            questions[question.id] = QuizQuestion(
+                id=question.id,
+                question=question.question,
+                answers=[
+                    QuizAnswer(id=answer.id, value=answer.value, right=answer.right)
+                    for answer in answers
+                ],
+            )
+            self._questions.set(question.id, questions[question.id])
+        return [questions[id] for id in question_ids if id in questions]
+
+    async def _create_session(
+        self,
+        user_id: int,
+        quiz_id: int,
+        answer_ids: Iterable[int] = (),
+        text_answers: Sequence[Tuple[int, str]] = (),
+    ) -> Tuple[User, QuizSession]:
+        # Must be called inside of transaction
+        quiz_session = await self.repo.get_quiz_session_by_user(
+            user_id=user_id, quiz_id=quiz_id
+        )
+        if quiz_session is not None:
+            # Duplicate submission, return already stored session untouched
+            return await self._get_session(quiz_session)
 
+        user = await self.repo.get_user(user_id=user_id)
+        if user is None:
+            raise UserNotFoundError(id=user_id)
+
+        quiz = await self.repo.get_quiz(quiz_id=quiz_id)
+        if quiz is None:
+            raise QuizNotFoundError(id=quiz_id)
+
+        try:
+            quiz_session = await self.repo.create_quiz_session(
+                user_id=user_id,
+                quiz_id=quiz_id,
+                description=quiz.description,
+                language=quiz.language,
+            )
+        except QuizSessionExistsError:
+            # Concurrent duplicate submission was stored after the lookup
+            quiz_session = await self.repo.get_quiz_session_by_user(
+                user_id=user_id, quiz_id=quiz_id
+            )
+            if quiz_session is None:
+                raise
+            return await self._get_session(quiz_session)
+
+        resolved = []
+        for answer_id in answer_ids:
+            quiz_answer = await self.repo.get_quiz_answer(answer_id=answer_id)
+            if quiz_answer is None:
+                raise QuizAnswerNotFoundError(id=answer_id)
+
+            quiz_question = await self.repo.get_quiz_question(
+                question_id=quiz_answer.question_id
+            )
+            if quiz_question is None:
+                raise QuizAnswerNotFoundError(id=answer_id)
+
+            resolved.append((quiz_question, quiz_answer, quiz_answer.value))
+
+        if text_answers:
+            matches = await self.repo.match_quiz_answers(
+                answers=[
+                    (question_id, normalize_answer(text))
+                    for question_id, text in text_answers
+                ]
+            )
+            question_ids = set(await self._get_question_ids(quiz_id))
+            for (question_id, text), (quiz_question, quiz_answer) in zip(
+                text_answers, matches
+            ):
+                if quiz_question is None or quiz_question.id not in question_ids:
+                    raise QuizQuestionNotFoundError(id=question_id)
+                resolved.append(
+                    (
+                        quiz_question,
+                        quiz_answer,
+                        text if quiz_answer is None else quiz_answer.value,
+                    )
+                )
+
+        answers = []
+        counted = []
+
+        for quiz_question, quiz_answer, text in resolved:
+            # Text matching no answer is kept as given and counted as wrong
+            quiz_session_answer = await self.repo.create_quiz_session_answer(
+                session_id=quiz_session.id,
+                answer_id=None if quiz_answer is None else quiz_answer.id,
+                question=quiz_question.question,
+                answer=text,
+                right=quiz_answer is not None and quiz_answer.right,
+            )
+
+            answers.append(
+                QuizSessionAnswer(
+                    id=quiz_session_answer.id,
+                    question=quiz_session_answer.question,
+                    answer=quiz_session_answer.answer,
+                    right=quiz_session_answer.right,
+                )
+            )
+            if quiz_answer is not None:
+                counted.append((quiz_question.id, quiz_answer.id, quiz_answer.right))
+
+        await self.repo.increment_quiz_answer_stats(answers=counted)
+
+        # Stored, so score views never load answers
+        correct = sum(answer.right for answer in answers)
+        await self.repo.update_quiz_session_score(
+            session_id=quiz_session.id, correct=correct, total=len(answers)
+        )
+
+        return (
+            user,
+            QuizSession(
+                id=quiz_session.id,
+                description=quiz_session.description,
+                language=quiz_session.language,
+                answers=answers,
+                user=user,
+                quiz=quiz,
+                correct=correct,
+                total=len(answers),
+            ),
+        )
+
+    async def _get_submitted_session(
+        self, user_id: int, quiz_id: int
+    ) -> Optional[Tuple[User, QuizSession]]:
+        # Duplicate submission is served without waiting for write lock,
+        # session stored after the lookup is found again on write
+        async with self.repo.transaction(write=False):
+            quiz_session = await self.repo.get_quiz_session_by_user(
+                user_id=user_id, quiz_id=quiz_id
+            )
+            if quiz_session is None:
+                return None
+            return await self._get_session(quiz_session)
+
+    async def _get_session(
+        self, quiz_session: QuizSessionModel
+    ) -> Tuple[User, QuizSession]:
+        # Must be called inside of transaction
+        user = await self.repo.get_user(user_id=quiz_session.user_id)
+        if user is None:
+            raise UserNotFoundError(id=quiz_session.user_id)
+
+        quiz = None
+        if quiz_session.quiz_id is not None:
+            quiz = await self.repo.get_quiz(quiz_id=quiz_session.quiz_id)
+
+        answers = [
+            QuizSessionAnswer(
+                id=answer.id,
+                question=answer.question,
+                answer=answer.answer,
+                right=answer.right,
+            )
+            for answer in await self.repo.list_quiz_session_answers(
+                session_id=quiz_session.id
+            )
+        ]
+
+        return (
+            user,
+            QuizSession(
+                id=quiz_session.id,
+                description=quiz_session.description,
+                language=quiz_session.language,
+                answers=answers,
+                user=user,
+                quiz=quiz,
+                correct=quiz_session.correct,
+                total=quiz_session.total,
+            ),
+        )
+
+    @staticmethod
+    def _build_score(quiz_session: QuizSessionModel) -> QuizSessionScore:
+        return QuizSessionScore(
+            id=quiz_session.id,
+            quiz_id=quiz_session.quiz_id,
+            description=quiz_session.description,
+            language=quiz_session.language,
+            correct=quiz_session.correct,
+            total=quiz_session.total,
+            created_at=quiz_session.created_at,
+        )
+
+    @traced
+    async def get_session_score(self, user_id: int, quiz_id: int) -> QuizSessionScore:
+        """
+        Get score of submitted session without its answers
+
+        :param user_id:
+        :param quiz_id:
+        :return: score of session
+        """
+        async with self.repo.transaction(write=False):
+            quiz_session = await self.repo.get_quiz_session_by_user(
+                user_id=user_id, quiz_id=quiz_id
+            )
+        if quiz_session is None:
+            raise QuizSessionNotFoundError(user_id=user_id, quiz_id=quiz_id)
+
+        return self._build_score(quiz_session)
+
+    @traced
+    async def list_session_scores(
+        self, user_id: int, offset: int = 0, limit: int = 20
+    ) -> List[QuizSessionScore]:
+        """
+        List scores of submitted sessions of user, newest first
+
+        :param user_id:
+        :param offset:
+        :param limit:
+        :return: scores of sessions
+        """
+        async with self.repo.transaction(write=False):
+            quiz_sessions = await self.repo.list_quiz_sessions_by_user(
+                user_id=user_id, offset=offset, limit=limit
+            )
+
+        return [self._build_score(quiz_session) for quiz_session in quiz_sessions]
+
+    @traced
     async def submit_answers(
         self, user_id: int, quiz_id: int, answer_ids: Set[int]
     ) -> Tuple[User, QuizSession]:
         """
-        Submit answers
+        Submit answers ( idempotent, repeated submission returns stored session )
 
         :param user_id:
         :param quiz_id:
         :param answers_id: list of answers
         :return: updated user and created session
         """
+        submitted = await self._get_submitted_session(user_id, quiz_id)
+        if submitted is not None:
+            return submitted
+
         async with self.repo.transaction():
-            user = await self.repo.get_user(user_id=user_id)
-            if user is None:
+            return await self._create_session(user_id, quiz_id, answer_ids)
+
+    @traced
+    async def submit_text_answers(
+        self, user_id: int, quiz_id: int, answers: Iterable[Tuple[int, str]]
+    ) -> Tuple[User, QuizSession]:
+        """
+        Submit answers given as text ( e.g. button labels or typed answers ),
+        matched to answers of questions ignoring case, spacing and Unicode form.
+        Idempotent as :meth:`submit_answers`
+
+        :param user_id:
+        :param quiz_id:
+        :param answers: list of (question id, answer text), text matching no
+            answer of the question is stored as wrong answer
+        :return: updated user and created session
+        """
+        submitted = await self._get_submitted_session(user_id, quiz_id)
+        if submitted is not None:
+            return submitted
+
+        async with self.repo.transaction():
+            return await self._create_session(
+                user_id, quiz_id, text_answers=list(answers)
+            )
+
+    @traced
+    async def start_session(self, user_id: int, quiz_id: int) -> PendingQuizSession:
+        """
+        Start answering quiz question by question ( continues already started session )
+
+        :param user_id:
+        :param quiz_id:
+        :return: session in progress
+        """
+        session = self.sessions.get(user_id, quiz_id)
+        if session is not None:
+            return session
+
+        async with self.repo.transaction():
+            if await self.repo.get_user(user_id=user_id) is None:
                 raise UserNotFoundError(id=user_id)
 
-            quiz = await self.repo.get_quiz(quiz_id=quiz_id)
-            if quiz is None:
+            if await self.repo.get_quiz(quiz_id=quiz_id) is None:
                 raise QuizNotFoundError(id=quiz_id)
 
-            quiz_session = await self.repo.create_quiz_session(
-                user_id=user_id,
-                quiz_id=quiz_id,
-                description=quiz.description,
-                language=quiz.language,
+        session = PendingQuizSession(user_id=user_id, quiz_id=quiz_id, answers={})
+        self.sessions.put(session)
+        return session
+
+    @traced
+    async def answer_question(
+        self, user_id: int, quiz_id: int, answer_id: int
+    ) -> PendingQuizSession:
+        """
+        Answer question of session in progress ( replaces previous answer to the question )
+
+        :param user_id:
+        :param quiz_id:
+        :param answer_id:
+        :return: updated session in progress
+        """
+        session = self.sessions.get(user_id, quiz_id)
+        if session is None:
+            raise QuizSessionNotFoundError(user_id=user_id, quiz_id=quiz_id)
+
+        async with self.repo.transaction():
+            quiz_answer = await self.repo.get_quiz_answer(answer_id=answer_id)
+            if quiz_answer is None:
+                raise QuizAnswerNotFoundError(id=answer_id)
+
+            quiz_question = await self.repo.get_quiz_question(
+                question_id=quiz_answer.question_id
             )
+            if quiz_question is None or quiz_question.id not in (
+                await self._get_question_ids(quiz_id)
+            ):
+                raise QuizAnswerNotFoundError(id=answer_id)
 
-            answers = []
+        session = replace(
+            session, answers={**session.answers, quiz_question.id: answer_id}
+        )
+        self.sessions.put(session)
+        return session
 
-            for answer_id in answer_ids:
-                quiz_answer = await self.repo.get_quiz_answer(answer_id=answer_id)
-                if quiz_answer is None:
-                    raise QuizAnswerNotFoundError(id=answer_id)
+    @traced
+    async def finish_session(
+        self, user_id: int, quiz_id: int
+    ) -> Tuple[User, QuizSession]:
+        """
+        Write session in progress to database
 
-                quiz_question = await self.repo.get_quiz_question(
-                    question_id=quiz_answer.question_id
-                )
-                if quiz_question is None:
-                    raise QuizAnswerNotFoundError(id=answer_id)
-
-                quiz_session_answer = await self.repo.create_quiz_session_answer(
-                    session_id=quiz_session.id,
-                    answer_id=quiz_answer.id,
-                    question=quiz_question.question,
-                    answer=quiz_answer.value,
-                    right=quiz_answer.right,
-                )
+        :param user_id:
+        :param quiz_id:
+        :return: updated user and created session
+        """
+        session = self.sessions.get(user_id, quiz_id)
+        if session is None:
+            raise QuizSessionNotFoundError(user_id=user_id, quiz_id=quiz_id)
+
+        async with self.repo.transaction():
+            result = await self._create_session(
+                user_id, quiz_id, session.answers.values()
+            )
+            await self.repo.delete_quiz_session_checkpoint(
+                user_id=user_id, quiz_id=quiz_id
+            )
+
+        self.sessions.pop(user_id, quiz_id)
+        return result
 
-                answers.append(
-                    QuizSessionAnswer(
-                        id=quiz_session_answer.id,
-                        question=quiz_session_answer.question,
-                        answer=quiz_session_answer.answer,
-                        right=quiz_session_answer.right,
+    @traced
+    async def checkpoint_sessions(self) -> int:
+        """
+        Save sessions in progress changed since last checkpoint, so they survive restart
+
+        :return: number of saved sessions
+        """
+        self.sessions.expire()
+        dropped = self.sessions.take_dropped()
+        dirty = self.sessions.take_dirty()
+        if not dirty and not dropped:
+            return 0
+
+        try:
+            async with self.repo.transaction():
+                for user_id, quiz_id in dropped:
+                    await self.repo.delete_quiz_session_checkpoint(
+                        user_id=user_id, quiz_id=quiz_id
                     )
-                )
 
-            return (
-                user,
-                QuizSession(
-                    id=quiz_session.id,
-                    description=quiz_session.description,
-                    language=quiz_session.language,
-                    answers=answers,
-                    user=user,
-                    quiz=quiz,
+                for session in dirty.values():
+                    await self.repo.save_quiz_session_checkpoint(
+                        user_id=session.user_id,
+                        quiz_id=session.quiz_id,
+                        answers=session.answers,
+                    )
+        except BaseException:
+            self.sessions.mark_dropped(dropped)
+            self.sessions.mark_dirty(dirty.keys())
+            raise
+
+        return len(dirty)
+
+    @traced
+    async def restore_sessions(self, max_age: Optional[float] = None) -> int:
+        """
+        Load checkpointed sessions in progress into memory
+
+        :param max_age: seconds, skip checkpoints older than that
+        :return: number of restored sessions
+        """
+        async with self.repo.transaction():
+            checkpoints = await self.repo.list_quiz_session_checkpoints(
+                updated_after=None if max_age is None else time.time() - max_age
+            )
+
+        restored = 0
+        for checkpoint in checkpoints:
+            if self.sessions.get(checkpoint.user_id, checkpoint.quiz_id) is not None:
+                continue
+
+            self.sessions.put(
+                PendingQuizSession(
+                    user_id=checkpoint.user_id,
+                    quiz_id=checkpoint.quiz_id,
+                    answers=checkpoint.answers,
                 ),
+                dirty=False,
             )
+            restored += 1
+
+        return restored
+
+    def _get_language_chain(self, language: Optional[Locale]) -> Tuple[Locale, ...]:
+        if language is None:
+            # Nothing to fall back from, only default language is listed
+            return () if self.default_language is None else (self.default_language,)
+
+        chain = self._language_chains.get(language)
+        if chain is not None:
+            return chain
 
+        # en_Latn_AU -> en_Latn -> en -> default
+        candidates = [language]
+        if language.script and (language.territory or language.variant):
+            candidates.append(LazyLocale(language.language, script=language.script))
+        if language.script or language.territory or language.variant:
+            candidates.append(LazyLocale(language.language))
+        if self.default_language is not None:
+            candidates.append(self.default_language)
+
+        chain = tuple(dict.fromkeys(candidates))
+        self._language_chains.set(language, chain)
+        return chain
+
+    @traced
     async def list_quizzes(
         self,
         language: Optional[Locale] = None,
         offset: Optional[int] = 0,
         limit: Optional[int] = 100,
+        fallback: bool = False,
+        sort: str = SORT_ID,
+        after: Optional[Quiz] = None,
     ) -> Tuple[int, List[Quiz]]:
         """
         List quizzes for specific region
@@ -101,9 +558,27 @@ class QuizService:
         :param language:
         :param offset: number of quizzes to skip
         :param limit:
-        :return: list of quizzes ( without questions )
+        :param fallback: also list quizzes of parent and default languages
+            ( e.g. en_AU -> en -> default ), quizzes of closer languages first,
+            only default language is listed if language is None
+        :param sort: ``SORT_ID`` or ``SORT_POPULAR`` ( most played first, paged
+            with ``after`` instead of offset )
+        :param after: last quiz of previous page of popular quizzes
+        :return: count of all quizzes and list of quizzes ( without questions )
         """
-        async with self.repo.transaction():
+        if sort == self.SORT_POPULAR:
+            if offset:
+                raise ValueError("Popular quizzes are paged with after, not offset")
+            return await self._list_popular_quizzes(language, limit, fallback, after)
+        if sort != self.SORT_ID:
+            raise ValueError(f"Unknown sort {sort!r}")
+        if after is not None:
+            raise ValueError("Only popular quizzes are paged with after")
+
+        if fallback:
+            return await self._list_quizzes_with_fallback(language, offset, limit)
+
+        async with self.repo.transaction(write=False):
             quizzes = []
 
             for quiz in await self.repo.list_quizzes_by_language(
@@ -115,6 +590,7 @@ class QuizService:
                         description=quiz.description,
                         language=quiz.language,
                         questions=None,
+                        plays=quiz.plays,
                     )
                 )
 
@@ -122,3 +598,468 @@ class QuizService:
                 await self.repo.count_quizzes_by_language(language),
                 quizzes,
             )
+
+    async def _list_popular_quizzes(
+        self,
+        language: Optional[Locale],
+        limit: Optional[int],
+        fallback: bool,
+        after: Optional[Quiz],
+    ) -> Tuple[int, List[Quiz]]:
+        if fallback:
+            languages = self._get_language_chain(language)
+        else:
+            languages = () if language is None else (language,)
+
+        # Every language is one index range scan, the page continues in the
+        # language of its last quiz
+        keys = [str(language).lower() for language in languages]
+        start, cursor = 0, None
+        if after is not None:
+            key = str(after.language).lower()
+            start = keys.index(key) if key in keys else len(keys)
+            cursor = (after.plays, after.id)
+
+        quizzes = []
+        async with self.repo.transaction(write=False):
+            count = 0
+            for language in languages:
+                count += await self.repo.count_quizzes_by_language(language)
+
+            for language in languages[start:]:
+                if limit is not None and len(quizzes) >= limit:
+                    break
+                quizzes.extend(
+                    await self.repo.list_popular_quizzes(
+                        language=language,
+                        after=cursor,
+                        limit=None if limit is None else limit - len(quizzes),
+                    )
+                )
+                cursor = None
+
+        return (
+            count,
+            [
+                Quiz(
+                    id=quiz.id,
+                    description=quiz.description,
+                    language=quiz.language,
+                    questions=None,
+                    plays=quiz.plays,
+                )
+                for quiz in quizzes
+            ],
+        )
+
+    async def _list_quizzes_with_fallback(
+        self, language: Optional[Locale], offset: Optional[int], limit: Optional[int]
+    ) -> Tuple[int, List[Quiz]]:
+        languages = self._get_language_chain(language)
+        if not languages:
+            return 0, []
+
+        async with self.repo.transaction(write=False):
+            count, quizzes = await self.repo.list_quizzes_by_languages(
+                languages=languages,
+                offset=offset,
+                limit=limit,
+            )
+
+        return (
+            count,
+            [
+                Quiz(
+                    id=quiz.id,
+                    description=quiz.description,
+                    language=quiz.language,
+                    questions=None,
+                    plays=quiz.plays,
+                )
+                for quiz in quizzes
+            ],
+        )
+
+    @traced
+    async def warm_up(self, limit: int = 10) -> int:
+        """
+        Preload most played quizzes of every language with their questions,
+        first page of popular listing, so first requests after start don't pay
+        cold cache latency
+
+        :param limit: number of quizzes per language
+        :return: number of preloaded quizzes
+        """
+        async with self.repo.transaction(write=False):
+            languages = await self.repo.list_quiz_languages()
+
+        quiz_ids = set()
+        for language in languages:
+            _, quizzes = await self.list_quizzes(
+                language, limit=limit, fallback=True, sort=self.SORT_POPULAR
+            )
+            quiz_ids.update(quiz.id for quiz in quizzes)
+
+        for quiz_id in sorted(quiz_ids):
+            async with self.repo.transaction(write=False):
+                await self._get_questions(await self._get_question_ids(quiz_id))
+        return len(quiz_ids)
+
+    @traced
+    async def sample_questions(
+        self, quiz_id: int, k: int, seed: Optional[Union[int, str, bytes]] = None
+    ) -> List[QuizQuestion]:
+        """
+        Get random subset of quiz questions
+
+        :param quiz_id:
+        :param k: number of questions ( all questions if quiz has less, none if negative )
+        :param seed: seed of random generator, same seed gives same questions
+        :return: list of questions with answers
+        """
+        async with self.repo.transaction(write=False):
+            question_ids = await self._get_question_ids(quiz_id)
+            chosen = random.Random(seed).sample(
+                question_ids, max(0, min(k, len(question_ids)))
+            )
+            return await self._get_questions(chosen)
+
+    @traced
+    async def search_quizzes(
+        self,
+        text: str,
+        language: Optional[Locale] = None,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 20,
+    ) -> List[Quiz]:
+        """
+        Search quizzes by words of description or questions
+
+        :param text:
+        :param language: language of quizzes ( None for any )
+        :param offset: number of quizzes to skip
+        :param limit:
+        :return: list of quizzes ( without questions ), best matches first
+        """
+        async with self.repo.transaction(write=False):
+            return [
+                Quiz(
+                    id=quiz.id,
+                    description=quiz.description,
+                    language=quiz.language,
+                    questions=None,
+                    plays=quiz.plays,
+                )
+                for quiz in await self.repo.search_quizzes(
+                    text=text, language=language, offset=offset, limit=limit
+                )
+            ]
+
+    @traced
+    async def get_question_stats(self, quiz_id: int) -> List[QuizQuestionStats]:
+        """
+        Get answer statistics of quiz questions
+
+        :param quiz_id:
+        :return: list of questions, most often answered wrong first
+        """
+        async with self.repo.transaction(write=False):
+            if await self.repo.get_quiz(quiz_id=quiz_id) is None:
+                raise QuizNotFoundError(id=quiz_id)
+
+            questions = await self.repo.list_quiz_question_stats(quiz_id=quiz_id)
+            answers = await self.repo.list_quiz_answer_stats(quiz_id=quiz_id)
+
+        answers_by_question = {}
+        for answer in answers:
+            answers_by_question.setdefault(answer.question_id, []).append(
+                QuizAnswerStats(
+                    id=answer.answer_id,
+                    value=answer.value,
+                    right=answer.right,
+                    chosen=answer.chosen,
+                )
+            )
+
+        stats = [
+            QuizQuestionStats(
+                id=question.question_id,
+                question=question.question,
+                answered=question.answered,
+                right=question.right,
+                answers=answers_by_question.get(question.question_id, []),
+            )
+            for question in questions
+        ]
+        stats.sort(key=lambda question: question.right - question.answered)
+        return stats
+
+    @traced
+    async def recompute_question_stats(self, chunk_size: int = 10000) -> int:
+        """
+        Rebuild answer statistics from history of quiz sessions ( requires NumPy )
+
+        :param chunk_size: number of answers read at once
+        :return: number of counted answers
+        """
+        accumulator = AnswerStatsAccumulator()
+        counted = 0
+
+        # History is read from snapshot without write lock, so submissions
+        # aren't blocked, and answers stored since are counted on write
+        async with self.repo.transaction(write=False):
+            last_id = await self.repo.get_last_session_answer_id()
+            async for chunk in self.repo.iter_answered_questions(chunk_size=chunk_size):
+                accumulator.add(chunk)
+                counted += len(chunk)
+
+        async with self.repo.transaction():
+            async for chunk in self.repo.iter_answered_questions(
+                chunk_size=chunk_size, after_id=last_id
+            ):
+                accumulator.add(chunk)
+                counted += len(chunk)
+
+            await self.repo.replace_quiz_answer_stats(
+                questions=accumulator.questions(), answers=accumulator.answers()
+            )
+
+        return counted
+
+    @traced
+    async def create_bank_question(
+        self, question: str, answers: Sequence[Tuple[str, bool]]
+    ) -> QuizQuestion:
+        """
+        Create question in question bank, to be used by any number of quizzes
+
+        :param question:
+        :param answers: list of (value, right)
+        :return: created question
+        """
+        async with self.repo.transaction():
+            quiz_question = await self.repo.create_bank_question(question)
+            quiz_answers = [
+                await self.repo.create_quiz_answer(quiz_question.id, value, right)
+                for value, right in answers
+            ]
+        return QuizQuestion(
+            id=quiz_question.id,
+            question=quiz_question.question,
+            answers=[
+                QuizAnswer(id=answer.id, value=answer.value, right=answer.right)
+                for answer in quiz_answers
+            ],
+        )
+
+    @traced
+    async def add_bank_questions(
+        self, quiz_id: int, question_ids: Sequence[int]
+    ) -> List[QuizQuestion]:
+        """
+        Add questions of question bank to the end of quiz, questions already
+        in quiz are skipped
+
+        :param quiz_id:
+        :param question_ids:
+        :return: all questions of quiz
+        """
+        async with self.repo.transaction():
+            if await self.repo.get_quiz(quiz_id=quiz_id) is None:
+                raise QuizNotFoundError(id=quiz_id)
+            return await self._add_bank_questions(quiz_id, question_ids)
+
+    async def _add_bank_questions(
+        self, quiz_id: int, question_ids: Sequence[int]
+    ) -> List[QuizQuestion]:
+        # Must be called inside of transaction, opens none itself, so caller
+        # that created the quiz rolls it back along with failed links
+        questions = await self._get_questions(question_ids)
+        found = {question.id for question in questions}
+        for question_id in question_ids:
+            if question_id not in found:
+                raise QuizQuestionNotFoundError(id=question_id)
+
+        await self.repo.add_quiz_questions(quiz_id, question_ids)
+        return await self._get_questions(await self._get_question_ids(quiz_id))
+
+    @traced
+    async def create_quiz_from_bank(
+        self, description: str, language: Locale, question_ids: Sequence[int]
+    ) -> Quiz:
+        """
+        Create quiz of questions of question bank, questions and their answers
+        aren't copied
+
+        :param description:
+        :param language:
+        :param question_ids: questions in order of quiz
+        :return: created quiz
+        """
+        async with self.repo.transaction():
+            quiz = await self.repo.create_quiz(description, language)
+            questions = await self._add_bank_questions(quiz.id, question_ids)
+        return Quiz(
+            id=quiz.id,
+            description=quiz.description,
+            language=quiz.language,
+            questions=questions,
+        )
+
+    @staticmethod
+    def _same_answers(
+        answers: Sequence[QuizAnswerModel], definition: QuestionDefinition
+    ) -> bool:
+        return [(answer.value, answer.right) for answer in answers] == [
+            (answer.value, answer.right) for answer in definition.answers
+        ]
+
+    async def _resolve_questions(
+        self, definitions: Sequence[QuestionDefinition]
+    ) -> List[int]:
+        # Equal questions of question bank are reused, others are created
+        bank = {}
+        for question, answers in await self.repo.find_bank_questions(
+            questions=[definition.question for definition in definitions]
+        ):
+            bank.setdefault(question.question, []).append((question, answers))
+
+        question_ids = []
+        for definition in definitions:
+            for question, answers in bank.get(definition.question, []):
+                if self._same_answers(answers, definition):
+                    question_ids.append(question.id)
+                    break
+            else:
+                question = await self.repo.create_bank_question(definition.question)
+                for answer in definition.answers:
+                    await self.repo.create_quiz_answer(
+                        question.id, answer.value, answer.right
+                    )
+                question_ids.append(question.id)
+        return question_ids
+
+    async def _update_answers(
+        self,
+        question_id: int,
+        answers: Sequence[QuizAnswerModel],
+        definition: QuestionDefinition,
+    ):
+        # Answers are matched by value, so ids of unchanged ones and links of
+        # past sessions to them are kept
+        answers = {answer.value: answer for answer in answers}
+        for answer_definition in definition.answers:
+            answer = answers.pop(answer_definition.value, None)
+            if answer is None:
+                await self.repo.create_quiz_answer(
+                    question_id, answer_definition.value, answer_definition.right
+                )
+            elif answer.right != answer_definition.right:
+                await self.repo.update_quiz_answer(answer.id, answer_definition.right)
+        await self.repo.delete_quiz_answers(
+            answer_ids=[answer.id for answer in answers.values()]
+        )
+
+    async def _update_quiz_content(self, quiz_id: int, definition: QuizDefinition):
+        quiz = await self.repo.get_quiz(quiz_id)
+        if (quiz.description, quiz.language) != (
+            definition.description,
+            definition.language,
+        ):
+            await self.repo.update_quiz(
+                quiz_id, definition.description, definition.language
+            )
+
+        # Questions are matched by text
+        current = {
+            question.question: (question, answers)
+            for question, answers in await self.repo.list_quiz_questions_with_answers(
+                question_ids=await self.repo.list_quiz_question_ids(quiz_id=quiz_id)
+            )
+        }
+        quiz_ids = await self.repo.list_question_quiz_ids(
+            question_ids=[question.id for question, _ in current.values()]
+        )
+
+        question_ids = {}
+        unresolved = []
+        for position, question_definition in enumerate(definition.questions):
+            question, answers = current.get(question_definition.question, (None, []))
+            if question is None:
+                unresolved.append(position)
+            elif self._same_answers(answers, question_definition):
+                question_ids[position] = question.id
+            elif quiz_ids.get(question.id, []) == [quiz_id]:
+                await self._update_answers(question.id, answers, question_definition)
+                question_ids[position] = question.id
+            else:
+                # Question is shared, other quizzes keep it as it is
+                unresolved.append(position)
+
+        resolved = await self._resolve_questions(
+            [definition.questions[position] for position in unresolved]
+        )
+        question_ids.update(zip(unresolved, resolved))
+
+        # Questions left out stay in question bank
+        await self.repo.set_quiz_questions(
+            quiz_id, [question_ids[position] for position in sorted(question_ids)]
+        )
+
+    @traced
+    async def sync_content(
+        self, definitions: Iterable[QuizDefinition]
+    ) -> ContentSyncResult:
+        """
+        Bring quizzes in line with their definitions in one transaction. Quizzes
+        are matched by definition key and only those whose content hash changed
+        are diffed, changed questions and answers are written, and caches of
+        changed quizzes only are invalidated. Equal questions of question bank
+        are reused, questions shared with other quizzes are never changed in
+        place, quizzes without definition are kept
+
+        :param definitions:
+        :return: ids of created and updated quizzes
+        :raises QuizDefinitionError: keys of definitions aren't unique
+        """
+        definitions = list(definitions)
+        keys = set()
+        for definition in definitions:
+            if definition.key in keys:
+                raise QuizDefinitionError(key=definition.key, reason="duplicate key")
+            keys.add(definition.key)
+
+        created = []
+        updated = []
+        unchanged = 0
+
+        async with self.repo.transaction():
+            contents = {
+                content.key: content for content in await self.repo.list_quiz_contents()
+            }
+            for definition in definitions:
+                content_hash = definition.content_hash()
+                content = contents.get(definition.key)
+                if content is None:
+                    quiz = await self.repo.create_quiz(
+                        definition.description, definition.language
+                    )
+                    quiz_id = quiz.id
+                    await self.repo.set_quiz_questions(
+                        quiz_id, await self._resolve_questions(definition.questions)
+                    )
+                    created.append(quiz_id)
+                elif content.hash != content_hash:
+                    quiz_id = content.quiz_id
+                    await self._update_quiz_content(quiz_id, definition)
+                    updated.append(quiz_id)
+                else:
+                    unchanged += 1
+                    continue
+                await self.repo.save_quiz_content(quiz_id, definition.key, content_hash)
+
+        # Changes are visible now, readers reload changed quizzes only
+        for quiz_id in created + updated:
+            self.repo.notify_quiz_changed(quiz_id)
+
+        return ContentSyncResult(created=created, updated=updated, unchanged=unchanged)
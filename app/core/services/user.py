@@ -1,8 +1,14 @@
-from typing import Optional
+from __future__ import annotations
 
-from babel import Locale
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Tuple
 
-from .. import Repository, User
+from .. import Repository, User, UserNotFoundError
+from ..repository import UserDeletionModel
+from ..tracing import traced
+from .builders import build_user
+
+if TYPE_CHECKING:
+    from babel import Locale
 
 
 class UserService:
@@ -11,6 +17,7 @@ class UserService:
     def __init__(self, repository: Repository) -> None:
         self.repo = repository
 
+    @traced
     async def resolve_user(
         self,
         telegram_id: int,
@@ -30,29 +37,54 @@ class UserService:
         :return: created or updated user
         """
         async with self.repo.transaction():
-            user = await self.repo.get_user_by_telegram_id(telegram_id=telegram_id)
-            if not user:
-                user = await self.repo.create_user(
-                    telegram_id,
-                    language=language,
-                    first_name=first_name,
-                    last_name=last_name,
-                    username=username,
-                )
-            else:
-                await self.repo.update_user(
-                    user_id=user.id,
-                    first_name=first_name,
-                    last_name=last_name,
-                    username=username,
-                    language=language,
-                )
-
-            return User(
-                id=user.id,
-                telegram_id=user.telegram_id,
+            user = await self.repo.upsert_user(
+                telegram_id,
+                language=language,
                 first_name=first_name,
                 last_name=last_name,
                 username=username,
-                language=language,
             )
+
+        return User(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            first_name=first_name,
+            last_name=last_name,
+            username=username,
+            language=language,
+        )
+
+    @traced
+    async def resolve_users(
+        self, batch: Iterable[Tuple[int, Locale, str, Optional[str], Optional[str]]]
+    ) -> List[User]:
+        """
+        Resolve many users at once, e.g. members of group chat
+
+        :param batch: telegram id, language, first name, last name and username
+            of every user
+        :return: created or updated users, in order of batch
+        """
+        async with self.repo.transaction():
+            users = await self.repo.upsert_users(list(batch))
+
+        return [build_user(user) for user in users]
+
+    @traced
+    async def delete_user(
+        self,
+        user_id: int,
+        progress: Optional[Callable[[UserDeletionModel], None]] = None,
+    ) -> UserDeletionModel:
+        """
+        Delete user and all their history, e.g. on data removal request.
+        History is deleted in chunks, so live updates aren't stalled
+
+        :param user_id:
+        :param progress: called with deleted counts after every chunk
+        :return: deleted counts
+        """
+        deleted = await self.repo.delete_user(user_id=user_id, progress=progress)
+        if not deleted.users:
+            raise UserNotFoundError(id=user_id)
+        return deleted
@@ -0,0 +1,131 @@
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import LRUCache
+from .entities import PendingQuizSession
+
+SessionKey = Tuple[int, int]
+
+
+class SessionStore:
+    """
+    Bounded in-memory store of quiz sessions in progress
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: Optional[float] = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param maxsize: maximal number of sessions kept in memory
+        :param ttl: seconds of inactivity after which session is dropped
+        :param clock: monotonic time source
+        """
+        self._sessions: LRUCache[SessionKey, PendingQuizSession] = LRUCache(
+            maxsize=maxsize, ttl=ttl, clock=clock, on_evict=self._drop
+        )
+        self._dirty: Set[SessionKey] = set()
+        # Sessions evicted or expired since last checkpoint, their checkpoints
+        # have to be deleted, or restart would bring them back
+        self._dropped: Set[SessionKey] = set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _drop(self, key: SessionKey, session: PendingQuizSession):
+        self._dirty.discard(key)
+        self._dropped.add(key)
+
+    def get(self, user_id: int, quiz_id: int) -> Optional[PendingQuizSession]:
+        """
+        Get session in progress
+
+        :param user_id:
+        :param quiz_id:
+        :return: session or None if not started or expired
+        """
+        return self._sessions.get((user_id, quiz_id))
+
+    def put(self, session: PendingQuizSession, dirty: bool = True):
+        """
+        Store session
+
+        :param session:
+        :param dirty: whether session has to be included in the next checkpoint
+        """
+        key = (session.user_id, session.quiz_id)
+        self._dropped.discard(key)
+        self._sessions.set(key, session)
+
+        if dirty:
+            self._dirty.add(key)
+        else:
+            self._dirty.discard(key)
+
+    def pop(self, user_id: int, quiz_id: int) -> Optional[PendingQuizSession]:
+        """
+        Remove session
+
+        :param user_id:
+        :param quiz_id:
+        :return: removed session or None if not started or expired
+        """
+        self._dirty.discard((user_id, quiz_id))
+        self._dropped.discard((user_id, quiz_id))
+        return self._sessions.pop((user_id, quiz_id))
+
+    def expire(self) -> List[PendingQuizSession]:
+        """
+        Drop sessions inactive for longer than ttl
+
+        :return: dropped sessions
+        """
+        return [session for _, session in self._sessions.expire()]
+
+    def mark_dirty(self, keys: Iterable[SessionKey]):
+        """
+        Include sessions in the next checkpoint again ( e.g. after failed write )
+
+        :param keys: (user id, quiz id) pairs
+        """
+        for key in keys:
+            if key in self._sessions:
+                self._dirty.add(key)
+
+    def take_dirty(self) -> Dict[SessionKey, PendingQuizSession]:
+        """
+        Get sessions changed since last call and mark them as clean
+
+        :return: changed sessions by (user id, quiz id)
+        """
+        dirty = {}
+        for key in self._dirty:
+            # Checkpoint doesn't make session recently used
+            session = self._sessions.peek(key)
+            if session is not None:
+                dirty[key] = session
+        self._dirty.clear()
+        return dirty
+
+    def take_dropped(self) -> Set[SessionKey]:
+        """
+        Get sessions evicted or expired since last call, so their checkpoints
+        are deleted
+
+        :return: (user id, quiz id) pairs
+        """
+        dropped, self._dropped = self._dropped, set()
+        return dropped
+
+    def mark_dropped(self, keys: Iterable[SessionKey]):
+        """
+        Include sessions in the next checkpoint as dropped again ( e.g. after
+        failed write ), unless they were stored since
+
+        :param keys: (user id, quiz id) pairs
+        """
+        for key in keys:
+            if key not in self._sessions:
+                self._dropped.add(key)
@@ -0,0 +1,77 @@
+from typing import List, Sequence, Tuple
+
+
+class AnswerStatsAccumulator:
+    """
+    Aggregates answers streamed in chunks into question and answer counters,
+    every chunk is reduced with vectorized NumPy operations
+
+    Requires NumPy ( stats extra ), which is imported on first use only
+    """
+
+    def __init__(self) -> None:
+        try:
+            import numpy
+        except ImportError as error:
+            raise ImportError(
+                "Answer statistics require NumPy, install with stats extra"
+            ) from error
+
+        self._np = numpy
+        empty = numpy.empty(0, dtype=numpy.int64)
+        # Sorted unique ids and their counters
+        self._question_ids = self._answered = self._right = empty
+        self._answer_ids = self._chosen = empty
+
+    def _reduce(self, ids, *counters):
+        np = self._np
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        return (unique_ids,) + tuple(
+            np.bincount(inverse, weights=counter, minlength=len(unique_ids)).astype(
+                np.int64
+            )
+            for counter in counters
+        )
+
+    def add(self, chunk: Sequence[Tuple[int, int, bool]]):
+        """
+        Count chunk of answers
+
+        :param chunk: list of (question id, answer id, right)
+        """
+        if not len(chunk):
+            return
+
+        np = self._np
+        rows = np.asarray(chunk, dtype=np.int64)
+        ones = np.ones(len(rows), dtype=np.int64)
+
+        # Merge counters of the chunk with running counters and reduce again,
+        # so memory stays proportional to number of distinct ids
+        self._question_ids, self._answered, self._right = self._reduce(
+            np.concatenate((self._question_ids, rows[:, 0])),
+            np.concatenate((self._answered, ones)),
+            np.concatenate((self._right, rows[:, 2])),
+        )
+        self._answer_ids, self._chosen = self._reduce(
+            np.concatenate((self._answer_ids, rows[:, 1])),
+            np.concatenate((self._chosen, ones)),
+        )
+
+    def questions(self) -> List[Tuple[int, int, int]]:
+        """
+        :return: list of (question id, answered, right)
+        """
+        return list(
+            zip(
+                self._question_ids.tolist(),
+                self._answered.tolist(),
+                self._right.tolist(),
+            )
+        )
+
+    def answers(self) -> List[Tuple[int, int]]:
+        """
+        :return: list of (answer id, chosen)
+        """
+        return list(zip(self._answer_ids.tolist(), self._chosen.tolist()))
@@ -0,0 +1,13 @@
+import unicodedata
+
+
+def normalize_answer(text: str) -> str:
+    """
+    Normalize answer text for matching: Unicode NFKC, case folded, runs of
+    whitespace collapsed into single space, no leading or trailing whitespace
+
+    :param text:
+    :return: normalized text
+    """
+    text = unicodedata.normalize("NFKC", unicodedata.normalize("NFKC", text).casefold())
+    return " ".join(text.split())
@@ -0,0 +1,176 @@
+import functools
+import itertools
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class Span:
+    """
+    Timed operation of traced request, spans of one request share trace id
+    """
+
+    name: str
+    trace_id: str
+    span_id: int
+    parent_id: Optional[int]
+    # Wall clock time of start and seconds it took
+    start: float
+    duration: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes: Any):
+        """
+        Set attributes of span
+        """
+        self.attributes.update(attributes)
+
+
+class TraceSink(ABC):
+    """
+    Receives spans of every finished trace
+    """
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        """
+        Handle finished trace
+
+        :param spans: spans of the trace, root span first
+        """
+        pass
+
+
+class _Trace:
+    def __init__(self) -> None:
+        self.id = os.urandom(8).hex()
+        self.spans: List[Span] = []
+        self.finished = False
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+
+_sink: Optional[TraceSink] = None
+# Trace of current context and its innermost span
+_current: ContextVar[Optional[Tuple[_Trace, Span]]] = ContextVar(
+    "tracing_span", default=None
+)
+
+
+def set_sink(sink: Optional[TraceSink]):
+    """
+    Enable tracing, spans are not recorded until sink is set
+
+    :param sink: sink of finished traces ( None to disable tracing )
+    """
+    global _sink
+    _sink = sink
+
+
+def current_span() -> Optional[Span]:
+    """
+    :return: innermost span of current context or None if not traced
+    """
+    current = _current.get()
+    return None if current is None else current[1]
+
+
+def _start(
+    name: str, attributes: Dict[str, Any]
+) -> Optional[Tuple[Token, _Trace, Span]]:
+    current = _current.get()
+    if current is None:
+        trace = _Trace()
+        parent_id = None
+    else:
+        trace, parent = current
+        if trace.finished:
+            # Trace is already exported, e.g. task outlived its request
+            return None
+        parent_id = parent.span_id
+
+    span = Span(
+        name=name,
+        trace_id=trace.id,
+        span_id=trace.next_id(),
+        parent_id=parent_id,
+        start=time.time(),
+        attributes=attributes,
+    )
+    trace.spans.append(span)
+    return _current.set((trace, span)), trace, span
+
+
+def _finish(token: Token, trace: _Trace, span: Span, started: float):
+    span.duration = time.perf_counter() - started
+    _current.reset(token)
+
+    if span.parent_id is None:
+        trace.finished = True
+        if _sink is not None:
+            _sink.export(trace.spans)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Trace block of code as span, child of the current one
+
+    :param name:
+    :param attributes: initial attributes
+    :return: span or None if tracing is disabled
+    """
+    if _sink is None:
+        yield None
+        return
+
+    started = time.perf_counter()
+    started_span = _start(name, attributes)
+    if started_span is None:
+        yield None
+        return
+
+    token, trace, current = started_span
+    try:
+        yield current
+    except BaseException as error:
+        current.set(error=type(error).__name__)
+        raise
+    finally:
+        _finish(token, trace, current, started)
+
+
+def traced(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Trace every call of coroutine function as span named by its qualified name
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _sink is None:
+            return await func(*args, **kwargs)
+
+        with span(name):
+            return await func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,29 @@
+from app.contrib.repository.archive import (
+    decode_session_answers,
+    encode_session_answers,
+)
+from app.core.repository import QuizSessionAnswerModel
+
+
+def test_session_answers_round_trip():
+    answers = [
+        QuizSessionAnswerModel(
+            id=1,
+            answer_id=10,
+            session_id=5,
+            question="Which city is the capital of Ukraine?",
+            answer="Київ",
+            right=True,
+        ),
+        QuizSessionAnswerModel(
+            id=2,
+            answer_id=None,
+            session_id=5,
+            question="Which city is the capital of Japan?",
+            answer="",
+            right=False,
+        ),
+    ]
+
+    assert decode_session_answers(5, encode_session_answers(answers)) == answers
+    assert decode_session_answers(5, encode_session_answers([])) == []
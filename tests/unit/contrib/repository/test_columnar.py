@@ -0,0 +1,75 @@
+import numpy
+import pytest
+from babel import Locale
+
+from app.contrib import ColumnarExport, MemoryRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_export_session_results(repo: MemoryRepository, tmp_path):
+    directory = str(tmp_path / "results")
+    user = await repo.create_user(42, Locale("en", "AU"), "John")
+    quiz = await repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+    question = await repo.create_quiz_question(quiz.id, "Capital of Japan?")
+    tokyo = await repo.create_quiz_answer(question.id, "Tokyo", True)
+    kyoto = await repo.create_quiz_answer(question.id, "Kyoto", False)
+
+    old = await repo.create_quiz_session(
+        user.id, quiz.id, quiz.description, quiz.language
+    )
+    await repo.create_quiz_session_answer(
+        old.id, tokyo.id, question.question, tokyo.value, True
+    )
+    other = await repo.create_user(7, Locale("uk"), "Ann")
+    new = await repo.create_quiz_session(
+        other.id, quiz.id, quiz.description, Locale("uk")
+    )
+    for answer in (kyoto, tokyo):
+        await repo.create_quiz_session_answer(
+            new.id, answer.id, question.question, answer.value, answer.right
+        )
+    await repo.create_quiz_session_answer(new.id, None, "Longest river?", "Nile", True)
+    assert await repo.archive_quiz_sessions(created_before=new.created_at) == 1
+
+    rows = await repo.export_session_results(directory, chunk_size=2)
+    assert rows == {"quiz_session": 2, "quiz_session_answer": 4}
+
+    export = ColumnarExport(directory)
+    sessions = export.table("quiz_session")
+    assert isinstance(sessions["id"], numpy.memmap)
+    assert sessions["id"].tolist() == [old.id, new.id]
+    assert sessions["user_id"].tolist() == [user.id, other.id]
+    assert sessions["archived"].tolist() == [True, False]
+    assert export.decode(sessions["language"]) == ["en_AU", "uk"]
+    assert export.decode(sessions["description"]) == ["Capitals quiz"] * 2
+
+    answers = export.table("quiz_session_answer")
+    assert answers["session_id"].tolist() == [old.id, new.id, new.id, new.id]
+    assert answers["answer_id"].tolist() == [tokyo.id, kyoto.id, tokyo.id, -1]
+    assert answers["right"].tolist() == [True, False, True, True]
+    assert export.decode(answers["answer"]) == ["Tokyo", "Kyoto", "Tokyo", "Nile"]
+    # Repeated strings share codes
+    assert len(set(answers["question"].tolist())) == 2
+    assert answers["answer"][0] == answers["answer"][2]
+
+    # Export is replaced as whole
+    await repo.delete_user(other.id)
+    assert await repo.export_session_results(directory) == {
+        "quiz_session": 1,
+        "quiz_session_answer": 1,
+    }
+    assert ColumnarExport(directory).column("quiz_session", "id").tolist() == [old.id]
+
+
+async def test_export_session_results_empty(repo: MemoryRepository, tmp_path):
+    directory = str(tmp_path / "results")
+    assert await repo.export_session_results(directory) == {
+        "quiz_session": 0,
+        "quiz_session_answer": 0,
+    }
+    export = ColumnarExport(directory)
+    assert export.column("quiz_session_answer", "question").tolist() == []
+    assert export.decode([-1]) == [None]
+    with pytest.raises(KeyError):
+        export.column("quiz_session", "missing")
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from babel import Locale
+
+from app.contrib import MaintenanceScheduler, MemoryRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_maintenance(tmp_path):
+    repo = MemoryRepository(str(tmp_path / "quiz.db"))
+    await repo.connect()
+    await repo.migrate()
+    try:
+        async with repo.transaction():
+            quiz = await repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+            for i in range(200):
+                await repo.create_quiz_question(quiz.id, f"Question {i}?" * 50)
+        await repo.connection.execute("DELETE FROM quiz_question")
+        await repo.connection.commit()
+
+        assert (await repo.checkpoint_wal())[0] > 0
+        assert await repo.incremental_vacuum(10) == 10
+        await repo.optimize()
+
+        now = [0.0]
+        scheduler = MaintenanceScheduler(
+            repo,
+            optimize_interval=None,
+            checkpoint_interval=10,
+            vacuum_interval=20,
+            idle_time=0,
+            max_defer=5,
+            clock=lambda: now[0],
+        )
+        assert await scheduler.run_pending() == []
+        now[0] = 10
+        assert await scheduler.run_pending() == ["checkpoint"]
+        now[0] = 20
+        assert await scheduler.run_pending() == ["checkpoint", "vacuum"]
+
+        # Jobs wait for idle repository until they are overdue
+        scheduler.idle_time = 60
+        now[0] = 30
+        assert await scheduler.run_pending() == []
+        now[0] = 35
+        assert await scheduler.run_pending() == ["checkpoint"]
+        assert scheduler.runs == {"checkpoint": 3, "vacuum": 1}
+        assert not scheduler.errors
+    finally:
+        await repo.close()
+
+
+async def test_start_maintenance(repo: MemoryRepository):
+    warmed = asyncio.Event()
+
+    async def warm_up():
+        warmed.set()
+
+    scheduler = repo.start_maintenance(poll_interval=0.01, warm_up=warm_up)
+    assert repo.start_maintenance() is scheduler
+    await asyncio.wait_for(warmed.wait(), 1)
+    assert scheduler.runs == {"warm_up": 1}
+
+    assert repo.idle_time() >= 0
+    async with repo.transaction():
+        assert repo.idle_time() == 0
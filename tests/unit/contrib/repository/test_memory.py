@@ -1,6 +1,14 @@
+import asyncio
+import sqlite3
+import time
+
 import pytest
+import pytest_asyncio
+from babel import Locale
 
-from app.contrib import MemoryRepository
+from app.contrib import BusyRetryPolicy, MemoryRepository
+from app.core import QueryTimeoutError
+from app.core.repository import UserDeletionModel
 
 pytestmark = pytest.mark.asyncio
 
@@ -11,3 +19,388 @@ async def test_generate_constraints():
     )
     assert constraints == ["`a`", "?", "?"]
     assert values == [None, "test"]
+
+
+async def test_archive_quiz_sessions(repo: MemoryRepository):
+    user = await repo.create_user(42, Locale("en", "AU"), "John")
+    quiz = await repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+    question = await repo.create_quiz_question(quiz.id, "Capital of Japan?")
+    answer = await repo.create_quiz_answer(question.id, "Tokyo", True)
+
+    old = await repo.create_quiz_session(
+        user.id, quiz.id, quiz.description, quiz.language
+    )
+    old_answers = [
+        await repo.create_quiz_session_answer(
+            old.id, answer.id, question.question, answer.value, answer.right
+        )
+    ]
+    other_quiz = await repo.create_quiz("Rivers quiz", Locale("en", "AU"))
+    new = await repo.create_quiz_session(
+        user.id, other_quiz.id, other_quiz.description, other_quiz.language
+    )
+    new_answers = [
+        await repo.create_quiz_session_answer(
+            new.id, None, "Longest river?", "Nile", True
+        )
+    ]
+
+    assert await repo.archive_quiz_sessions(created_before=new.created_at) == 1
+    assert await repo.archive_quiz_sessions(created_before=new.created_at) == 0
+
+    async with repo.connection.execute(
+        "SELECT COUNT(*) FROM quiz_session_answer"
+    ) as cur:
+        assert (await cur.fetchone())[0] == 1
+
+    assert await repo.list_quiz_session_answers(old.id) == old_answers
+    assert await repo.list_quiz_session_answers(new.id) == new_answers
+
+    chunks = [chunk async for chunk in repo.iter_answered_questions()]
+    assert chunks == [[(question.id, answer.id, True)]]
+
+    # Only answers stored since are streamed after last answer id
+    last_id = await repo.get_last_session_answer_id()
+    assert last_id == new_answers[0].id
+    assert [
+        chunk async for chunk in repo.iter_answered_questions(after_id=last_id)
+    ] == []
+    answer_id = (
+        await repo.create_quiz_session_answer(new.id, answer.id, "", "", True)
+    ).id
+    assert [
+        chunk async for chunk in repo.iter_answered_questions(after_id=last_id)
+    ] == [[(question.id, answer.id, True)]]
+    assert await repo.get_last_session_answer_id() == answer_id
+
+
+async def test_session_texts_interned(repo: MemoryRepository):
+    user = await repo.create_user(42, Locale("en", "AU"), "John")
+    quiz = await repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+    session = await repo.create_quiz_session(
+        user.id, quiz.id, quiz.description, quiz.language
+    )
+
+    with pytest.raises(ZeroDivisionError):
+        async with repo.transaction():
+            await repo.create_quiz_session_answer(
+                session.id, None, "Capital of Japan?", "Tokyo", True
+            )
+            raise ZeroDivisionError()
+
+    async with repo.transaction():
+        for _ in range(3):
+            await repo.create_quiz_session_answer(
+                session.id, None, "Capital of Japan?", "Tokyo", True
+            )
+
+    answers = await repo.list_quiz_session_answers(session.id)
+    assert [answer.answer for answer in answers] == ["Tokyo"] * 3
+
+    async with repo.connection.execute("SELECT COUNT(*) FROM quiz_session_text") as cur:
+        assert (await cur.fetchone())[0] == 2
+
+
+class SlowRepository(MemoryRepository):
+    async def count_forever(self) -> int:
+        async with self._cursor() as cur:
+            await cur.execute(
+                "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter) "
+                "SELECT COUNT(*) FROM counter"
+            )
+            return (await cur.fetchone())[0]
+
+
+@pytest_asyncio.fixture()
+async def slow_repo():
+    repo = SlowRepository(":memory:")
+    await repo.connect()
+    await repo.generate_schema()
+    try:
+        yield repo
+    finally:
+        await repo.close()
+
+
+async def test_deadline_interrupts_statement(slow_repo: SlowRepository):
+    with pytest.raises(QueryTimeoutError):
+        with slow_repo.deadline(0.1):
+            await slow_repo.count_forever()
+
+    with pytest.raises(QueryTimeoutError):
+        async with slow_repo.transaction(timeout=0.1):
+            await slow_repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+            await slow_repo.count_forever()
+
+    # Interrupted transaction is rolled back and connection stays usable
+    assert await slow_repo.count_quizzes_by_language(Locale("en", "AU")) == 0
+    with slow_repo.deadline(1):
+        await slow_repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+    assert await slow_repo.count_quizzes_by_language(Locale("en", "AU")) == 1
+
+
+async def test_statement_timeout(slow_repo: SlowRepository):
+    slow_repo.statement_timeout = 0.1
+    with pytest.raises(QueryTimeoutError):
+        await slow_repo.count_forever()
+    assert await slow_repo.count_quizzes_by_language(Locale("en", "AU")) == 0
+
+
+async def test_deadline_waiting_for_lock(repo: MemoryRepository):
+    locked = asyncio.Event()
+    release = asyncio.Event()
+
+    async def hold():
+        async with repo.transaction():
+            locked.set()
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await locked.wait()
+    try:
+        with pytest.raises(QueryTimeoutError):
+            with repo.deadline(0.05):
+                await repo.count_quizzes_by_language(Locale("en", "AU"))
+    finally:
+        release.set()
+        await holder
+
+    assert await repo.count_quizzes_by_language(Locale("en", "AU")) == 0
+
+
+async def test_nested_transaction(repo: MemoryRepository):
+    with pytest.raises(ValueError):
+        async with repo.transaction():
+            await repo.create_quiz("Outer quiz", Locale("en"))
+            async with repo.transaction():
+                await repo.create_quiz("Inner quiz", Locale("en"))
+            # Inner transaction doesn't commit the outer one
+            raise ValueError()
+    assert await repo.count_quizzes_by_language(Locale("en")) == 0
+
+    async with repo.transaction():
+        await repo.create_quiz("Outer quiz", Locale("en"))
+        with pytest.raises(ValueError):
+            async with repo.transaction():
+                await repo.create_quiz("Inner quiz", Locale("en"))
+                raise ValueError()
+    assert [
+        quiz.description for quiz in await repo.list_quizzes_by_language(Locale("en"))
+    ] == ["Outer quiz"]
+
+
+async def test_busy_retry(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    holder = MemoryRepository(path)
+    waiter = MemoryRepository(
+        path, busy_retry=BusyRetryPolicy(max_wait=5, initial_delay=0.001)
+    )
+    impatient = MemoryRepository(path, busy_retry=BusyRetryPolicy(max_wait=0.02))
+    for repo in (holder, waiter, impatient):
+        await repo.connect()
+    await holder.migrate()
+
+    try:
+        async with holder.transaction():
+            await holder.create_quiz("Capitals quiz", Locale("en", "AU"))
+
+            # Other process holds write lock
+            with pytest.raises(sqlite3.OperationalError):
+                async with impatient.transaction():
+                    pass
+            with pytest.raises(QueryTimeoutError):
+                async with waiter.transaction(timeout=0.02):
+                    pass
+
+            async def create_quiz():
+                async with waiter.transaction():
+                    await waiter.create_quiz("Rivers quiz", Locale("en", "AU"))
+
+            waiting = asyncio.create_task(create_quiz())
+            await asyncio.sleep(0.05)
+
+        await waiting
+        assert await holder.count_quizzes_by_language(Locale("en", "AU")) == 2
+    finally:
+        for repo in (holder, waiter, impatient):
+            await repo.close()
+
+    assert impatient.contention.failures == 1
+    assert waiter.contention.failures == 1
+    assert waiter.contention.transactions == 2
+    assert waiter.contention.contended == 2
+    assert waiter.contention.retries > 2
+    assert 0.05 <= waiter.contention.max_wait_time < 5
+    assert waiter.contention.wait_time > waiter.contention.max_wait_time
+
+
+async def test_read_transaction(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    writer = MemoryRepository(path)
+    reader = MemoryRepository(path, busy_retry=BusyRetryPolicy(max_wait=0.02))
+    for repo in (writer, reader):
+        await repo.connect()
+    await writer.migrate()
+
+    try:
+        async with writer.transaction():
+            await writer.create_quiz("Capitals quiz", Locale("en", "AU"))
+
+            # Reader doesn't wait for write lock and sees committed data only
+            async with reader.transaction(write=False):
+                assert await reader.count_quizzes_by_language(Locale("en", "AU")) == 0
+
+        async with reader.transaction(write=False):
+            assert await reader.count_quizzes_by_language(Locale("en", "AU")) == 1
+            with pytest.raises(RuntimeError):
+                async with reader.transaction():
+                    pass
+    finally:
+        for repo in (writer, reader):
+            await repo.close()
+
+    assert reader.contention.transactions == 0
+
+
+async def test_busy_retry_delays():
+    policy = BusyRetryPolicy(initial_delay=0.1, max_delay=0.3, jitter=0.5)
+    delays = policy.delays(lambda: 0.5)
+    assert [next(delays) for _ in range(4)] == pytest.approx(
+        [0.075, 0.15, 0.225, 0.225]
+    )
+
+
+async def test_delete_user(repo: MemoryRepository):
+    users = [
+        await repo.create_user(telegram_id, Locale("en", "AU"), "John")
+        for telegram_id in (1, 2, 3)
+    ]
+    for quiz_number in range(3):
+        quiz = await repo.create_quiz(f"Quiz {quiz_number}", Locale("en", "AU"))
+        for user in users:
+            session = await repo.create_quiz_session(
+                user.id, quiz.id, quiz.description, quiz.language
+            )
+            for answer_number in range(4):
+                await repo.create_quiz_session_answer(
+                    session.id, None, f"Question {answer_number}?", "Yes", True
+                )
+        await repo.save_quiz_session_checkpoint(users[0].id, quiz.id, {})
+    await repo.connection.commit()
+    await repo.archive_quiz_sessions(created_before=time.time() + 1, chunk_size=2)
+    await repo.create_quiz_session_answer(session.id, None, "Extra?", "Yes", True)
+
+    reported = []
+    deleted = await repo.delete_user(
+        users[2].id, chunk_size=2, progress=reported.append
+    )
+    assert deleted == UserDeletionModel(users=1, sessions=3, answers=1)
+    assert reported[-1] == deleted
+    assert len(reported) == 3
+
+    deleted = await repo.purge_users(
+        [users[0].id, users[2].id], chunk_size=100, progress=reported.append
+    )
+    assert deleted == UserDeletionModel(users=1, sessions=3, answers=0)
+    assert await repo.get_user(users[0].id) is None
+    assert await repo.list_quiz_session_checkpoints() == []
+    assert len(await repo.list_quiz_sessions_by_user(users[1].id)) == 3
+
+    async with repo.connection.execute(
+        "SELECT COUNT(*) FROM quiz_session_archive"
+    ) as cur:
+        assert (await cur.fetchone())[0] == 3
+
+
+async def test_list_popular_quizzes_uses_index(repo: MemoryRepository):
+    async with repo.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM quiz WHERE LOWER(language) = LOWER(?) "
+        "AND (plays, id) < (?, ?) ORDER BY plays DESC, id DESC LIMIT ?",
+        ("en", 10, 10, 10),
+    ) as cur:
+        plan = " ".join(row["detail"] for row in await cur.fetchall())
+    assert "quiz_language_plays_idx" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_iter_users_by_language(repo: MemoryRepository):
+    ids = [
+        (await repo.create_user(telegram_id, language, "Ann")).id
+        for telegram_id, language in (
+            (1, Locale("uk")),
+            (2, Locale("en", "AU")),
+            (3, Locale("uk")),
+            (4, Locale("uk")),
+            (5, Locale("uk")),
+        )
+    ]
+
+    chunks = [
+        [user.id for user in users]
+        async for users in repo.iter_users_by_language(Locale("uk"), chunk_size=2)
+    ]
+    assert chunks == [[ids[0], ids[2]], [ids[3], ids[4]]]
+
+    chunks = [
+        [user.id for user in users]
+        async for users in repo.iter_users_by_language("UK", after_id=ids[2])
+    ]
+    assert chunks == [[ids[3], ids[4]]]
+    assert [users async for users in repo.iter_users_by_language(Locale("de"))] == []
+
+
+async def test_iter_users_by_language_uses_index(repo: MemoryRepository):
+    async with repo.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM user WHERE LOWER(language) = LOWER(?) "
+        "AND id > ? ORDER BY id LIMIT ?",
+        ("uk", 0, 10),
+    ) as cur:
+        plan = " ".join(row["detail"] for row in await cur.fetchall())
+    assert "user_language_idx" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_quiz_question_links(repo: MemoryRepository):
+    capitals = await repo.create_quiz("Capitals quiz", Locale("en"))
+    asia = await repo.create_quiz("Asia quiz", Locale("en"))
+    japan = await repo.create_quiz_question(capitals.id, "Capital of Japan?")
+    tokyo = await repo.create_quiz_answer(japan.id, "Tokyo", True)
+    france = await repo.create_quiz_question(capitals.id, "Capital of France?")
+    china = await repo.create_bank_question("Capital of China?")
+
+    changed = []
+    repo.add_quiz_listener(changed.append)
+    await repo.add_quiz_questions(asia.id, [china.id, japan.id, china.id])
+    assert changed == [asia.id]
+    assert await repo.list_quiz_question_ids(asia.id) == [china.id, japan.id]
+    await repo.add_quiz_questions(asia.id, [japan.id])
+    assert await repo.list_quiz_question_ids(asia.id) == [china.id, japan.id]
+    assert await repo.list_question_quiz_ids([japan.id, china.id, france.id]) == {
+        japan.id: [capitals.id, asia.id],
+        china.id: [asia.id],
+        france.id: [capitals.id],
+    }
+    assert await repo.find_bank_questions(["Capital of Japan?", "Capital?"]) == [
+        (japan, [tokyo])
+    ]
+
+    # Shared question is found through every quiz
+    assert [quiz.id for quiz in await repo.search_quizzes("japan")] == [
+        capitals.id,
+        asia.id,
+    ]
+    assert [
+        stats.question_id for stats in await repo.list_quiz_question_stats(asia.id)
+    ] == [
+        china.id,
+        japan.id,
+    ]
+
+    await repo.set_quiz_questions(capitals.id, [france.id, japan.id])
+    assert await repo.list_quiz_question_ids(capitals.id) == [france.id, japan.id]
+
+    changed.clear()
+    await repo.delete_quiz_questions([japan.id])
+    assert sorted(changed) == [capitals.id, asia.id]
+    assert await repo.list_quiz_question_ids(asia.id) == [china.id]
+    assert await repo.get_quiz_answer(tokyo.id) is None
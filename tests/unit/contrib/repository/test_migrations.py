@@ -0,0 +1,245 @@
+import aiosqlite
+import pytest
+from babel import Locale
+
+from app.contrib import MemoryRepository
+from app.contrib.repository.migrations import MIGRATIONS, Migration
+
+pytestmark = pytest.mark.asyncio
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def test_migrate_unversioned_database(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    async with aiosqlite.connect(path) as connection:
+        await connection.executescript(
+            """
+            CREATE TABLE "quiz" (
+                "id" INTEGER PRIMARY KEY AUTOINCREMENT,
+                "description" TEXT NOT NULL,
+                "language" TEXT NOT NULL
+            );
+            INSERT INTO "quiz"("description", "language") VALUES ('Capitals', 'en_AU');
+            """
+        )
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    try:
+        assert await repo.get_schema_version() == 0
+        await repo.migrate()
+        assert await repo.get_schema_version() == LATEST_VERSION
+
+        (quiz,) = await repo.search_quizzes("capitals", Locale("en", "AU"))
+        assert quiz.description == "Capitals"
+
+        assert await repo.migrate() is None
+        assert await repo.get_schema_version() == LATEST_VERSION
+    finally:
+        await repo.close()
+
+
+async def test_migrate_failed_migration(tmp_path):
+    class Repository(MemoryRepository):
+        migrations = MIGRATIONS + (
+            Migration(
+                version=LATEST_VERSION + 1,
+                script='CREATE TABLE "broken" ("id" INTEGER); SELECT * FROM "missing";',
+            ),
+        )
+
+    repo = Repository(str(tmp_path / "quiz.db"))
+    await repo.connect()
+    try:
+        with pytest.raises(aiosqlite.OperationalError):
+            await repo.migrate()
+
+        assert await repo.get_schema_version() == LATEST_VERSION
+        async with repo.connection.execute(
+            "SELECT name FROM sqlite_master WHERE name='broken'"
+        ) as cur:
+            assert await cur.fetchone() is None
+    finally:
+        await repo.close()
+
+
+async def test_migrate_online_in_background(tmp_path):
+    class Repository(MemoryRepository):
+        migrations = MIGRATIONS + (
+            Migration(
+                version=LATEST_VERSION + 1,
+                script='CREATE INDEX IF NOT EXISTS "quiz_description_idx" ON "quiz" ("description");',
+                online=True,
+            ),
+        )
+
+    repo = Repository(str(tmp_path / "quiz.db"))
+    await repo.connect()
+    try:
+        async with repo.connection.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+
+        task = await repo.migrate(background=True)
+        assert task is not None
+
+        # Writes wait for the build instead of failing
+        async with repo.transaction():
+            quiz = await repo.create_quiz("Capitals", Locale("en", "AU"))
+        assert await repo.get_quiz(quiz.id) == quiz
+
+        await task
+        assert await repo.get_schema_version() == LATEST_VERSION + 1
+    finally:
+        await repo.close()
+
+
+async def test_migrate_interns_session_texts(tmp_path):
+    class Version3Repository(MemoryRepository):
+        migrations = MIGRATIONS[:3]
+
+    path = str(tmp_path / "quiz.db")
+    repo = Version3Repository(path)
+    await repo.connect()
+    await repo.migrate()
+    await repo.connection.executescript(
+        """
+        INSERT INTO "user"("telegram_id", "first_name", "language") VALUES (42, 'John', 'en');
+        INSERT INTO "quiz"("description", "language") VALUES ('Capitals', 'en');
+        INSERT INTO "quiz_session"("quiz_id", "user_id", "description", "language") VALUES (1, 1, 'Capitals', 'en');
+        INSERT INTO "quiz_session_answer"("session_id", "question", "answer", "right") VALUES
+            (1, 'Capital of Japan?', 'Tokyo', 1),
+            (1, 'Capital of Spain?', 'Tokyo', 0);
+        """
+    )
+    await repo.close()
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    try:
+        await repo.migrate()
+        answers = await repo.list_quiz_session_answers(1)
+        assert [
+            (answer.question, answer.answer, answer.right) for answer in answers
+        ] == [
+            ("Capital of Japan?", "Tokyo", True),
+            ("Capital of Spain?", "Tokyo", False),
+        ]
+
+        async with repo.connection.execute(
+            "SELECT COUNT(*) FROM quiz_session_text"
+        ) as cur:
+            assert (await cur.fetchone())[0] == 3
+    finally:
+        await repo.close()
+
+
+async def test_migrate_backfills_session_scores(tmp_path):
+    class Version4Repository(MemoryRepository):
+        migrations = MIGRATIONS[:4]
+
+    path = str(tmp_path / "quiz.db")
+    repo = Version4Repository(path)
+    await repo.connect()
+    await repo.migrate()
+    user = await repo.create_user(42, Locale("en"), "John")
+    for created_at, description in enumerate(("Capitals", "Rivers", "Cities"), 1):
+        quiz = await repo.create_quiz(description, Locale("en"))
+        session = await repo.connection.execute(
+            "INSERT INTO quiz_session(quiz_id, user_id, description, language, created_at) "
+            "VALUES (?, ?, ?, 'en', ?)",
+            (quiz.id, user.id, description, created_at),
+        )
+        for right in (True, False, created_at == 3):
+            await repo.create_quiz_session_answer(
+                session.lastrowid, None, "Question?", description, right
+            )
+    await repo.connection.commit()
+    # Answers of older sessions are in archive blobs
+    assert await repo.archive_quiz_sessions(created_before=3) == 2
+    await repo.close()
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    try:
+        await repo.migrate()
+        sessions = await repo.list_quiz_sessions_by_user(user.id)
+        assert [
+            (session.id, session.correct, session.total) for session in sessions
+        ] == [
+            (3, 2, 3),
+            (2, 1, 3),
+            (1, 1, 3),
+        ]
+    finally:
+        await repo.close()
+
+
+async def test_migrate_backfills_plays(tmp_path):
+    class Version5Repository(MemoryRepository):
+        migrations = MIGRATIONS[:5]
+
+    path = str(tmp_path / "quiz.db")
+    repo = Version5Repository(path)
+    await repo.connect()
+    await repo.migrate()
+    await repo.connection.executescript(
+        """
+        INSERT INTO "quiz"("description", "language") VALUES ('Capitals', 'en'), ('Rivers', 'en');
+        INSERT INTO "quiz_session"("quiz_id", "user_id", "description", "language") VALUES
+            (2, 1, 'Rivers', 'en'),
+            (2, 2, 'Rivers', 'en');
+        """
+    )
+    await repo.close()
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    try:
+        await repo.migrate()
+        assert [quiz.plays for quiz in await repo.list_quizzes_by_language("en")] == [
+            0,
+            2,
+        ]
+    finally:
+        await repo.close()
+
+
+async def test_migrate_links_questions(tmp_path):
+    class Version9Repository(MemoryRepository):
+        migrations = MIGRATIONS[:9]
+
+    path = str(tmp_path / "quiz.db")
+    repo = Version9Repository(path)
+    await repo.connect()
+    await repo.migrate()
+    await repo.connection.executescript(
+        """
+        INSERT INTO "quiz"("description", "language") VALUES ('Capitals', 'en'), ('Rivers', 'en');
+        INSERT INTO "quiz_question"("quiz_id", "question") VALUES
+            (2, 'Longest river?'),
+            (1, 'Capital of Japan?'),
+            (2, 'Deepest river?');
+        """
+    )
+    await repo.close()
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    try:
+        await repo.migrate()
+        assert await repo.list_quiz_question_ids(1) == [2]
+        assert await repo.list_quiz_question_ids(2) == [1, 3]
+        assert [quiz.id for quiz in await repo.search_quizzes("river")] == [2]
+
+        # Search index follows questions after table is rebuilt
+        await repo.create_quiz_question(1, "Capital of Peru?")
+        assert [quiz.id for quiz in await repo.search_quizzes("peru")] == [1]
+    finally:
+        await repo.close()
+
+
+async def test_migrate_inside_transaction(repo: MemoryRepository):
+    with pytest.raises(RuntimeError):
+        async with repo.transaction():
+            await repo.migrate()
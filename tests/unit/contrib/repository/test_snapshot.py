@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import pytest
+from babel import Locale
+
+from app.contrib import CatalogSnapshot, MemoryRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_catalog_snapshot(repo: MemoryRepository, tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    capitals = await repo.create_quiz("Capitals quiz", Locale("en", "AU"))
+    rivers = await repo.create_quiz("Річки", Locale("uk"))
+    cities = await repo.create_quiz("Cities quiz", Locale("en", "AU"))
+    japan = await repo.create_quiz_question(capitals.id, "Capital of Japan?")
+    nile = await repo.create_quiz_question(rivers.id, "Найдовша річка?")
+    france = await repo.create_quiz_question(capitals.id, "Capital of France?")
+    tokyo = await repo.create_quiz_answer(japan.id, "Tokyo", True)
+    kyoto = await repo.create_quiz_answer(japan.id, "Kyoto", False)
+    paris = await repo.create_quiz_answer(france.id, "Paris", True)
+
+    generation = await repo.export_catalog_snapshot(path)
+    snapshot = CatalogSnapshot(path)
+    try:
+        assert snapshot.generation == generation
+        assert snapshot.get_quiz(rivers.id) == rivers
+        assert snapshot.get_quiz(100) is None
+        assert snapshot.list_quiz_questions(capitals.id) == [japan, france]
+        assert snapshot.list_quiz_questions(cities.id) == []
+        assert snapshot.get_quiz_question(nile.id) == nile
+        assert snapshot.get_quiz_answer(paris.id) == paris
+        assert snapshot.list_quiz_answers(japan.id) == [tokyo, kyoto]
+        assert snapshot.list_quiz_answers(nile.id) == []
+
+        assert snapshot.count_quizzes_by_language(Locale("en", "AU")) == 2
+        assert snapshot.list_quizzes_by_language("EN_au") == [capitals, cities]
+        assert snapshot.list_quizzes_by_language(Locale("en", "AU"), 1, 1) == [cities]
+        assert snapshot.list_quizzes_by_language(Locale("de")) == []
+        assert snapshot.refresh() is False
+
+        # Mapped snapshot stays valid while new one replaces the file
+        questions = snapshot.list_quiz_questions(capitals.id)
+        moon = await repo.create_quiz("Moon quiz", Locale("en", "AU"))
+        assert await repo.export_catalog_snapshot(path) != generation
+        assert snapshot.get_quiz(moon.id) is None
+
+        assert snapshot.refresh() is True
+        assert snapshot.get_quiz(moon.id) == moon
+        assert snapshot.list_quiz_questions(capitals.id) == questions
+        assert snapshot.count_quizzes_by_language(Locale("en", "AU")) == 3
+    finally:
+        snapshot.close()
+
+
+async def test_catalog_snapshot_invalid(tmp_path):
+    path = tmp_path / "catalog.snapshot"
+    path.write_bytes(b"not a snapshot" * 4)
+    with pytest.raises(ValueError):
+        CatalogSnapshot(str(path))
+
+
+async def test_catalog_snapshot_shared_questions(repo: MemoryRepository, tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    asia = await repo.create_quiz("Asia quiz", Locale("en"))
+    world = await repo.create_quiz("World quiz", Locale("en"))
+    japan = await repo.create_bank_question("Capital of Japan?")
+    tokyo = await repo.create_quiz_answer(japan.id, "Tokyo", True)
+    peru = await repo.create_quiz_question(world.id, "Capital of Peru?")
+    unused = await repo.create_bank_question("Capital of Chad?")
+    await repo.add_quiz_questions(asia.id, [japan.id])
+    await repo.add_quiz_questions(world.id, [japan.id])
+
+    await repo.export_catalog_snapshot(path)
+    snapshot = CatalogSnapshot(path)
+    try:
+        assert snapshot.list_quiz_questions(asia.id) == [japan]
+        assert snapshot.list_quiz_questions(world.id) == [peru, japan]
+        assert snapshot.get_quiz_question(japan.id) == japan
+        assert snapshot.list_quiz_answers(japan.id) == [tokyo]
+        assert snapshot.get_quiz_question(unused.id) is None
+
+        # Questions follow order of quiz after reordering
+        await repo.set_quiz_questions(world.id, [japan.id, peru.id])
+        await asyncio.gather(
+            repo.export_catalog_snapshot(path), repo.export_catalog_snapshot(path)
+        )
+        assert os.listdir(tmp_path) == ["catalog.snapshot"]
+        assert snapshot.refresh() is True
+        assert snapshot.list_quiz_questions(world.id) == [japan, peru]
+    finally:
+        snapshot.close()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.contrib import ContentWatcher, MemoryRepository
+from app.core import ContentSyncResult, QuizService
+
+pytestmark = pytest.mark.asyncio
+
+
+def write_definition(path, description, questions=()):
+    path.write_text(
+        json.dumps(
+            {
+                "description": description,
+                "language": "en_AU",
+                "questions": [
+                    {"question": question, "answers": [{"value": "Yes", "right": True}]}
+                    for question in questions
+                ],
+            }
+        )
+    )
+
+
+async def test_content_watcher(repo: MemoryRepository, tmp_path):
+    write_definition(tmp_path / "capitals.json", "Capitals quiz", ["Tokyo?"])
+    write_definition(tmp_path / "rivers.json", "Rivers quiz")
+    (tmp_path / "notes.txt").write_text("not a definition")
+    (tmp_path / "broken.json").write_text("{")
+    watcher = ContentWatcher(QuizService(repo), str(tmp_path))
+
+    result = await watcher.scan()
+    assert len(result.created) == 2
+    assert list(watcher.errors) == [str(tmp_path / "broken.json")]
+    assert await watcher.scan() is None
+
+    # Touched file is read again, but its quiz isn't changed
+    os.utime(tmp_path / "rivers.json", ns=(1, 1))
+    assert await watcher.scan() == ContentSyncResult(
+        created=[], updated=[], unchanged=1
+    )
+
+    write_definition(tmp_path / "capitals.json", "Capitals quiz", ["Tokyo?", "Rome?"])
+    write_definition(tmp_path / "broken.json", "Fixed quiz")
+    result = await watcher.scan()
+    assert len(result.created) == 1 and len(result.updated) == 1
+    assert watcher.errors == {}
+    questions = await repo.list_quiz_question_ids(result.updated[0])
+    assert len(questions) == 2
+
+
+async def test_content_watcher_task(repo: MemoryRepository, tmp_path):
+    write_definition(tmp_path / "capitals.json", "Capitals quiz")
+    watcher = ContentWatcher(QuizService(repo), str(tmp_path), poll_interval=0)
+    watcher.start()
+    try:
+        for _ in range(100):
+            if await repo.list_quiz_contents():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await watcher.stop()
+    assert [content.key for content in await repo.list_quiz_contents()] == ["capitals"]
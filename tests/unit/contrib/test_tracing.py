@@ -0,0 +1,47 @@
+import json
+
+import pytest
+from babel import Locale
+
+from app.contrib import JsonLinesSink, MemoryRepository
+from app.core import QuizService, UserService, tracing
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_json_lines_sink(repo: MemoryRepository, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    samples = iter([0.5, 0.0])
+    sink = JsonLinesSink(str(path), sample_rate=0.1, random=lambda: next(samples))
+    tracing.set_sink(sink)
+    try:
+        user = await UserService(repo).resolve_user(42, Locale("en", "AU"), "John")
+        await QuizService(repo).list_quizzes(Locale("en", "AU"))
+    finally:
+        tracing.set_sink(None)
+        sink.close()
+
+    # First trace is sampled out
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert spans[0]["name"] == "QuizService.list_quizzes"
+    assert {span["trace_id"] for span in spans} == {spans[0]["trace_id"]}
+    assert "transaction" in [span["name"] for span in spans]
+
+    statements = [span for span in spans if span["name"] == "sqlite"]
+    assert [span["attributes"]["sql"].split()[0] for span in statements] == [
+        "SELECT",
+        "SELECT",
+    ]
+    assert statements[0]["attributes"]["rows"] == 0
+    assert statements[1]["attributes"]["rows"] == 1
+    assert all(span["attributes"]["thread_wait"] >= 0 for span in statements)
+    assert user.id == 1
+
+
+async def test_json_lines_sink_slow_threshold(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    sink = JsonLinesSink(str(path), sample_rate=0, slow_threshold=0)
+    sink.export([tracing.Span("request", "ab", 1, None, 0, duration=0.5)])
+    sink.close()
+
+    assert json.loads(path.read_text())["duration"] == 0.5
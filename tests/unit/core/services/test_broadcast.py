@@ -0,0 +1,108 @@
+import asyncio
+from typing import List
+
+import pytest
+from babel import Locale
+
+from app.core import (
+    BroadcastProgress,
+    BroadcastService,
+    MessageSender,
+    RateLimiter,
+    Repository,
+    User,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeSender(MessageSender):
+    def __init__(self, blocked=(), stop_after=None):
+        self.sent: List[int] = []
+        self.blocked = set(blocked)
+        self.stop_after = stop_after
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, user: User, text: str):
+        if self.stop_after is not None and len(self.sent) >= self.stop_after:
+            raise asyncio.CancelledError()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0)
+            if user.telegram_id in self.blocked:
+                raise RuntimeError("Forbidden: bot was blocked by the user")
+            self.sent.append(user.telegram_id)
+        finally:
+            self.in_flight -= 1
+
+
+async def create_users(repo: Repository, count: int):
+    for telegram_id in range(1, count + 1):
+        language = Locale("uk") if telegram_id % 4 else Locale("en", "AU")
+        await repo.create_user(telegram_id, language, "Ann")
+
+
+async def test_broadcast(repo: Repository):
+    await create_users(repo, 40)
+    sender = FakeSender(blocked={3})
+    checkpoints = []
+
+    async def checkpoint(progress: BroadcastProgress):
+        checkpoints.append(progress)
+
+    service = BroadcastService(repo, sender, rate=10_000, concurrency=4, chunk_size=7)
+    progress = await service.broadcast(
+        Locale("uk"), "New quiz!", checkpoint=checkpoint, checkpoint_every=10
+    )
+
+    expected = [id for id in range(1, 41) if id % 4 and id != 3]
+    assert sorted(sender.sent) == expected
+    assert sender.max_in_flight <= 4
+    assert progress == BroadcastProgress(Locale("uk"), 39, sent=29, failed=1)
+    assert [checkpoint.after_id for checkpoint in checkpoints] == [13, 26, 39, 39]
+    assert checkpoints[-1] == progress
+
+
+async def test_broadcast_resume(repo: Repository):
+    await create_users(repo, 40)
+    checkpoints = []
+
+    async def checkpoint(progress: BroadcastProgress):
+        checkpoints.append(progress)
+
+    interrupted = FakeSender(stop_after=12)
+    service = BroadcastService(repo, interrupted, rate=10_000, concurrency=3)
+    with pytest.raises(asyncio.CancelledError):
+        await service.broadcast(
+            Locale("uk"), "New quiz!", checkpoint=checkpoint, checkpoint_every=5
+        )
+    assert checkpoints[-1] == BroadcastProgress(Locale("uk"), 13, sent=10, failed=0)
+
+    sender = FakeSender()
+    service = BroadcastService(repo, sender, rate=10_000, concurrency=3)
+    progress = await service.broadcast(
+        Locale("uk"), "New quiz!", progress=checkpoints[-1]
+    )
+
+    # Users after checkpoint get the message, in flight ones possibly twice
+    everyone = {id for id in range(1, 41) if id % 4}
+    assert set(interrupted.sent) | set(sender.sent) == everyone
+    assert min(sender.sent) == 14
+    assert progress == BroadcastProgress(Locale("uk"), 39, sent=30, failed=0)
+
+
+async def test_broadcast_rate_limit(repo: Repository):
+    await create_users(repo, 8)
+    delays = []
+
+    async def sleep(delay: float):
+        delays.append(delay)
+
+    limiter = RateLimiter(2, clock=lambda: 0.0, sleep=sleep)
+    service = BroadcastService(repo, FakeSender(), limiter=limiter)
+    progress = await service.broadcast(Locale("uk"), "New quiz!")
+
+    assert progress.sent == 6
+    assert delays == pytest.approx([0.5, 1.0, 1.5, 2.0, 2.5])
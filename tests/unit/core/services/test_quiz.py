@@ -1,7 +1,24 @@
+import asyncio
+from dataclasses import replace
+
 import pytest
 from babel import Locale
 
-from app.core import Quiz, QuizService, Repository
+from app.core import (
+    AnswerDefinition,
+    ContentSyncResult,
+    QuestionDefinition,
+    Quiz,
+    QuizDefinition,
+    QuizDefinitionError,
+    QuizNotFoundError,
+    QuizQuestionNotFoundError,
+    QuizService,
+    QuizSessionNotFoundError,
+    Repository,
+    SessionStore,
+    parse_quiz_definition,
+)
 
 pytestmark = pytest.mark.asyncio
 
@@ -108,3 +125,575 @@ async def test_submit_answers(repo: Repository):
     assert session.answers[1].question == question2.question
     assert session.answers[1].answer == answer2.value
     assert session.answers[1].right == answer2.right
+    assert (session.correct, session.total) == (1, 2)
+
+
+async def test_session_scores(repo: Repository):
+    service = QuizService(repo)
+
+    user = await repo.create_user(**TEST_USER)
+    quiz1 = await repo.create_quiz(**TEST_QUIZ)
+    question = await repo.create_quiz_question(quiz1.id, "Capital of Japan?")
+    tokyo = await repo.create_quiz_answer(question.id, "Tokyo", True)
+    quiz2 = await repo.create_quiz("Rivers quiz", Locale("en", "AU"))
+
+    with pytest.raises(QuizSessionNotFoundError):
+        await service.get_session_score(user.id, quiz1.id)
+
+    _, session1 = await service.submit_answers(user.id, quiz1.id, [tokyo.id])
+    _, session2 = await service.submit_text_answers(user.id, quiz2.id, [])
+    _, retried = await service.submit_answers(user.id, quiz1.id, [])
+
+    assert (retried.correct, retried.total) == (1, 1)
+    score = await service.get_session_score(user.id, quiz1.id)
+    assert (score.id, score.quiz_id, score.description) == (
+        session1.id,
+        quiz1.id,
+        quiz1.description,
+    )
+    assert (score.correct, score.total) == (1, 1)
+
+    scores = await service.list_session_scores(user.id)
+    assert [(score.id, score.correct, score.total) for score in scores] == [
+        (session2.id, 0, 0),
+        (session1.id, 1, 1),
+    ]
+    assert await service.list_session_scores(user.id, offset=1, limit=1) == scores[1:]
+
+
+async def test_incremental_session(repo: Repository):
+    service = QuizService(repo)
+
+    user = await repo.create_user(**TEST_USER)
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+
+    question1 = await repo.create_quiz_question(
+        quiz.id, "Which city is the capital of Great Britain?"
+    )
+    answer1 = await repo.create_quiz_answer(question1.id, "London", True)
+    answer2 = await repo.create_quiz_answer(question1.id, "Paris", False)
+    question2 = await repo.create_quiz_question(
+        quiz.id, "Which city is the capital of Japan?"
+    )
+    answer3 = await repo.create_quiz_answer(question2.id, "Tokyo", True)
+
+    with pytest.raises(QuizSessionNotFoundError):
+        await service.answer_question(user.id, quiz.id, answer1.id)
+
+    await service.start_session(user.id, quiz.id)
+    await service.answer_question(user.id, quiz.id, answer2.id)
+    await service.answer_question(user.id, quiz.id, answer1.id)
+    pending = await service.answer_question(user.id, quiz.id, answer3.id)
+    assert pending.answers == {question1.id: answer1.id, question2.id: answer3.id}
+
+    _, session = await service.finish_session(user.id, quiz.id)
+    assert [answer.answer for answer in session.answers] == ["London", "Tokyo"]
+    assert all(answer.right for answer in session.answers)
+
+    with pytest.raises(QuizSessionNotFoundError):
+        await service.finish_session(user.id, quiz.id)
+
+
+async def test_restore_sessions(repo: Repository):
+    user = await repo.create_user(**TEST_USER)
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    question = await repo.create_quiz_question(
+        quiz.id, "Which city is the capital of Great Britain?"
+    )
+    answer = await repo.create_quiz_answer(question.id, "London", True)
+
+    service = QuizService(repo)
+    await service.start_session(user.id, quiz.id)
+    await service.answer_question(user.id, quiz.id, answer.id)
+    assert await service.checkpoint_sessions() == 1
+    assert await service.checkpoint_sessions() == 0
+
+    restarted = QuizService(repo)
+    assert await restarted.restore_sessions() == 1
+    _, session = await restarted.finish_session(user.id, quiz.id)
+    assert session.answers[0].answer == "London"
+
+    assert await repo.list_quiz_session_checkpoints() == []
+
+
+async def test_checkpoint_evicted_sessions(repo: Repository):
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    users = [
+        await repo.create_user(telegram_id, Locale("en", "AU"), "John")
+        for telegram_id in (1, 2)
+    ]
+
+    service = QuizService(repo, sessions=SessionStore(maxsize=1))
+    await service.start_session(users[0].id, quiz.id)
+    assert await service.checkpoint_sessions() == 1
+
+    # Session dropped by store isn't restored after restart
+    await service.start_session(users[1].id, quiz.id)
+    assert await service.checkpoint_sessions() == 1
+    assert [
+        checkpoint.user_id for checkpoint in await repo.list_quiz_session_checkpoints()
+    ] == [users[1].id]
+
+
+async def test_submit_answers_twice(repo: Repository):
+    service = QuizService(repo)
+
+    user = await repo.create_user(**TEST_USER)
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    question = await repo.create_quiz_question(
+        quiz.id, "Which city is the capital of Great Britain?"
+    )
+    answer1 = await repo.create_quiz_answer(question.id, "London", True)
+    answer2 = await repo.create_quiz_answer(question.id, "Paris", False)
+
+    _, session = await service.submit_answers(user.id, quiz.id, [answer1.id])
+    _, retried = await service.submit_answers(user.id, quiz.id, [answer2.id])
+
+    assert retried.id == session.id
+    assert retried.answers == session.answers
+    assert retried.quiz.id == quiz.id
+
+
+async def test_submit_answers_concurrently(repo: Repository, monkeypatch):
+    service = QuizService(repo)
+
+    user = await repo.create_user(**TEST_USER)
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    question = await repo.create_quiz_question(
+        quiz.id, "Which city is the capital of Great Britain?"
+    )
+    answer = await repo.create_quiz_answer(question.id, "London", True)
+
+    (_, first), (_, second) = await asyncio.gather(
+        service.submit_answers(user.id, quiz.id, [answer.id]),
+        service.submit_answers(user.id, quiz.id, [answer.id]),
+    )
+    assert first.id == second.id
+
+    # Lookup of the other submitter ran before the first one was stored
+    other_quiz = await repo.create_quiz("Rivers quiz", Locale("en", "AU"))
+    _, stored = await service.submit_answers(user.id, other_quiz.id, [])
+
+    lookup = repo.get_quiz_session_by_user
+    stale = [None]
+
+    async def get_quiz_session_by_user(user_id, quiz_id):
+        if stale:
+            return stale.pop()
+        return await lookup(user_id=user_id, quiz_id=quiz_id)
+
+    monkeypatch.setattr(repo, "get_quiz_session_by_user", get_quiz_session_by_user)
+    _, retried = await service.submit_answers(user.id, other_quiz.id, [answer.id])
+
+    assert not stale
+    assert retried.id == stored.id
+    assert retried.answers == []
+
+
+async def test_submit_text_answers(repo: Repository):
+    service = QuizService(repo)
+
+    user = await repo.create_user(**TEST_USER)
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    capital = await repo.create_quiz_question(quiz.id, "Capital of Great Britain?")
+    london = await repo.create_quiz_answer(capital.id, "London", True)
+    await repo.create_quiz_answer(capital.id, "Paris", False)
+    river = await repo.create_quiz_question(quiz.id, "Longest river?")
+    await repo.create_quiz_answer(river.id, "Nile", True)
+    city = await repo.create_quiz_question(quiz.id, "Largest city?")
+    await repo.create_quiz_answer(city.id, "Tokyo", True)
+
+    other_quiz = await repo.create_quiz("Rivers quiz", Locale("en", "AU"))
+    other = await repo.create_quiz_question(other_quiz.id, "Longest river?")
+    with pytest.raises(QuizQuestionNotFoundError):
+        await service.submit_text_answers(user.id, quiz.id, [(other.id, "Nile")])
+
+    _, session = await service.submit_text_answers(
+        user.id,
+        quiz.id,
+        [(capital.id, "  LONDON "), (river.id, "Amazon"), (city.id, "ＴＯＫＹＯ")],
+    )
+    assert [(answer.answer, answer.right) for answer in session.answers] == [
+        ("London", True),
+        ("Amazon", False),
+        ("Tokyo", True),
+    ]
+
+    stats = {
+        question.id: question for question in await service.get_question_stats(quiz.id)
+    }
+    assert (stats[capital.id].answered, stats[capital.id].right) == (1, 1)
+    assert stats[river.id].answered == 0
+    assert [
+        answer.chosen for answer in stats[capital.id].answers if answer.id == london.id
+    ] == [1]
+
+
+async def test_sample_questions(repo: Repository):
+    service = QuizService(repo)
+
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    for i in range(10):
+        question = await repo.create_quiz_question(quiz.id, f"Question {i}")
+        await repo.create_quiz_answer(question.id, "Right", True)
+        await repo.create_quiz_answer(question.id, "Wrong", False)
+
+    questions = await service.sample_questions(quiz.id, 3, seed=1)
+    assert len({question.id for question in questions}) == 3
+    assert all(len(question.answers) == 2 for question in questions)
+    assert questions == await service.sample_questions(quiz.id, 3, seed=1)
+
+    assert len(await service.sample_questions(quiz.id, 20)) == 10
+    assert await service.sample_questions(quiz.id, -1) == []
+    assert await service.sample_questions(quiz.id, 3, seed="user-42") == (
+        await service.sample_questions(quiz.id, 3, seed="user-42")
+    )
+
+    await repo.create_quiz_question(quiz.id, "Question 10")
+    assert len(await service.sample_questions(quiz.id, 20)) == 11
+
+    with pytest.raises(QuizNotFoundError):
+        await service.sample_questions(quiz.id + 1, 3)
+
+
+async def test_search_quizzes(repo: Repository):
+    service = QuizService(repo)
+
+    capitals = await repo.create_quiz("European capitals", Locale("en", "AU"))
+    await repo.create_quiz_question(capitals.id, "Which city is the capital of Spain?")
+    rivers = await repo.create_quiz("Rivers of the world", Locale("en", "AU"))
+    await repo.create_quiz_question(rivers.id, "Which river flows through the capital?")
+    await repo.create_quiz("Capitals of Asia", Locale("en", "GB"))
+
+    found = await service.search_quizzes("capital", Locale("en", "AU"))
+    assert [quiz.id for quiz in found] == [capitals.id, rivers.id]
+
+    found = await service.search_quizzes("capital", Locale("en", "AU"), 1, 1)
+    assert [quiz.id for quiz in found] == [rivers.id]
+
+    assert len(await service.search_quizzes("capit")) == 3
+    assert await service.search_quizzes('spain"(') == [
+        Quiz(
+            id=capitals.id,
+            description=capitals.description,
+            language=capitals.language,
+            questions=None,
+        )
+    ]
+    assert await service.search_quizzes("???") == []
+
+
+async def test_list_quizzes_with_fallback(repo: Repository):
+    service = QuizService(repo, default_language=Locale("en", "GB"))
+
+    quiz_au = await repo.create_quiz("Quiz1", Locale("en", "AU"))
+    quiz_gb = await repo.create_quiz("Quiz2", Locale("en", "GB"))
+    quiz_en = await repo.create_quiz("Quiz3", Locale("en"))
+    await repo.create_quiz("Quiz4", Locale("de"))
+
+    count, quizzes = await service.list_quizzes(Locale("en", "AU"), fallback=True)
+    assert count == 3
+    assert [quiz.id for quiz in quizzes] == [quiz_au.id, quiz_en.id, quiz_gb.id]
+
+    count, quizzes = await service.list_quizzes(Locale("en", "US"), 1, 5, fallback=True)
+    assert count == 2
+    assert [quiz.id for quiz in quizzes] == [quiz_gb.id]
+
+    count, quizzes = await service.list_quizzes(Locale("en", "US"), 5, 5, fallback=True)
+    assert count == 2
+    assert quizzes == []
+
+    count, quizzes = await service.list_quizzes(Locale("de", "AT"), fallback=True)
+    assert count == 2
+
+    count, quizzes = await service.list_quizzes(fallback=True)
+    assert count == 1
+    assert [quiz.id for quiz in quizzes] == [quiz_gb.id]
+
+    assert await QuizService(repo).list_quizzes(fallback=True) == (0, [])
+
+
+async def test_question_stats(repo: Repository):
+    service = QuizService(repo)
+
+    quiz = await repo.create_quiz(**TEST_QUIZ)
+    easy = await repo.create_quiz_question(quiz.id, "Easy question")
+    easy_right = await repo.create_quiz_answer(easy.id, "Right", True)
+    hard = await repo.create_quiz_question(quiz.id, "Hard question")
+    hard_right = await repo.create_quiz_answer(hard.id, "Right", True)
+    hard_wrong = await repo.create_quiz_answer(hard.id, "Wrong", False)
+
+    for telegram_id, answers in [
+        (1, [easy_right.id, hard_wrong.id]),
+        (2, [easy_right.id, hard_wrong.id]),
+        (3, [easy_right.id, hard_right.id]),
+    ]:
+        user = await repo.create_user(**{**TEST_USER, "telegram_id": telegram_id})
+        await service.submit_answers(user.id, quiz.id, answers)
+
+    stats = await service.get_question_stats(quiz.id)
+    assert [question.id for question in stats] == [hard.id, easy.id]
+    assert (stats[0].answered, stats[0].right) == (3, 1)
+    assert [answer.chosen for answer in stats[0].answers] == [1, 2]
+    assert (stats[1].answered, stats[1].right) == (3, 3)
+
+    await repo.replace_quiz_answer_stats(questions=[], answers=[])
+    assert await service.recompute_question_stats(chunk_size=4) == 6
+    assert await service.get_question_stats(quiz.id) == stats
+
+
+async def test_warm_up(repo: Repository):
+    service = QuizService(repo)
+    assert await service.warm_up() == 0
+
+    for language in (Locale("en", "AU"), Locale("uk"), Locale("en", "AU")):
+        quiz = await repo.create_quiz("Capitals quiz", language)
+        question = await repo.create_quiz_question(quiz.id, "Capital of Japan?")
+        await repo.create_quiz_answer(question.id, "Tokyo", True)
+
+    # Most played quizzes are hot
+    user = await repo.create_user(**TEST_USER)
+    await repo.create_quiz_session(user.id, quiz.id, quiz.description, quiz.language)
+    assert await service.warm_up(limit=1) == 2
+    assert quiz.id in service._question_ids
+    assert await service.warm_up() == 3
+    assert len(service._question_ids) == 3
+
+
+async def test_list_popular_quizzes(repo: Repository):
+    service = QuizService(repo, default_language=Locale("en"))
+    users = [await repo.create_user(i, Locale("en"), "John") for i in range(3)]
+
+    quizzes = {}
+    for description, language, plays in [
+        ("Capitals", Locale("en", "AU"), 1),
+        ("Rivers", Locale("en", "AU"), 3),
+        ("Cities", Locale("en", "AU"), 1),
+        ("Mountains", Locale("en"), 2),
+        ("Lakes", Locale("en"), 0),
+    ]:
+        quiz = await repo.create_quiz(description, language)
+        for user in users[:plays]:
+            await repo.create_quiz_session(user.id, quiz.id, description, language)
+        quizzes[description] = quiz
+
+    count, page = await service.list_quizzes(
+        Locale("en", "AU"), limit=2, sort=QuizService.SORT_POPULAR
+    )
+    assert count == 3
+    assert [(quiz.description, quiz.plays) for quiz in page] == [
+        ("Rivers", 3),
+        ("Cities", 1),
+    ]
+
+    _, page = await service.list_quizzes(
+        Locale("en", "AU"), sort=QuizService.SORT_POPULAR, after=page[-1]
+    )
+    assert [quiz.description for quiz in page] == ["Capitals"]
+
+    descriptions = []
+    after = None
+    while True:
+        count, page = await service.list_quizzes(
+            Locale("en", "AU"),
+            limit=2,
+            fallback=True,
+            sort=QuizService.SORT_POPULAR,
+            after=after,
+        )
+        if not page:
+            break
+        descriptions.extend(quiz.description for quiz in page)
+        after = page[-1]
+    assert count == 5
+    assert descriptions == ["Rivers", "Cities", "Capitals", "Mountains", "Lakes"]
+
+    with pytest.raises(ValueError):
+        await service.list_quizzes(Locale("en"), 1, sort=QuizService.SORT_POPULAR)
+    with pytest.raises(ValueError):
+        await service.list_quizzes(
+            Locale("en"), after=Quiz(1, "Lakes", Locale("en"), None)
+        )
+    with pytest.raises(ValueError):
+        await service.list_quizzes(Locale("en"), sort="rating")
+
+
+async def get_content(repo: Repository, quiz_id: int):
+    question_ids = await repo.list_quiz_question_ids(quiz_id)
+    return sorted(
+        await repo.list_quiz_questions_with_answers(question_ids),
+        key=lambda content: content[0].id,
+    )
+
+
+async def test_sync_content(repo: Repository):
+    service = QuizService(repo)
+    changed = []
+    repo.add_quiz_listener(changed.append)
+
+    capitals = parse_quiz_definition(
+        "capitals",
+        {
+            "description": "Capitals quiz",
+            "language": "en_AU",
+            "questions": [
+                {
+                    "question": "Capital of Japan?",
+                    "answers": [
+                        {"value": "Tokyo", "right": True},
+                        {"value": "Kyoto", "right": False},
+                    ],
+                },
+                {
+                    "question": "Capital of France?",
+                    "answers": [{"value": "Paris", "right": True}],
+                },
+            ],
+        },
+    )
+    rivers = parse_quiz_definition(
+        "rivers", {"description": "Rivers", "language": "uk", "questions": []}
+    )
+
+    result = await service.sync_content([capitals, rivers])
+    assert result.updated == [] and result.unchanged == 0
+    capitals_id, rivers_id = result.created
+    assert (await repo.get_quiz(capitals_id)).language == Locale("en", "AU")
+    (japan, (tokyo, kyoto)), (france, (paris,)) = await get_content(repo, capitals_id)
+
+    changed.clear()
+    result = await service.sync_content([capitals, rivers])
+    assert result == ContentSyncResult(created=[], updated=[], unchanged=2)
+    assert changed == []
+
+    capitals = replace(
+        capitals,
+        questions=(
+            QuestionDefinition(
+                "Capital of Japan?",
+                (
+                    AnswerDefinition("Tokyo", False),
+                    AnswerDefinition("Osaka", False),
+                    AnswerDefinition("Kyoto", True),
+                ),
+            ),
+            QuestionDefinition("Capital of Italy?", (AnswerDefinition("Rome", True),)),
+        ),
+    )
+    result = await service.sync_content([capitals, rivers])
+    assert result == ContentSyncResult(created=[], updated=[capitals_id], unchanged=1)
+    assert rivers_id not in changed and capitals_id in changed
+
+    # Unchanged rows keep their ids
+    (japan_updated, answers), (italy, _) = await get_content(repo, capitals_id)
+    assert japan_updated == japan
+    assert [(answer.id, answer.value, answer.right) for answer in answers] == [
+        (tokyo.id, "Tokyo", False),
+        (kyoto.id, "Kyoto", True),
+        (answers[2].id, "Osaka", False),
+    ]
+    assert italy.question == "Capital of Italy?"
+    # Question left out stays in question bank
+    assert await repo.list_question_quiz_ids([france.id]) == {}
+    assert await repo.get_quiz_answer(paris.id) == paris
+
+
+async def test_sync_content_shares_questions(repo: Repository):
+    service = QuizService(repo)
+    japan = QuestionDefinition(
+        "Capital of Japan?",
+        (AnswerDefinition("Tokyo", True), AnswerDefinition("Kyoto", False)),
+    )
+    asia = QuizDefinition("asia", "Asia quiz", Locale("en"), (japan,))
+    world = QuizDefinition("world", "World quiz", Locale("en"), (japan,))
+
+    asia_id, world_id = (await service.sync_content([asia, world])).created
+    ((question, answers),) = await get_content(repo, asia_id)
+    # Equal question is stored once
+    assert await get_content(repo, world_id) == [(question, answers)]
+    assert await repo.list_question_quiz_ids([question.id]) == {
+        question.id: [asia_id, world_id]
+    }
+    cached = await service.sample_questions(asia_id, 1)
+    assert await service.sample_questions(world_id, 1) == cached
+
+    # Shared question is copied on write, other quiz keeps it
+    fixed = replace(
+        japan, answers=(AnswerDefinition("Tokyo", True), AnswerDefinition("Edo", False))
+    )
+    await service.sync_content([replace(world, questions=(fixed,))])
+    assert await get_content(repo, asia_id) == [(question, answers)]
+    ((copy, copy_answers),) = await get_content(repo, world_id)
+    assert copy.id != question.id
+    assert [answer.value for answer in copy_answers] == ["Tokyo", "Edo"]
+    assert await service.sample_questions(asia_id, 1) == cached
+
+    # Question used by one quiz only is changed in place
+    await service.sync_content(
+        [replace(world, questions=(replace(fixed, answers=fixed.answers[:1]),))]
+    )
+    ((same, same_answers),) = await get_content(repo, world_id)
+    assert same == copy and same_answers == copy_answers[:1]
+    (sampled,) = await service.sample_questions(world_id, 1)
+    assert [answer.value for answer in sampled.answers] == ["Tokyo"]
+
+
+async def test_sync_content_duplicate_key(repo: Repository):
+    service = QuizService(repo)
+    rivers = parse_quiz_definition(
+        "rivers", {"description": "Rivers", "language": "uk", "questions": []}
+    )
+
+    with pytest.raises(QuizDefinitionError):
+        await service.sync_content([rivers, replace(rivers, description="Річки")])
+    assert await repo.list_quiz_contents() == []
+    assert await repo.count_quizzes_by_language(Locale("uk")) == 0
+
+
+async def test_question_bank(repo: Repository):
+    service = QuizService(repo)
+    japan = await service.create_bank_question(
+        "Capital of Japan?", [("Tokyo", True), ("Kyoto", False)]
+    )
+    peru = await service.create_bank_question("Capital of Peru?", [("Lima", True)])
+
+    asia = await service.create_quiz_from_bank("Asia", Locale("en"), [japan.id])
+    world = await service.create_quiz_from_bank(
+        "World", Locale("en"), [peru.id, japan.id]
+    )
+    assert asia.questions == [japan]
+    assert world.questions == [peru, japan]
+    assert await service.sample_questions(world.id, 2, seed=1) in (
+        [peru, japan],
+        [japan, peru],
+    )
+
+    # Answer keys are shared, a change is seen by every quiz
+    await repo.update_quiz_answer(japan.answers[1].id, True)
+    (question,) = await service.sample_questions(asia.id, 1)
+    assert [answer.right for answer in question.answers] == [True, True]
+
+    assert await service.add_bank_questions(asia.id, [peru.id, japan.id]) == [
+        question,
+        peru,
+    ]
+    with pytest.raises(QuizQuestionNotFoundError):
+        await service.add_bank_questions(asia.id, [100])
+    with pytest.raises(QuizNotFoundError):
+        await service.add_bank_questions(100, [peru.id])
+
+    # Quiz isn't created when any of its questions is missing
+    quizzes = list(await repo.list_quizzes_by_language(Locale("en")))
+    with pytest.raises(QuizQuestionNotFoundError):
+        await service.create_quiz_from_bank("Broken", Locale("en"), [peru.id, 100])
+    assert list(await repo.list_quizzes_by_language(Locale("en"))) == quizzes
+
+    # Text answers are accepted for questions of the quiz only
+    user = await repo.create_user(**TEST_USER)
+    europe = await service.create_quiz_from_bank("Europe", Locale("en"), [])
+    with pytest.raises(QuizQuestionNotFoundError):
+        await service.submit_text_answers(user.id, europe.id, [(peru.id, "Lima")])
+    _, session = await service.submit_text_answers(
+        user.id, world.id, [(peru.id, "lima")]
+    )
+    assert session.correct == 1
@@ -1,7 +1,7 @@
 import pytest
 from babel import Locale
 
-from app.core import Repository, User, UserService
+from app.core import Repository, User, UserNotFoundError, UserService
 
 pytestmark = pytest.mark.asyncio
 
@@ -36,3 +36,44 @@ async def test_resolve_user(repo: Repository):
     assert user_model.first_name == user.first_name
     assert user_model.last_name == user.last_name
     assert user_model.username == user.username
+
+    renamed = await service.resolve_user(
+        user.telegram_id, Locale("uk"), "Johnny", username=user.username
+    )
+    assert renamed == User(
+        user.id, user.telegram_id, "Johnny", None, user.username, Locale("uk")
+    )
+    assert await repo.get_user_by_telegram_id(user.telegram_id) == await repo.get_user(
+        user.id
+    )
+    assert (await repo.get_user(user.id)).first_name == "Johnny"
+
+
+async def test_resolve_users(repo: Repository):
+    service = UserService(repo)
+    existing = await service.resolve_user(7, Locale("en", "AU"), "Ann")
+
+    users = await service.resolve_users(
+        [
+            (42, Locale("en", "AU"), "John", "Pink", "johnpink42"),
+            (7, Locale("uk"), "Anna", None, None),
+            (42, Locale("en", "AU"), "Johnny", "Pink", "johnpink42"),
+        ]
+    )
+
+    assert [user.telegram_id for user in users] == [42, 7, 42]
+    assert users[0] == users[2]
+    assert users[0].first_name == "Johnny"
+    assert users[1] == User(existing.id, 7, "Anna", None, None, Locale("uk"))
+    assert await repo.get_user(users[0].id) is not None
+    assert await service.resolve_users([]) == []
+
+
+async def test_delete_user(repo: Repository):
+    service = UserService(repo)
+    user = await service.resolve_user(42, Locale("en", "AU"), "John")
+
+    assert (await service.delete_user(user.id)).users == 1
+    assert await repo.get_user(user.id) is None
+    with pytest.raises(UserNotFoundError):
+        await service.delete_user(user.id)
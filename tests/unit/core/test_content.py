@@ -0,0 +1,75 @@
+import pytest
+from babel import Locale
+
+from app.core import (
+    AnswerDefinition,
+    QuestionDefinition,
+    QuizDefinition,
+    QuizDefinitionError,
+    parse_quiz_definition,
+)
+
+DEFINITION = {
+    "description": "Capitals quiz",
+    "language": "en_AU",
+    "questions": [
+        {
+            "question": "Capital of Japan?",
+            "answers": [
+                {"value": "Tokyo", "right": True},
+                {"value": "Kyoto", "right": False},
+            ],
+        }
+    ],
+}
+
+
+def test_parse_quiz_definition():
+    definition = parse_quiz_definition("capitals", DEFINITION)
+    assert definition == QuizDefinition(
+        key="capitals",
+        description="Capitals quiz",
+        language=Locale("en", "AU"),
+        questions=(
+            QuestionDefinition(
+                "Capital of Japan?",
+                (AnswerDefinition("Tokyo", True), AnswerDefinition("Kyoto", False)),
+            ),
+        ),
+    )
+
+
+def test_content_hash():
+    definition = parse_quiz_definition("capitals", DEFINITION)
+    assert (
+        definition.content_hash()
+        == parse_quiz_definition("other", DEFINITION).content_hash()
+    )
+    assert (
+        definition.content_hash()
+        != parse_quiz_definition(
+            "capitals", {**DEFINITION, "language": "en_GB"}
+        ).content_hash()
+    )
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"description": "Capitals quiz", "language": "en_AU"},
+        {**DEFINITION, "language": "en_AU_x"},
+        {**DEFINITION, "questions": DEFINITION["questions"] * 2},
+        {
+            **DEFINITION,
+            "questions": [
+                {
+                    "question": "Capital of Japan?",
+                    "answers": [{"value": "Tokyo", "right": True}] * 2,
+                }
+            ],
+        },
+    ],
+)
+def test_parse_quiz_definition_invalid(data):
+    with pytest.raises(QuizDefinitionError):
+        parse_quiz_definition("capitals", data)
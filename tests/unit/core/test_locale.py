@@ -0,0 +1,38 @@
+import pytest
+from babel import Locale
+
+from app.core import LazyLocale
+
+
+@pytest.mark.parametrize(
+    "identifier", ["en", "en_AU", "EN-au", "zh_Hant_TW", "es_419", "de_DE@euro"]
+)
+def test_lazy_locale_matches_babel(identifier: str):
+    lazy = LazyLocale.parse(identifier)
+    locale = Locale.parse(identifier.replace("-", "_"))
+
+    assert lazy == locale
+    assert locale == lazy
+    assert hash(lazy) == hash(locale)
+    assert str(lazy) == str(locale)
+    assert lazy.materialize() == locale
+
+
+def test_lazy_locale_mixed_with_babel():
+    # Caches keyed by either kind of locale are shared
+    locales = dict.fromkeys([Locale("en", "AU"), LazyLocale.parse("en_AU")])
+    assert list(locales) == [Locale("en", "AU")]
+    assert LazyLocale.parse("de_DE@euro") in {Locale.parse("de_DE@euro")}
+
+
+def test_lazy_locale_materialize():
+    lazy = LazyLocale.parse("en_AU")
+    assert lazy._locale is None
+
+    assert lazy.get_display_name("en") == "English (Australia)"
+    assert isinstance(lazy._locale, Locale)
+
+
+def test_lazy_locale_invalid():
+    with pytest.raises(ValueError):
+        LazyLocale.parse("en_AU_x_y")
@@ -0,0 +1,43 @@
+import pytest
+
+from app.core import RateLimiter
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+async def test_rate_limiter():
+    clock = FakeClock()
+    limiter = RateLimiter(4, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        await limiter.acquire()
+    assert clock.sleeps == pytest.approx([0.25, 0.25])
+
+    # Idle time isn't saved up without burst
+    clock.now += 10
+    await limiter.acquire()
+    await limiter.acquire()
+    assert clock.sleeps == pytest.approx([0.25, 0.25, 0.25])
+
+
+async def test_rate_limiter_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(2, burst=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        await limiter.acquire()
+    assert clock.sleeps == pytest.approx([0.5])
+    assert clock.now == pytest.approx(100.5)
@@ -10,7 +10,7 @@ async def test_transaction():
         def __init__(self) -> None:
             pass
 
-        async def begin_transaction(self):
+        async def begin_transaction(self, write=True):
             nonlocal begun
             begun = True
 
@@ -48,3 +48,19 @@ async def test_transaction():
 
     assert canceled
     assert not commited
+
+
+async def test_nested_deadlines():
+    assert MemoryRepository.remaining_time() is None
+
+    repo = MemoryRepository(":memory:")
+    with repo.deadline(10):
+        assert 9 < repo.remaining_time() <= 10
+        with repo.deadline(1):
+            assert 0 < repo.remaining_time() <= 1
+            # Longer nested deadline does not extend outer one
+            with repo.deadline(100):
+                assert repo.remaining_time() <= 1
+        assert 9 < repo.remaining_time() <= 10
+
+    assert repo.remaining_time() is None
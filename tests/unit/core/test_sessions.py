@@ -0,0 +1,48 @@
+from app.core import PendingQuizSession, SessionStore
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_session_store_eviction():
+    clock = Clock()
+    store = SessionStore(maxsize=2, ttl=10, clock=clock)
+
+    store.put(PendingQuizSession(user_id=1, quiz_id=1, answers={}))
+    store.put(PendingQuizSession(user_id=2, quiz_id=1, answers={}))
+    assert store.get(1, 1) is not None
+
+    store.put(PendingQuizSession(user_id=3, quiz_id=1, answers={}))
+    assert store.get(2, 1) is None
+    assert set(store.take_dirty()) == {(1, 1), (3, 1)}
+    assert store.take_dirty() == {}
+    assert store.take_dropped() == {(2, 1)}
+    assert store.take_dropped() == set()
+
+    clock.now = 10
+    assert {session.user_id for session in store.expire()} == {1, 3}
+    assert len(store) == 0
+    assert store.take_dropped() == {(1, 1), (3, 1)}
+
+    # Failed checkpoint keeps dropped sessions unless they are stored again
+    store.put(PendingQuizSession(user_id=1, quiz_id=1, answers={}))
+    store.mark_dropped([(1, 1), (3, 1)])
+    assert store.take_dropped() == {(3, 1)}
+
+
+def test_session_store_checkpoint_keeps_order():
+    store = SessionStore(maxsize=2, ttl=None)
+    store.put(PendingQuizSession(user_id=1, quiz_id=1, answers={}))
+    store.put(PendingQuizSession(user_id=2, quiz_id=1, answers={}))
+
+    # Neither checkpoint nor retry makes session recently used
+    assert set(store.take_dirty()) == {(1, 1), (2, 1)}
+    store.mark_dirty([(1, 1)])
+    store.put(PendingQuizSession(user_id=3, quiz_id=1, answers={}))
+    assert store.get(1, 1) is None
+    assert store.take_dropped() == {(1, 1)}
+    assert set(store.take_dirty()) == {(3, 1)}
@@ -0,0 +1,11 @@
+from app.core.stats import AnswerStatsAccumulator
+
+
+def test_answer_stats_accumulator():
+    accumulator = AnswerStatsAccumulator()
+    accumulator.add([(1, 10, True), (2, 20, False)])
+    accumulator.add([])
+    accumulator.add([(2, 21, True), (1, 10, True), (2, 20, False)])
+
+    assert accumulator.questions() == [(1, 2, 2), (2, 3, 1)]
+    assert accumulator.answers() == [(10, 2), (20, 2), (21, 1)]
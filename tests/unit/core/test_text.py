@@ -0,0 +1,21 @@
+import pytest
+
+from app.core import normalize_answer
+
+
+@pytest.mark.parametrize(
+    "text, normalized",
+    [
+        ("Paris", "paris"),
+        ("  New\tYork \n City ", "new york city"),
+        ("ＴＯＫＹＯ", "tokyo"),
+        ("Straße", "strasse"),
+        ("Café", "café"),
+    ],
+)
+def test_normalize_answer(text: str, normalized: str):
+    assert normalize_answer(text) == normalized
+
+
+def test_normalize_answer_composition():
+    assert normalize_answer("Café") == normalize_answer("Café")
@@ -0,0 +1,64 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.core import tracing
+
+pytestmark = pytest.mark.asyncio
+
+
+class ListSink(tracing.TraceSink):
+    def __init__(self) -> None:
+        self.traces: List[List[tracing.Span]] = []
+
+    def export(self, spans: List[tracing.Span]):
+        self.traces.append(spans)
+
+
+@pytest.fixture()
+def sink():
+    sink = ListSink()
+    tracing.set_sink(sink)
+    try:
+        yield sink
+    finally:
+        tracing.set_sink(None)
+
+
+async def test_disabled():
+    with tracing.span("request") as span:
+        assert span is None
+        assert tracing.current_span() is None
+
+
+async def test_nested_spans(sink: ListSink):
+    @tracing.traced
+    async def handle(fail: bool):
+        with tracing.span("query", sql="SELECT 1") as span:
+            span.set(rows=1)
+        await asyncio.gather(*(child() for _ in range(2)))
+        if fail:
+            raise ZeroDivisionError()
+
+    async def child():
+        with tracing.span("child"):
+            await asyncio.sleep(0)
+
+    await handle(False)
+    with pytest.raises(ZeroDivisionError):
+        await handle(True)
+
+    assert len(sink.traces) == 2
+    root, query, *children = sink.traces[0]
+    assert root.name.endswith("handle")
+    assert root.parent_id is None
+    assert query.attributes == {"sql": "SELECT 1", "rows": 1}
+    assert [span.name for span in children] == ["child", "child"]
+    assert all(span.parent_id == root.span_id for span in (query, *children))
+    assert len({span.trace_id for span in sink.traces[0]}) == 1
+    assert root.duration >= max(span.duration for span in children)
+
+    assert sink.traces[1][0].attributes == {"error": "ZeroDivisionError"}
+    assert sink.traces[1][0].trace_id != root.trace_id
+    assert tracing.current_span() is None
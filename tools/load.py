@@ -0,0 +1,377 @@
+"""
+Load harness
+
+Simulates virtual users sending Telegram updates ( resolve user, browse quizzes,
+submit answers, retried submissions ) to the services over file-backed
+repository. Arrivals are open-loop: they follow Poisson process of given rate
+whether previous updates finished or not, and latency is measured from the
+scheduled arrival, so queueing delay is included::
+
+    python -m tools.load --users 1000 --rate 200 --duration 60
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.contrib import MemoryRepository
+from app.core import LazyLocale, QuizService, UserService
+
+LANGUAGES = ("en", "en_AU", "en_GB", "de", "fr", "uk")
+OPERATIONS = ("resolve", "browse", "submit", "retry")
+
+
+def percentile(ordered: Sequence[float], share: float) -> float:
+    """
+    Nearest-rank percentile
+
+    :param ordered: sorted values
+    :param share: e.g. 0.99
+    :return: value or NaN if there are no values
+    """
+    if not ordered:
+        return math.nan
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(share * len(ordered)) - 1))]
+
+
+class Stats:
+    """
+    Latencies and errors per operation, total and since last report
+    """
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.updates: List[float] = []
+        self.failed_updates = 0
+        self.dropped = 0
+        self._interval: List[float] = []
+        self._interval_completed = 0
+
+    def record(self, operation: str, latency: float, error: Optional[str] = None):
+        if error is not None:
+            self.errors[f"{operation}: {error}"] += 1
+        else:
+            self.latencies[operation].append(latency)
+
+    def finish_update(self, latency: float, failed: bool = False):
+        # Failed updates end early, so their latencies would flatter the rest
+        self._interval_completed += 1
+        if failed:
+            self.failed_updates += 1
+        else:
+            self.updates.append(latency)
+            self._interval.append(latency)
+
+    def take_interval(self) -> Tuple[int, List[float]]:
+        completed, latencies = self._interval_completed, sorted(self._interval)
+        self._interval_completed, self._interval = 0, []
+        return completed, latencies
+
+
+class Simulation:
+    """
+    Catalog, virtual users and their update sequences
+    """
+
+    def __init__(
+        self,
+        repo: MemoryRepository,
+        users: int,
+        browse_share: float,
+        retry_share: float,
+        skew: float,
+        rng: random.Random,
+    ) -> None:
+        self.repo = repo
+        self.users = users
+        self.browse_share = browse_share
+        self.retry_share = retry_share
+        self.skew = skew
+        self.rng = rng
+
+        self.user_service = UserService(repo)
+        self.quiz_service = QuizService(repo, default_language=LazyLocale.parse("en"))
+        self.stats = Stats()
+
+        # Quiz id to answer ids of every question, cumulative Zipf weights
+        self.quizzes: List[Tuple[int, List[List[int]]]] = []
+        self._weights: List[float] = []
+        # Telegram id to quizzes already submitted
+        self._submitted: Dict[int, List[int]] = defaultdict(list)
+
+    async def prepare(self, quizzes: int, questions: int, answers: int):
+        """
+        Fill catalog, quizzes are spread over languages
+        """
+        async with self.repo.transaction():
+            for i in range(quizzes):
+                quiz = await self.repo.create_quiz(
+                    f"Quiz {i}", LazyLocale.parse(LANGUAGES[i % len(LANGUAGES)])
+                )
+                question_answers = []
+                for j in range(questions):
+                    question = await self.repo.create_quiz_question(
+                        quiz.id, f"Question {j} of quiz {i}?"
+                    )
+                    question_answers.append(
+                        [
+                            (
+                                await self.repo.create_quiz_answer(
+                                    question.id, f"Answer {k}", k == 0
+                                )
+                            ).id
+                            for k in range(answers)
+                        ]
+                    )
+                self.quizzes.append((quiz.id, question_answers))
+
+        total = 0.0
+        for rank in range(1, quizzes + 1):
+            total += 1 / rank**self.skew
+            self._weights.append(total)
+
+    def _pick_quiz(self) -> Tuple[int, List[List[int]]]:
+        # Popular quizzes are hot, as with real traffic
+        point = self.rng.random() * self._weights[-1]
+        return self.quizzes[bisect.bisect_left(self._weights, point)]
+
+    async def _timed(self, operation: str, coroutine):
+        started = time.perf_counter()
+        try:
+            result = await coroutine
+        except Exception as error:
+            self.stats.record(operation, time.perf_counter() - started, repr(error))
+            raise
+        self.stats.record(operation, time.perf_counter() - started)
+        return result
+
+    async def update(self, arrived: float):
+        """
+        Handle one update of random user, its latency counts from arrival while
+        latency of every operation counts from its start
+        """
+        telegram_id = self.rng.randrange(self.users) + 1
+        language = LazyLocale.parse(LANGUAGES[telegram_id % len(LANGUAGES)])
+        submitted = self._submitted[telegram_id]
+        roll = self.rng.random()
+
+        failed = False
+        try:
+            user = await self._timed(
+                "resolve",
+                self.user_service.resolve_user(
+                    telegram_id, language, f"User {telegram_id}"
+                ),
+            )
+
+            if roll < self.retry_share and submitted:
+                # Double tap or redelivered update, served by idempotency
+                quiz_id = self.rng.choice(submitted)
+                await self._timed(
+                    "retry",
+                    self.quiz_service.submit_answers(user.id, quiz_id, set()),
+                )
+            elif roll < self.retry_share + self.browse_share:
+                await self._timed(
+                    "browse",
+                    self.quiz_service.list_quizzes(
+                        language, self.rng.randrange(3) * 10, 10, fallback=True
+                    ),
+                )
+            else:
+                quiz_id, questions = self._pick_quiz()
+                answer_ids = {self.rng.choice(answers) for answers in questions}
+                await self._timed(
+                    "submit",
+                    self.quiz_service.submit_answers(user.id, quiz_id, answer_ids),
+                )
+                submitted.append(quiz_id)
+        except Exception:
+            # Recorded by operation that failed
+            failed = True
+
+        self.stats.finish_update(time.perf_counter() - arrived, failed)
+
+
+def database_size(path: str) -> int:
+    """
+    :return: size of database file together with its WAL in bytes
+    """
+    return sum(
+        os.path.getsize(name) for name in (path, f"{path}-wal") if os.path.exists(name)
+    )
+
+
+async def run(args: argparse.Namespace, path: str) -> dict:
+    repo = MemoryRepository(path, statement_timeout=args.timeout)
+    await repo.connect()
+    await repo.migrate()
+
+    simulation = Simulation(
+        repo,
+        users=args.users,
+        browse_share=args.browse,
+        retry_share=args.retry,
+        skew=args.skew,
+        rng=random.Random(args.seed),
+    )
+    await simulation.prepare(args.quizzes, args.questions, args.answers)
+    stats = simulation.stats
+
+    timeline = []
+    in_flight = set()
+    started = time.perf_counter()
+    next_report = started + args.interval
+    arrival = started
+
+    print(f"{'time, s':>8}{'updates/s':>11}{'p50, ms':>9}{'p99, ms':>9}{'db, MB':>9}")
+    try:
+        while arrival - started < args.duration:
+            # Poisson arrivals on absolute schedule, slow updates don't slow it
+            arrival += simulation.rng.expovariate(args.rate)
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if len(in_flight) >= args.max_in_flight:
+                stats.dropped += 1
+            else:
+                task = asyncio.create_task(simulation.update(arrival))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+            now = time.perf_counter()
+            if now >= next_report:
+                completed, latencies = stats.take_interval()
+                point = {
+                    "time": now - started,
+                    "throughput": completed / args.interval,
+                    "p50": percentile(latencies, 0.5),
+                    "p99": percentile(latencies, 0.99),
+                    "db_size": database_size(path),
+                }
+                timeline.append(point)
+                print(
+                    f"{point['time']:8.1f}{point['throughput']:11.1f}"
+                    f"{point['p50'] * 1000:9.1f}{point['p99'] * 1000:9.1f}"
+                    f"{point['db_size'] / 2**20:9.2f}"
+                )
+                next_report += args.interval
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+    finally:
+        await repo.close()
+
+    elapsed = time.perf_counter() - started
+    updates = sorted(stats.updates)
+    operations = {
+        "update": {
+            "count": len(updates),
+            "errors": stats.failed_updates,
+            "error_rate": stats.failed_updates
+            / max(1, len(updates) + stats.failed_updates),
+            "p50": percentile(updates, 0.5),
+            "p99": percentile(updates, 0.99),
+            "p999": percentile(updates, 0.999),
+        }
+    }
+    for operation in OPERATIONS:
+        ordered = sorted(stats.latencies[operation])
+        errors = sum(
+            count
+            for key, count in stats.errors.items()
+            if key.startswith(f"{operation}: ")
+        )
+        operations[operation] = {
+            "count": len(ordered),
+            "errors": errors,
+            "error_rate": errors / max(1, len(ordered) + errors),
+            "p50": percentile(ordered, 0.5),
+            "p99": percentile(ordered, 0.99),
+            "p999": percentile(ordered, 0.999),
+        }
+
+    return {
+        "elapsed": elapsed,
+        "updates": len(updates),
+        "dropped": stats.dropped,
+        "throughput": len(updates) / elapsed,
+        "operations": operations,
+        "errors": dict(stats.errors.most_common(10)),
+        "db_size": database_size(path),
+        "contention": asdict(repo.contention),
+        "timeline": timeline,
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"{report['updates']} updates in {report['elapsed']:.1f} s "
+        f"( {report['throughput']:.1f}/s, {report['dropped']} dropped ), "
+        f"database {report['db_size'] / 2**20:.2f} MB"
+    )
+    print(
+        f"{'operation':<10}{'count':>8}{'errors':>8}"
+        f"{'p50, ms':>10}{'p99, ms':>10}{'p999, ms':>10}"
+    )
+    for operation, stats in report["operations"].items():
+        print(
+            f"{operation:<10}{stats['count']:>8}{stats['errors']:>8}"
+            f"{stats['p50'] * 1000:10.2f}{stats['p99'] * 1000:10.2f}"
+            f"{stats['p999'] * 1000:10.2f}"
+        )
+    contention = report["contention"]
+    print(
+        f"write lock: {contention['contended']} of {contention['transactions']} "
+        f"transactions waited, {contention['retries']} retries, "
+        f"{contention['wait_time']:.2f} s in total, "
+        f"{contention['max_wait_time'] * 1000:.1f} ms longest, "
+        f"{contention['failures']} failed"
+    )
+    for error, count in report["errors"].items():
+        print(f"  {count:>6} x {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1000, help="virtual users")
+    parser.add_argument("--rate", type=float, default=100, help="updates per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--interval", type=float, default=5, help="report period, s")
+    parser.add_argument("--quizzes", type=int, default=60)
+    parser.add_argument("--questions", type=int, default=10, help="per quiz")
+    parser.add_argument("--answers", type=int, default=4, help="per question")
+    parser.add_argument("--browse", type=float, default=0.6, help="share of reads")
+    parser.add_argument("--retry", type=float, default=0.05, help="share of retries")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--max-in-flight", type=int, default=10000)
+    parser.add_argument("--timeout", type=float, help="statement timeout, s")
+    parser.add_argument("--database", help="database path ( temporary if omitted )")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write report to this file")
+    args = parser.parse_args()
+
+    if args.database:
+        report = asyncio.run(run(args, args.database))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            report = asyncio.run(run(args, os.path.join(directory, "quiz.db")))
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
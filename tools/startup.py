@@ -0,0 +1,143 @@
+"""
+Startup benchmark
+
+Reports slowest imports of the bot ( as ``python -X importtime`` does ) and time
+from process start to the first handled update, so restart latency can be
+tracked between deploys::
+
+    python -m tools.startup --runs 5 --top 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+MODULES = ("app.core", "app.contrib")
+
+PHASES = ("interpreter", "import", "connect", "migrate", "first_update")
+
+
+def measure_imports(modules=MODULES) -> List[Tuple[str, int, int]]:
+    """
+    Import modules in fresh interpreter with -X importtime
+
+    :param modules:
+    :return: list of (module, self time, cumulative time), times in microseconds
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    result = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        result.append((name.strip(), int(self_time), int(cumulative)))
+    return result
+
+
+async def _first_update(path: str) -> Dict[str, float]:
+    # Runs in child process, app is imported here to be measured
+    timeline = {"start": time.time()}
+
+    from app.contrib import MemoryRepository
+    from app.core import LazyLocale, QuizService, UserService
+
+    timeline["import"] = time.time()
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    timeline["connect"] = time.time()
+
+    await repo.migrate()
+    timeline["migrate"] = time.time()
+
+    language = LazyLocale.parse("en_AU")
+    await UserService(repo).resolve_user(42, language, "John")
+    await QuizService(repo).list_quizzes(language, fallback=True)
+    timeline["first_update"] = time.time()
+
+    await repo.close()
+    return timeline
+
+
+async def _prepare_database(path: str):
+    from app.contrib import MemoryRepository
+    from app.core import LazyLocale
+
+    repo = MemoryRepository(path)
+    await repo.connect()
+    await repo.migrate()
+    async with repo.transaction():
+        for i in range(100):
+            await repo.create_quiz(f"Quiz {i}", LazyLocale.parse("en"))
+    await repo.close()
+
+
+def measure_first_update(path: str) -> Dict[str, float]:
+    """
+    Start fresh interpreter and handle first update over existing database
+
+    :param path: database path
+    :return: duration of every phase in seconds
+    """
+    spawned = time.time()
+    process = subprocess.run(
+        [sys.executable, "-m", "tools.startup", "--child", path],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timeline = json.loads(process.stdout)
+
+    durations = {"interpreter": timeline["start"] - spawned}
+    previous = timeline["start"]
+    for phase in PHASES[1:]:
+        durations[phase] = timeline[phase] - previous
+        previous = timeline[phase]
+    durations["total"] = previous - spawned
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="number of restarts")
+    parser.add_argument("--top", type=int, default=15, help="number of imports shown")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_first_update(args.child))))
+        return
+
+    imports = measure_imports()
+    print(f"Slowest imports of {', '.join(MODULES)} ( cumulative / self, ms ):")
+    slowest = sorted(imports, key=lambda item: item[2], reverse=True)[: args.top]
+    for name, self_time, cumulative in slowest:
+        print(f"  {cumulative / 1000:8.1f} {self_time / 1000:8.1f}  {name}")
+    print(f"  Babel imported: {any(name == 'babel' for name, _, _ in imports)}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "quiz.db")
+        asyncio.run(_prepare_database(path))
+
+        runs = [measure_first_update(path) for _ in range(args.runs)]
+
+    print(f"Time to first update, median of {args.runs} runs ( ms ):")
+    for phase in PHASES + ("total",):
+        median = statistics.median(run[phase] for run in runs)
+        print(f"  {phase:<14}{median * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()